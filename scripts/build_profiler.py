@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Strumentazione delle build dei database (TU IVA e interpelli).
+
+Per ogni fase registra tempo reale, tempo CPU e picco di memoria
+(tracemalloc); per le singole unità di lavoro (articoli, documenti) registra
+la durata e segnala le più lente. Il risultato è un report JSON che si può
+confrontare con quello di una build precedente per accorgersi subito di una
+regressione (es. un nuovo pattern in IVA_TOPICS che raddoppia i tempi).
+
+Uso nei builder:
+    profiler = BuildProfiler('testo_unico_iva')
+    with profiler.stage('parsing_struttura'):
+        ...
+    for art in articoli:
+        with profiler.item('articoli', art_id):
+            ...
+    profiler.write_report(path)
+
+Confronto tra due report:
+    python build_profiler.py vecchio.json nuovo.json [--soglia 0.2]
+
+Nota: la memoria è quella allocata da Python nel processo principale.
+tracemalloc rallenta sensibilmente il codice che alloca molto (pdfplumber
+anche di 4-5 volte), quindi è disattivato di default (trace_memory=False):
+i tempi sono confrontabili solo tra report con la stessa impostazione
+('traccia_memoria'). I processi dei pool creati con fork ereditano il
+tracciamento: vanno avviati con initializer=stop_worker_tracing.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Unità più lente riportate per ogni gruppo
+SLOWEST_ITEMS = 10
+
+
+def stop_worker_tracing():
+    """Initializer dei pool: i processi figli non pagano il costo di tracemalloc."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _percentile(sorted_values, q):
+    """Percentile (interpolazione lineare) di una lista già ordinata."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+class BuildProfiler:
+    """
+    Raccoglie tempi e memoria di fasi e unità di lavoro di una build.
+    Con enabled=False tutti i metodi sono no-op.
+    """
+
+    def __init__(self, name, enabled=True, trace_memory=False):
+        self.name = name
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.stages = []       # fasi in ordine di completamento
+        self.items = {}        # gruppo -> [(chiave, secondi)]
+        self.counters = {}     # contatori liberi (articoli, errori, ...)
+        self._stack = []
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._started_at = datetime.now().isoformat()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Misura una fase; le fasi possono essere annidate."""
+        if not self.enabled:
+            yield
+            return
+        record = {'fase': '/'.join([s['fase'] for s in self._stack] + [name]), 'picco_memoria_mb': 0.0}
+        if self.trace_memory:
+            if self._stack:
+                # il picco raggiunto finora appartiene alla fase esterna
+                self._note_peak(self._stack[-1])
+            tracemalloc.reset_peak()
+            record['_mem_start'] = tracemalloc.get_traced_memory()[0]
+        self._stack.append(record)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record['tempo_s'] = round(time.perf_counter() - wall, 4)
+            record['cpu_s'] = round(time.process_time() - cpu, 4)
+            self._stack.pop()
+            if self.trace_memory:
+                self._note_peak(record)
+                current = tracemalloc.get_traced_memory()[0]
+                record['delta_memoria_mb'] = round((current - record.pop('_mem_start')) / 2**20, 2)
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent['picco_memoria_mb'] = max(parent['picco_memoria_mb'], record['picco_memoria_mb'])
+                    tracemalloc.reset_peak()
+            self.stages.append(record)
+
+    def _note_peak(self, record):
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        record['picco_memoria_mb'] = round(max(record['picco_memoria_mb'], peak), 2)
+
+    @contextmanager
+    def item(self, group, key):
+        """Misura il tempo di una singola unità di lavoro (articolo, documento...)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_item(group, key, time.perf_counter() - start)
+
+    def add_item(self, group, key, seconds):
+        """Registra una durata misurata altrove (es. in un processo del pool)."""
+        if self.enabled:
+            self.items.setdefault(group, []).append((key, seconds))
+
+    def count(self, name, value=1):
+        """Incrementa un contatore riportato nel report."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _item_summary(self, timings):
+        values = sorted(t for _, t in timings)
+        total = sum(values)
+        slowest = sorted(timings, key=lambda x: -x[1])[:SLOWEST_ITEMS]
+        return {
+            'numero': len(values),
+            'totale_s': round(total, 4),
+            'media_ms': round(total / len(values) * 1000, 3),
+            'p50_ms': round(_percentile(values, 0.5) * 1000, 3),
+            'p95_ms': round(_percentile(values, 0.95) * 1000, 3),
+            'max_ms': round(values[-1] * 1000, 3),
+            'piu_lenti': [{'chiave': k, 'ms': round(t * 1000, 3)} for k, t in slowest],
+        }
+
+    def report(self):
+        """Report completo come dizionario serializzabile in JSON."""
+        report = {
+            'build': self.name,
+            'avvio': self._started_at,
+            'traccia_memoria': self.trace_memory,
+            'tempo_totale_s': round(time.perf_counter() - self._started, 4),
+            'cpu_totale_s': round(time.process_time() - self._started_cpu, 4),
+            'fasi': self.stages,
+            'unita': {group: self._item_summary(t) for group, t in self.items.items() if t},
+            'contatori': self.counters,
+        }
+        if self.trace_memory:
+            report['picco_memoria_mb'] = max((s['picco_memoria_mb'] for s in self.stages), default=0.0)
+        return report
+
+    def write_report(self, path):
+        """Scrive il report JSON e stampa un riepilogo delle fasi."""
+        if not self.enabled:
+            return None
+        report = self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print(f"\n⏱  Profilo build ({report['tempo_totale_s']:.2f}s) → {path}")
+        for s in report['fasi']:
+            mem = f"  picco {s['picco_memoria_mb']:.1f} MB" if self.trace_memory else ''
+            print(f"   {s['fase']:<40} {s['tempo_s']:8.3f}s  cpu {s['cpu_s']:8.3f}s{mem}")
+        for group, summary in report['unita'].items():
+            worst = summary['piu_lenti'][0]
+            print(f"   [{group}] {summary['numero']} unità, p95 {summary['p95_ms']:.1f} ms, "
+                  f"max {summary['max_ms']:.1f} ms ({worst['chiave']})")
+        return report
+
+
+# ─── Confronto tra report ───────────────────────────────────────────────────
+
+def compare_reports(old, new, threshold=0.2, min_seconds=0.05):
+    """
+    Confronta due report e restituisce le fasi e i gruppi di unità il cui
+    tempo è cresciuto più della soglia relativa (ignorando quelli sotto
+    min_seconds, dove il rumore domina).
+    """
+    regressions = []
+
+    def check(kind, name, before, after):
+        if after < min_seconds or before <= 0:
+            return
+        growth = after / before - 1
+        if growth > threshold:
+            regressions.append({'tipo': kind, 'nome': name, 'prima_s': before,
+                                'dopo_s': after, 'crescita': round(growth, 3)})
+
+    old_stages = {s['fase']: s for s in old.get('fasi', [])}
+    for s in new.get('fasi', []):
+        if s['fase'] in old_stages:
+            check('fase', s['fase'], old_stages[s['fase']]['tempo_s'], s['tempo_s'])
+    for group, summary in new.get('unita', {}).items():
+        if group in old.get('unita', {}):
+            check('unita', group, old['unita'][group]['totale_s'], summary['totale_s'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Confronta due report di profilazione della build.')
+    parser.add_argument('vecchio')
+    parser.add_argument('nuovo')
+    parser.add_argument('--soglia', type=float, default=0.2,
+                        help='crescita relativa oltre la quale segnalare (default 0.2 = +20%%)')
+    args = parser.parse_args()
+
+    with open(args.vecchio, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.nuovo, encoding='utf-8') as f:
+        new = json.load(f)
+
+    if old.get('traccia_memoria') != new.get('traccia_memoria'):
+        print("⚠️  I report sono stati generati con impostazioni diverse di tracemalloc: "
+              "i tempi non sono confrontabili.")
+    regressions = compare_reports(old, new, args.soglia)
+    if not regressions:
+        print("Nessuna regressione oltre la soglia.")
+        return 0
+    for r in regressions:
+        print(f"⚠️  {r['tipo']} {r['nome']}: {r['prima_s']:.3f}s → {r['dopo_s']:.3f}s (+{r['crescita']:.0%})")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Cache locale degli embedding dei chunk.
+
+Un embedding dipende solo dal testo del chunk, dal modello e dal numero di
+dimensioni: la chiave è lo SHA-256 del testo, e ogni coppia (modello,
+dimensioni) ha i suoi file. I vettori sono float32 contigui (little-endian),
+la riga i occupa i byte [i * 4 * dim, (i + 1) * 4 * dim):
+
+    <root>/<modello>-<dim>.f32     vettori, solo in aggiunta
+    <root>/<modello>-<dim>.json    {"versione": 1, "righe": {sha256(testo): riga}}
+
+A ogni save() i nuovi vettori vengono prima aggiunti al .f32 e poi l'indice
+viene riscritto con una rinomina atomica: un'interruzione lascia al più
+righe non indicizzate, mai un indice che punta a vettori mancanti.
+"""
+
+import hashlib
+import json
+import sys
+from array import array
+from pathlib import Path
+
+INDEX_VERSION = 1
+
+
+def text_key(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Vettori già calcolati per un modello e un numero di dimensioni."""
+
+    def __init__(self, root, model, dimensions):
+        self.root = Path(root)
+        self.dimensions = dimensions
+        name = f"{model.replace('/', '_')}-{dimensions}"
+        self.vectors_path = self.root / f"{name}.f32"
+        self.index_path = self.root / f"{name}.json"
+        self._vectors = array('f')
+        self._rows = {}
+        self._saved_rows = 0
+
+        if self.vectors_path.exists() and self.index_path.exists():
+            row_bytes = 4 * dimensions
+            with open(self.vectors_path, 'rb') as f:
+                data = f.read()
+            rows = len(data) // row_bytes
+            # un'eventuale riga troncata da un salvataggio interrotto viene scartata
+            self._vectors.frombytes(data[:rows * row_bytes])
+            if sys.byteorder == 'big':
+                self._vectors.byteswap()
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('versione') == INDEX_VERSION:
+                self._rows = {k: r for k, r in index['righe'].items() if r < rows}
+            self._saved_rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, text):
+        return text_key(text) in self._rows
+
+    def get(self, text):
+        """Vettore del testo come lista di float, None se non in cache."""
+        row = self._rows.get(text_key(text))
+        if row is None:
+            return None
+        start = row * self.dimensions
+        return self._vectors[start:start + self.dimensions].tolist()
+
+    def put(self, text, values):
+        if len(values) != self.dimensions:
+            raise ValueError(f"Embedding di {len(values)} dimensioni, attese {self.dimensions}")
+        key = text_key(text)
+        if key in self._rows:
+            return
+        self._rows[key] = len(self._vectors) // self.dimensions
+        self._vectors.extend(values)
+
+    def save(self):
+        """Aggiunge al file i vettori nuovi e riscrive l'indice."""
+        start = self._saved_rows * self.dimensions
+        if start == len(self._vectors):
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        new = self._vectors[start:]
+        if sys.byteorder == 'big':
+            new.byteswap()
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(start * 4)   # righe orfane di un salvataggio interrotto
+            f.write(new.tobytes())
+        tmp = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'versione': INDEX_VERSION, 'righe': self._rows}, f)
+        tmp.replace(self.index_path)
+        self._saved_rows = len(self._vectors) // self.dimensions
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Scheduler asincrono delle richieste di embedding.
+
+- I testi sono raggruppati in batch per numero stimato di token (non per
+  numero di chunk): pochi chunk lunghi o molti corti riempiono allo stesso
+  modo un batch.
+- Più richieste restano in volo insieme (max_inflight), ma ognuna prima di
+  partire prende i suoi token da un token bucket da tokens_per_minute.
+- Le risposte 429 e 5xx (ed errori di connessione/timeout) vengono
+  ritentate con backoff esponenziale e jitter ("full jitter": attesa
+  casuale tra 0 e base * 2^tentativo, al più max_delay), rispettando
+  Retry-After se il server lo indica.
+- Ogni batch completato viene passato subito a on_batch (es. salvato nella
+  cache degli embedding): se l'esecuzione si ferma, la successiva riparte
+  dai testi mancanti.
+
+La funzione che fa la richiesta è un parametro (embed(testi) → vettori),
+quindi lo scheduler si prova anche contro un endpoint finto locale, ad es.
+con OPENAI_BASE_URL=http://127.0.0.1:8000/v1 per il client OpenAI.
+"""
+
+import asyncio
+import random
+import time
+
+# Stima prudente per testo italiano (il tokenizer reale ne conta di solito meno)
+CHARS_PER_TOKEN = 3
+
+# Errori di rete ritentabili del client OpenAI (senza codice HTTP)
+_RETRYABLE_NAMES = {'APIConnectionError', 'APITimeoutError'}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_batches(texts, max_tokens, max_items):
+    """
+    Raggruppa i testi, nell'ordine, in batch di al più max_tokens stimati e
+    max_items elementi. Restituisce [(testi, token stimati)]; un testo più
+    lungo di max_tokens forma un batch da solo.
+    """
+    batches = []
+    current, tokens = [], 0
+    for text in texts:
+        n = estimate_tokens(text)
+        if current and (tokens + n > max_tokens or len(current) >= max_items):
+            batches.append((current, tokens))
+            current, tokens = [], 0
+        current.append(text)
+        tokens += n
+    if current:
+        batches.append((current, tokens))
+    return batches
+
+
+def is_retryable(exc):
+    """429, 5xx, errori di connessione e timeout."""
+    status = getattr(exc, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return (type(exc).__name__ in _RETRYABLE_NAMES
+            or isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)))
+
+
+def retry_after(exc):
+    """Secondi indicati dall'header Retry-After della risposta, se presente."""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncTokenBucket:
+    """Token bucket asincrono: capacità capacity, ricarica rate token al secondo."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n):
+        n = min(n, self.capacity)   # una richiesta enorme aspetta il bucket pieno
+        async with self._lock:     # in ordine di arrivo
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                await asyncio.sleep((n - self._tokens) / self.rate)
+
+
+class EmbeddingScheduler:
+    """Esegue i batch di embedding con concorrenza, budget di token e retry."""
+
+    def __init__(self, embed, tokens_per_minute, max_inflight=4, max_batch_tokens=60_000,
+                 max_batch_items=2048, max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.embed = embed
+        self.tokens_per_minute = tokens_per_minute
+        self.max_inflight = max_inflight
+        self.max_batch_tokens = min(max_batch_tokens, tokens_per_minute)
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {'batch': 0, 'richieste': 0, 'ritentativi': 0, 'falliti': 0}
+
+    def backoff(self, attempt, exc=None):
+        """Attesa prima del tentativo attempt+1 (full jitter, o Retry-After)."""
+        hinted = retry_after(exc) if exc is not None else None
+        if hinted is not None:
+            return min(hinted, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _run_batch(self, texts, tokens, bucket, slots, on_batch):
+        for attempt in range(self.max_retries + 1):
+            async with slots:
+                await bucket.acquire(tokens)
+                self.stats['richieste'] += 1
+                try:
+                    vectors = await self.embed(texts)
+                except Exception as e:
+                    if not is_retryable(e) or attempt == self.max_retries:
+                        self.stats['falliti'] += 1
+                        return texts, e
+                    error = e
+                else:
+                    on_batch(texts, vectors)
+                    return None
+            # attesa fuori dallo slot: intanto partono gli altri batch
+            self.stats['ritentativi'] += 1
+            await asyncio.sleep(self.backoff(attempt, error))
+
+    async def run(self, texts, on_batch, on_progress=None):
+        """
+        Calcola gli embedding di texts chiamando on_batch(testi, vettori) per
+        ogni batch riuscito. Restituisce [(testi, eccezione)] dei batch
+        falliti definitivamente (errore non ritentabile o tentativi esauriti).
+        """
+        batches = pack_batches(texts, self.max_batch_tokens, self.max_batch_items)
+        self.stats['batch'] = len(batches)
+        bucket = AsyncTokenBucket(self.tokens_per_minute / 60, self.tokens_per_minute)
+        slots = asyncio.Semaphore(self.max_inflight)
+        done = 0
+
+        def completed(batch_texts, vectors):
+            nonlocal done
+            on_batch(batch_texts, vectors)
+            done += len(batch_texts)
+            if on_progress:
+                on_progress(done, len(texts))
+
+        results = await asyncio.gather(*(self._run_batch(batch, tokens, bucket, slots, completed)
+                                         for batch, tokens in batches))
+        return [r for r in results if r is not None]
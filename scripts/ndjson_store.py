@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Database degli interpelli in formato JSON Lines.
+
+Una voce per riga, così il file si può scrivere man mano che le voci sono
+pronte e rileggere in streaming (in memoria resta un documento alla volta);
+i dati aggregati stanno in un piccolo file indice accanto:
+
+    interpelli_2024_2025_database.jsonl         una voce JSON per riga
+    interpelli_2024_2025_database.indici.json   {"metadata": ..., "indice_tematico": ...}
+"""
+
+import json
+from pathlib import Path
+
+
+def sidecar_path(path):
+    """File indice associato al file JSON Lines."""
+    path = Path(path)
+    return path.with_name(path.stem + '.indici.json')
+
+
+def encode_line(obj):
+    """Voce serializzata su una riga (i \\n nelle stringhe sono già escapati da json)."""
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def iter_ndjson(path):
+    """Genera le voci del file JSON Lines una alla volta."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_sidecar(path):
+    """Metadati e indice tematico del database JSON Lines in path."""
+    with open(sidecar_path(path), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_sidecar(path, database):
+    """Scrive il file indice (tutto tranne le voci) con rinomina atomica."""
+    target = sidecar_path(path)
+    tmp = target.with_name(target.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({k: v for k, v in database.items() if k != 'interpelli'}, f, ensure_ascii=False, indent=2)
+    tmp.replace(target)
+
+
+def write_ndjson_database(path, database):
+    """Scrive un database già in memoria in formato JSON Lines + file indice."""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        for entry in database['interpelli']:
+            f.write(encode_line(entry))
+    tmp.replace(path)
+    write_sidecar(path, database)
+
+
+def load_ndjson_database(path):
+    """Carica in memoria l'intero database (stessa struttura del JSON)."""
+    database = read_sidecar(path)
+    return {
+        'metadata': database['metadata'],
+        'interpelli': list(iter_ndjson(path)),
+        'indice_tematico': database['indice_tematico'],
+    }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Estrazione dei riferimenti normativi dal testo degli interpelli.
+
+Un'unica scansione da sinistra a destra riconosce i token rilevanti
+("art."/"articolo N", "comma M", "lettera x", identificativi di legge) e li
+combina in riferimenti strutturati:
+
+    {'norma': 'DPR 633/1972', 'articolo': '19-bis', 'comma': '5', 'lettera': 'a'}
+
+Tra due token consecutivi di uno stesso riferimento sono ammesse solo
+parole di collegamento ("del", ",", "e", "decreto del Presidente della
+Repubblica", ...) per al più MAX_GAP caratteri: il lookahead è limitato,
+quindi il tempo cresce linearmente con la lunghezza del testo anche su
+input costruiti ad arte (nessun ".+?" che possa tornare indietro su
+migliaia di caratteri).
+
+Benchmark di scalabilità sul caso peggiore:
+    python normative_refs.py --benchmark
+"""
+
+import argparse
+import re
+import sys
+import time
+
+SUFFIXES = r'(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies)'
+_NUM = rf'\d{{1,4}}(?:[\s-]{{0,3}}{SUFFIXES})?\b'
+
+# Identificativi di legge riconosciuti → nome canonico (allineato a mappatura_vecchio_nuovo_codice)
+LAWS = {
+    'dpr633': 'DPR 633/1972',
+    'dl331': 'DL 331/1993',
+    'tuiva': 'D.Lgs. 10/2026',
+}
+
+# "primo comma", "secondo comma", ... (stile del DPR 633/1972)
+ORDINALS = {
+    'primo': '1', 'secondo': '2', 'terzo': '3', 'quarto': '4', 'quinto': '5',
+    'sesto': '6', 'settimo': '7', 'ottavo': '8', 'nono': '9', 'decimo': '10',
+}
+
+TOKEN_PATTERN = re.compile(
+    r'(?P<dpr633>\bd\.?\s*p\.?\s*r\.?\s*(?:n\.?\s*)?633(?:/(?:19)?72)?\b'
+    r'|\bn\.\s*633(?:/(?:19)?72)?\b|\b26\s+ottobre\s+1972\b|\bdecreto\s+iva\b)'
+    r'|(?P<dl331>\bd\.?\s*l\.?\s*(?:n\.?\s*)?331(?:/(?:19)?93)?\b'
+    r'|\bn\.\s*331(?:/(?:19)?93)?\b|\b30\s+agosto\s+1993\b)'
+    r'|(?P<tuiva>\bd\.?\s*lgs\.?\s*(?:n\.?\s*)?10(?:/2026|\s+del\s+2026)\b'
+    r'|\btesto\s+unico\s+(?:dell.)?iva\b|\b19\s+gennaio\s+2026\b)'
+    rf'|(?P<art>\bart(?:icol[oi]|t?\.?)\s*(?P<art_num>{_NUM}))'
+    rf'|(?P<comma>\bcomm[ai]\s*(?P<comma_num>{_NUM})|\b(?P<comma_ord>{"|".join(ORDINALS)})\s+comma\b)'
+    rf'|(?P<numero>\bn\.\s*{_NUM})'
+    rf'|(?P<lettera>\blett(?:er[ae]|\.)\s*(?P<lettera_val>[a-z](?:-?{SUFFIXES})?)\)?)'
+    rf'|(?P<num>\b{_NUM})',
+    re.IGNORECASE,
+)
+
+# Testo ammesso tra due token dello stesso riferimento
+CONNECTOR = re.compile(
+    r'(?:[\s,;()-]|(?:del|dello|della|dei|delle|al|alla|e|ed|nonché'
+    r'|decreto|legislativo|legge|presidente|repubblica)\b|n\.|d\.?p\.?r\.?|d\.?l(?:gs)?\.?)*',
+    re.IGNORECASE,
+)
+MAX_GAP = 60
+# Testo ammesso tra due voci di un elenco ("articoli 19, 19-bis e 20")
+LIST_SEPARATOR = re.compile(r'[\s,]*(?:(?:e|ed)\b[\s,]*)?', re.IGNORECASE)
+
+_SUFFIX_SPLIT = re.compile(rf'(\d+)[\s-]*({SUFFIXES})?', re.IGNORECASE)
+
+
+def normalize_number(value):
+    """'19 bis', '19bis', '19 - bis' → '19-bis'."""
+    m = _SUFFIX_SPLIT.match(value)
+    return f"{m.group(1)}-{m.group(2).lower()}" if m.group(2) else m.group(1)
+
+
+def extract_references(text):
+    """
+    Riferimenti strutturati (dizionari norma/articolo/comma/lettera) nell'ordine
+    di prima comparsa, senza duplicati. norma è None se l'articolo non è
+    seguito da un identificativo di legge riconosciuto.
+    Restituisce (riferimenti, cita_tu_iva).
+    """
+    refs = []
+    seen = set()
+    pending = []      # riferimenti in attesa della norma
+    context = None    # ultimo componente letto: 'art', 'comma' o 'lettera'
+    prev_end = 0
+    cites_tu = False
+
+    def flush(law=None):
+        for ref in pending:
+            ref['norma'] = law
+            key = (ref['norma'], ref['articolo'], ref['comma'], ref['lettera'])
+            if key not in seen:
+                seen.add(key)
+                refs.append(ref)
+        pending.clear()
+
+    for m in TOKEN_PATTERN.finditer(text):
+        kind = m.lastgroup
+        gap = m.start() - prev_end
+        connected = gap <= MAX_GAP and CONNECTOR.fullmatch(text, prev_end, m.start()) is not None
+        if not connected:
+            flush()
+            context = None
+        in_list = connected and LIST_SEPARATOR.fullmatch(text, prev_end, m.start()) is not None
+        prev_end = m.end()
+
+        if kind in LAWS:
+            cites_tu = cites_tu or kind == 'tuiva'
+            flush(LAWS[kind])
+            context = None
+        elif kind == 'art':
+            pending.append({'norma': None, 'articolo': normalize_number(m.group('art_num')),
+                            'comma': None, 'lettera': None})
+            context = 'art'
+        elif kind == 'comma' and pending:
+            ordinal = m.group('comma_ord')
+            pending[-1]['comma'] = ORDINALS[ordinal.lower()] if ordinal else normalize_number(m.group('comma_num'))
+            context = 'comma'
+        elif kind == 'lettera' and pending:
+            pending[-1]['lettera'] = m.group('lettera_val').lower()
+            context = 'lettera'
+        elif kind == 'numero' and pending:
+            context = None   # "n. 27" di un comma: i numeri seguenti non sono commi
+        elif kind == 'num' and in_list and context == 'art':
+            # elenco di articoli: "articoli 19, 19-bis e 20"
+            pending.append({'norma': None, 'articolo': normalize_number(m.group('num')),
+                            'comma': None, 'lettera': None})
+        elif kind == 'num' and in_list and context == 'comma':
+            # elenco di commi dello stesso articolo: "commi 1 e 2"
+            pending.append(dict(pending[-1], comma=normalize_number(m.group('num'))))
+        else:
+            flush()
+            context = None
+    flush()
+    return refs, cites_tu
+
+
+def summarize_references(text):
+    """
+    Riferimenti normativi dell'interpello nel formato del database:
+    riferimenti_specifici (stringhe "DPR 633/1972 art. 19", come le chiavi di
+    mappatura_vecchio_nuovo_codice), articoli_citati e riferimenti strutturati.
+    """
+    refs, cites_tu = extract_references(text or '')
+    specific = {f"{r['norma']} art. {r['articolo']}" for r in refs if r['norma'] in ('DPR 633/1972', 'DL 331/1993')}
+    if cites_tu:
+        specific.add("D.Lgs. 10/2026 (TU IVA)")
+    return {
+        'riferimenti_specifici': sorted(specific),
+        'articoli_citati': sorted({r['articolo'] for r in refs}),
+        'riferimenti': refs,
+    }
+
+
+# ─── Benchmark ──────────────────────────────────────────────────────────────
+
+def _worst_case(n):
+    """
+    Testo costruito per far esplodere i vecchi pattern con ".+?": tanti
+    "articolo N del decreto" senza mai il numero della legge.
+    """
+    return "Ai sensi dell'articolo 19 del decreto legislativo, comma 2, lettera a) " * n
+
+
+def benchmark(sizes=(250, 500, 1000, 2000, 4000)):
+    """Tempo di estrazione al crescere dell'input; restituisce [(caratteri, secondi)]."""
+    results = []
+    for n in sizes:
+        text = _worst_case(n)
+        start = time.perf_counter()
+        summarize_references(text)
+        results.append((len(text), time.perf_counter() - start))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estrae i riferimenti normativi da un file di testo.')
+    parser.add_argument('file', nargs='?', help='file di testo (UTF-8)')
+    parser.add_argument('--benchmark', action='store_true', help='misura la scalabilità sul caso peggiore')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        base = None
+        for chars, seconds in benchmark():
+            base = base or seconds / chars
+            print(f"   {chars:9d} caratteri  {seconds * 1000:9.2f} ms  "
+                  f"{seconds / chars * 1e6:7.3f} µs/carattere  (x{seconds / chars / base:.2f})")
+        return 0
+    if not args.file:
+        parser.error('indicare un file o --benchmark')
+    with open(args.file, encoding='utf-8') as f:
+        for ref in extract_references(f.read())[0]:
+            print(ref)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
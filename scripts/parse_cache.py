@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Cache per documento dei risultati di parsing degli interpelli.
+
+Per ogni PDF (identificato dallo SHA-256 del contenuto) salva il risultato
+di ogni passo — testo, sezioni, riferimenti normativi, temi — insieme alla
+chiave con cui è stato calcolato: la versione del passo e gli input da cui
+dipende, compresa la chiave del passo precedente. Cambiando solo la
+versione di un passo (es. i pattern di extract_iva_topics) viene ricalcolato
+solo quel passo, partendo dal testo già in cache.
+
+Struttura: <root>/<sha[:2]>/<sha>.json.gz, un dizionario
+{passo: {'chiave': ..., 'valore': ...}}.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def stage_key(version, *inputs):
+    """Chiave breve di un passo: hash della versione e degli input."""
+    raw = json.dumps([version, inputs], ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+class CachedDocument:
+    """Risultati in cache di un singolo PDF."""
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = []
+        self._data = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}   # file danneggiato: si ricalcola tutto
+
+    def get(self, stage, key, compute, *args, cacheable=None):
+        """
+        Valore del passo dalla cache se calcolato con la stessa chiave,
+        altrimenti compute(*args), che viene salvato.
+
+        Con cacheable, un valore per cui cacheable(valore) è falso (es. un
+        testo non estratto per un errore transitorio) non viene salvato e,
+        se già in cache, viene ricalcolato.
+        """
+        cached = self._data.get(stage)
+        if (cached is not None and cached['chiave'] == key
+                and (cacheable is None or cacheable(cached['valore']))):
+            self.hits.append(stage)
+            return cached['valore']
+        value = compute(*args)
+        if cacheable is None or cacheable(value):
+            self._data[stage] = {'chiave': key, 'valore': value}
+            self._dirty = True
+        return value
+
+    def save(self):
+        """Scrive il file se qualche passo è stato ricalcolato (rinomina atomica)."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # nome temporaneo per processo: lo stesso PDF può arrivare da due interpelli
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        tmp.replace(self.path)
+        self._dirty = False
+
+
+class ParseCache:
+    """Cache dei risultati di parsing indirizzata per contenuto del PDF."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def document(self, sha):
+        return CachedDocument(self.root / sha[:2] / f"{sha}.json.gz")
@@ -4,38 +4,137 @@ Parser del Testo Unico IVA (D.Lgs. 10 del 19 gennaio 2026)
 Genera un database JSON strutturato per sistema RAG sugli interpelli fiscali.
 """
 
+import os
 import re
 import json
+import unicodedata
 import pdfplumber
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from pdf_text import iter_page_texts, iter_cached_page_texts
+from build_profiler import BuildProfiler, stop_worker_tracing
+from ndjson_store import iter_ndjson
+from record_store import write_store
+from split_store import latest_database
+from topic_engine import TopicEngine
+from tu_links import build_link_index, link_counts, link_entry, reverse_links
 
 PDF_PATH = "/sessions/sharp-adoring-babbage/mnt/FISCO/Testo Unico IVA (DLgs 10 del 19 gennaio 2026).pdf"
 OUTPUT_PATH = "/sessions/sharp-adoring-babbage/mnt/FISCO/testo_unico_iva_database.json"
+# Contenitore binario con un record per articolo, accanto al JSON (None = solo JSON)
+OUTPUT_STORE_PATH = os.path.splitext(OUTPUT_PATH)[0] + ".rec"
+
+# Processi per l'estrazione del testo (1 = estrazione seriale)
+EXTRACT_WORKERS = os.cpu_count() or 1
+# Numero di blocchi di pagine per processo (bilancia pagine dense e leggere)
+SHARDS_PER_WORKER = 4
+# Backend di estrazione del testo ('pdfplumber' o 'pdfium', vedi pdf_text.py);
+# per confrontarli sul PDF: python pdf_text.py <PDF_PATH>
+PDF_BACKEND = 'pdfplumber'
+# Cache del testo estratto per pagina (None = disattivata)
+PAGE_CACHE_DIR = Path(__file__).parent / "page_cache"
+# Report JSON con tempi e memoria della build (None = nessuna profilazione)
+PROFILE_REPORT_PATH = os.path.splitext(OUTPUT_PATH)[0] + ".profilo.json"
+# Database degli interpelli (scarica_interpelli.py) da cui ricavare gli
+# interpelli_collegati, così una ricostruzione del TU non perde i collegamenti;
+# vale anche la versione .jsonl o i soli metadati .meta.json (vedi load_interpelli)
+INTERPELLI_PATH = os.path.join(os.path.dirname(OUTPUT_PATH), "interpelli_2024_2025_database.json")
+# Traccia anche il picco di memoria: tracemalloc rallenta l'estrazione PDF
+# di 4-5 volte, va attivato solo per indagare sulla memoria
+PROFILE_MEMORY = False
 
 # ─── Step 1: Extract text ───────────────────────────────────────────────────
 
-def extract_text(pdf_path):
-    """Estrae il testo completo dal PDF."""
-    pages_text = []
+def _extract_page_range(args):
+    """Estrae il testo di un intervallo di pagine [start, end) del PDF."""
+    pdf_path, start, end = args
+    return list(iter_page_texts(pdf_path, start, end, PDF_BACKEND))
+
+
+def _page_shards(n_pages, n_shards):
+    """Divide l'intervallo [0, n_pages) in blocchi contigui e ordinati."""
+    n_shards = max(1, min(n_shards, n_pages))
+    size, extra = divmod(n_pages, n_shards)
+    shards = []
+    start = 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < extra else 0)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def iter_extracted_pages(pdf_path, workers=1):
+    """
+    Genera il testo delle pagine del PDF nell'ordine originale.
+
+    Con workers > 1 le pagine vengono divise in blocchi contigui ed estratte
+    in parallelo da un pool di processi; i blocchi sono restituiti nell'ordine
+    originale, quindi il risultato è identico a quello dell'estrazione seriale.
+    """
+    if workers <= 1:
+        yield from iter_page_texts(pdf_path, backend=PDF_BACKEND)
+        return
+
     with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                pages_text.append(t)
-    return "\n".join(pages_text)
+        n_pages = len(pdf.pages)
+
+    shards = _page_shards(n_pages, workers * SHARDS_PER_WORKER)
+    tasks = [(pdf_path, start, end) for start, end in shards]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=stop_worker_tracing) as pool:
+        # map() restituisce i risultati nell'ordine dei blocchi
+        for shard_pages in pool.map(_extract_page_range, tasks):
+            yield from shard_pages
+
+
+def extract_text(pdf_path, workers=1):
+    """Estrae il testo completo dal PDF."""
+    return "\n".join(iter_extracted_pages(pdf_path, workers))
 
 
 # ─── Step 2: Clean text ─────────────────────────────────────────────────────
 
-def clean_text(text):
-    """Rimuove header/footer della Gazzetta Ufficiale e pagine vuote."""
+def clean_page(text):
+    """Rimuove header/footer della Gazzetta Ufficiale da una singola pagina."""
     # Remove page markers like "— 2 —"
     text = re.sub(r'—\s*\d+\s*—', '', text)
     # Remove Gazzetta Ufficiale headers
     text = re.sub(r'30-1-2026\s+Supplemento ordinario n\.\s*4/L alla GAZZETTA UFFICIALE\s+Serie generale\s*-\s*n\.\s*24', '', text)
-    # Collapse multiple blank lines
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return text.strip()
+    return text
+
+
+def iter_clean_text(pages):
+    """
+    Pulisce il testo pagina per pagina, restituendo blocchi di testo pulito.
+
+    La concatenazione dei blocchi equivale a clean_text() applicato alle
+    pagine unite da "\n": header e numeri di pagina stanno sempre dentro una
+    pagina, mentre gli spazi finali di ogni pagina vengono trattenuti finché
+    non si sa se le righe vuote vanno compattate con la pagina successiva.
+    """
+    pending = ''      # spazi finali non ancora emessi
+    started = False
+    for i, page in enumerate(pages):
+        piece = clean_page(page)
+        if i:
+            piece = '\n' + piece
+        # Collapse multiple blank lines (anche a cavallo tra due pagine)
+        piece = re.sub(r'\n{3,}', '\n\n', pending + piece)
+        chunk = piece.rstrip()
+        pending = piece[len(chunk):]
+        if not started:
+            chunk = chunk.lstrip()
+            started = bool(chunk)
+        if chunk:
+            yield chunk
+
+
+def clean_text(text):
+    """Rimuove header/footer della Gazzetta Ufficiale e pagine vuote."""
+    return ''.join(iter_clean_text([text]))
 
 
 # ─── Step 3: Separate main body from Tabelle and Note ───────────────────────
@@ -59,44 +158,83 @@ def separate_sections(text):
 
 # ─── Step 4: Parse structure ────────────────────────────────────────────────
 
-def parse_titoli(body):
-    """Identifica tutti i Titoli."""
-    pattern = r'TITOLO\s+([IVXLCDM]+)\s*\n\s*(.+?)(?=\n)'
-    return [(m.start(), m.group(1).strip(), m.group(2).strip()) for m in re.finditer(pattern, body)]
+# Suffissi degli articoli aggiunti ("1-bis", "12 - ter", ...)
+ART_SUFFIX = r'(?:\s*-\s*bis|\s*-\s*ter|\s*-\s*quater|\s*-\s*quinquies|\s*-\s*sexies|\s*-\s*septies|\s*-\s*octies|\s*-\s*novies|\s*-\s*decies)?'
 
+# Un solo pattern per Titoli, Capi e articoli. La classe iniziale [TCAa]
+# consente a re di saltare rapidamente le posizioni che non possono aprire
+# un'intestazione; il lookbehind sceglie poi il ramo giusto.
+STRUCTURE_PATTERN = re.compile(
+    r'[TCAa](?:'
+    r'(?<=T)ITOLO\s+(?P<titolo_num>[IVXLCDM]+)\s*\n\s*(?P<titolo_nome>.+?)(?=\n)'
+    r'|(?<=C)apo\s+(?P<capo_num>[IVXLCDM]+)\s*\n\s*(?P<capo_nome>.+?)(?=\n)'
+    r'|(?<=[Aa])(?i:RT\.\s*(?P<art_num>\d+' + ART_SUFFIX + r')\s*\n)'
+    r')'
+)
 
-def parse_capi(body):
-    """Identifica tutti i Capi."""
-    pattern = r'Capo\s+([IVXLCDM]+)\s*\n\s*(.+?)(?=\n)'
-    return [(m.start(), m.group(1).strip(), m.group(2).strip()) for m in re.finditer(pattern, body)]
 
+def tokenize_structure(body):
+    """
+    Scansione unica del corpo: genera in ordine di posizione gli eventi
+    (tipo, inizio, fine, numero, nome) con tipo 'titolo', 'capo' o 'articolo'.
 
-def parse_articoli(body):
+    Ogni tipo segue le stesse regole di una scansione separata con
+    re.finditer: un'intestazione che inizia dentro la precedente dello
+    stesso tipo viene ignorata.
     """
-    Identifica tutti gli articoli con:
-    - Numero e titolo
-    - Riferimenti normativi (vecchio codice)
-    - Testo completo
+    last_end = {'titolo': 0, 'capo': 0, 'articolo': 0}
+    search = STRUCTURE_PATTERN.search
+    pos = 0
+    while True:
+        m = search(body, pos)
+        if m is None:
+            return
+        start = m.start()
+        pos = start + 1
+        if m.group('titolo_num') is not None:
+            kind, numero, nome = 'titolo', m.group('titolo_num').strip(), m.group('titolo_nome').strip()
+        elif m.group('capo_num') is not None:
+            kind, numero, nome = 'capo', m.group('capo_num').strip(), m.group('capo_nome').strip()
+        else:
+            kind, numero, nome = 'articolo', m.group('art_num'), None
+        if start < last_end[kind]:
+            continue
+        last_end[kind] = m.end()
+        yield kind, start, m.end(), numero, nome
+
+
+def parse_structure(body):
     """
-    # Pattern for ART. N\nTitolo\n(riferimenti)\nTesto
-    art_pattern = r'ART\.\s*(\d+(?:\s*-\s*bis|\s*-\s*ter|\s*-\s*quater|\s*-\s*quinquies|\s*-\s*sexies|\s*-\s*septies|\s*-\s*octies|\s*-\s*novies|\s*-\s*decies)?)\s*\n'
+    Identifica Titoli, Capi e articoli in una sola scansione.
 
-    matches = list(re.finditer(art_pattern, body, re.IGNORECASE))
+    Restituisce (titoli, capi, articoli): titoli e capi come tuple
+    (posizione, numero, nome); per ogni articolo numero, testo grezzo e
+    Titolo/Capo di appartenenza, risolti tenendo traccia dell'ultima
+    intestazione incontrata.
+    """
+    titoli = []
+    capi = []
     articles = []
+    current = {'titolo': None, 'capo': None}
+    for kind, start, end, numero, nome in tokenize_structure(body):
+        if kind == 'articolo':
+            articles.append({
+                'position': start,
+                'numero': re.sub(r'\s+', '', numero),  # normalize "1 - bis" -> "1-bis"
+                'titolo': current['titolo'],
+                'capo': current['capo'],
+                '_content_start': end,
+            })
+            continue
+        (titoli if kind == 'titolo' else capi).append((start, numero, nome))
+        current[kind] = (numero, nome)
 
-    for i, match in enumerate(matches):
-        art_num = re.sub(r'\s+', '', match.group(1))  # normalize "1 - bis" -> "1-bis"
-        start = match.end()
-        end = matches[i + 1].start() if i + 1 < len(matches) else len(body)
-
-        raw_content = body[start:end].strip()
-        articles.append({
-            'position': match.start(),
-            'numero': art_num,
-            'raw': raw_content
-        })
+    # Il testo di un articolo arriva fino all'intestazione del successivo
+    for i, art in enumerate(articles):
+        end = articles[i + 1]['position'] if i + 1 < len(articles) else len(body)
+        art['raw'] = body[art.pop('_content_start'):end].strip()
 
-    return articles
+    return titoli, capi, articles
 
 
 def parse_article_detail(raw):
@@ -233,52 +371,112 @@ IVA_TOPICS = {
     'volume_affari': [r'volume\s+d.affari', r'attivit.\s+separate'],
 }
 
+_TOPIC_ENGINE = TopicEngine(IVA_TOPICS, ignore_case=True)
+
 
 def extract_topics(text, titolo):
     """Identifica i temi trattati nell'articolo."""
-    combined = (titolo + ' ' + text).lower()
-    found = []
-    for topic, patterns in IVA_TOPICS.items():
-        for p in patterns:
-            if re.search(p, combined, re.IGNORECASE):
-                found.append(topic)
-                break
-    return found
+    return _TOPIC_ENGINE.classify(titolo + ' ' + text)
+
+
+# Inizio di comma: "1." o "1)" a inizio riga
+COMMA_PATTERN = re.compile(r'(?:^|\n)(\d+)\s*[.)]\s*')
+# Inizio di lettera: "a)", "b-bis)" a inizio riga
+LETTERA_PATTERN = re.compile(
+    r'(?<![^\n])[ \t]*([a-z]{1,2}(?:-(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?)\)\s*'
+)
+
+
+def _strip_span(text, start, end):
+    """Restringe [start, end) escludendo gli spazi iniziali e finali."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def extract_lettere(testo, start, end):
+    """Estrae gli offset delle lettere (a), b), ...) nel comma testo[start:end]."""
+    matches = list(LETTERA_PATTERN.finditer(testo, start, end))
+    lettere = []
+    for i, m in enumerate(matches):
+        next_start = matches[i + 1].start() if i + 1 < len(matches) else end
+        s, e = _strip_span(testo, m.end(), next_start)
+        if s < e:
+            lettere.append({'lettera': m.group(1), 'span': [s, e]})
+    return lettere
 
 
 def extract_commi(testo):
-    """Estrae i singoli commi dall'articolo."""
+    """
+    Estrae i singoli commi dall'articolo.
+
+    Per ogni comma registra un'anteprima e gli offset [inizio, fine) del
+    testo completo dentro testo_integrale, con le eventuali lettere: il
+    testo si ottiene con testo_integrale[inizio:fine] senza ri-parsare.
+    """
     commi = []
-    # Pattern: starts with digit followed by period or dot at beginning of line
-    parts = re.split(r'(?:^|\n)(\d+)\s*[.)]\s*', testo)
-
-    if len(parts) > 1:
-        # parts[0] is text before first comma (usually empty or preamble)
-        for i in range(1, len(parts), 2):
-            if i + 1 < len(parts):
-                comma_num = parts[i]
-                comma_text = parts[i + 1].strip()
-                if comma_text:
-                    commi.append({
-                        'numero': int(comma_num),
-                        'testo': comma_text.split('\n')[0][:500] + ('...' if len(comma_text) > 500 else '')  # truncated preview
-                    })
+    matches = list(COMMA_PATTERN.finditer(testo))
+
+    for i, m in enumerate(matches):
+        next_start = matches[i + 1].start() if i + 1 < len(matches) else len(testo)
+        start, end = _strip_span(testo, m.end(), next_start)
+        if start == end:
+            continue
+        comma_text = testo[start:end]
+        commi.append({
+            'numero': int(m.group(1)),
+            'testo': comma_text.split('\n')[0][:500] + ('...' if len(comma_text) > 500 else ''),  # truncated preview
+            'span': [start, end],
+            'lettere': extract_lettere(testo, start, end),
+        })
 
     return commi
 
 
+ART_NUM = r'\d+(?:\s*-\s*(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?'
+CROSS_REF_PATTERN = re.compile(
+    rf'(?:articol[oi]|art\.)\s+({ART_NUM}(?:\s*(?:,|\be\b|\bed\b)\s*{ART_NUM})*)',
+    re.IGNORECASE,
+)
+# Qualificatori che seguono il numero: "comma 3", "primo comma", "lettere a) e b)"...
+CROSS_REF_QUALIFIER = re.compile(
+    r'[\s,]*(?:(?:comm[ai]|paragraf[oi]|letter[ae]|numer[oi]|period[oi])\s+'
+    r'[\w-]+\)?(?:\s*(?:,|\be\b)\s*(?!(?:comm|paragraf|letter|numer|period)\w*\b)[\w-]+\)?)*'
+    r'|(?:primo|secondo|terzo|quarto|quinto|sesto|ultimo|penultimo)\s+(?:comma|periodo))',
+    re.IGNORECASE,
+)
+# Citazione di un'altra fonte subito dopo il riferimento: "del codice civile",
+# "della legge ...", "del medesimo testo unico delle imposte sui redditi"...
+CROSS_REF_EXTERNAL = re.compile(
+    r'[\s,]*(?:(?:del|della|dello|dei|degli|delle|al|alla|dal|dalla)\s+)?(?:medesim[oa]\s+)?'
+    r'(?:codice|legge|decreto|d\.\s*l|d\.\s*lgs|d\.\s*p\.\s*r|regolamento|trattato|'
+    r'testo\s+unico|direttiva|convenzione|tariffa|tuir)\b',
+    re.IGNORECASE,
+)
+
+
 def extract_cross_references(testo):
-    """Estrae i riferimenti incrociati ad altri articoli del TU."""
+    """
+    Estrae i riferimenti incrociati ad altri articoli del TU.
+    I riferimenti seguiti dalla citazione di un'altra fonte (codice civile,
+    leggi, decreti, regolamenti UE, TUIR...) vengono scartati.
+    """
     refs = set()
     # "articolo X" or "articoli X, Y e Z" within the TU
-    matches = re.finditer(
-        r'(?:articol[oi]|art\.)\s+(\d+(?:\s*-\s*(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?)',
-        testo, re.IGNORECASE
-    )
-    for m in matches:
-        ref = re.sub(r'\s+', '', m.group(1))
-        refs.add(ref)
-    return sorted(refs)
+    for m in CROSS_REF_PATTERN.finditer(testo):
+        pos = m.end()
+        while True:
+            q = CROSS_REF_QUALIFIER.match(testo, pos)
+            if not q or q.end() == pos:
+                break
+            pos = q.end()
+        if CROSS_REF_EXTERNAL.match(testo, pos):
+            continue
+        for num in re.findall(ART_NUM, m.group(1)):
+            refs.add(re.sub(r'\s+', '', num))
+    return sorted(refs, key=lambda r: (int(re.match(r'\d+', r).group()), r))
 
 
 def generate_search_text(titolo, testo, topics):
@@ -327,39 +525,272 @@ def generate_search_text(titolo, testo, topics):
 
 # ─── Step 6: Parse Tabelle ──────────────────────────────────────────────────
 
+# Parti della Tabella A, con descrizione e aliquota di default
+TABELLA_A_PARTI = {
+    'Parte I': ('Prodotti agricoli e ittici', None),
+    'Parte II': ('Beni e servizi soggetti all\'aliquota del 4%', 4),
+    'Parte II-bis': ('Beni e servizi soggetti all\'aliquota del 5%', 5),
+    'Parte III': ('Beni e servizi soggetti all\'aliquota del 10%', 10),
+}
+
+# Intestazioni delle tabelle e delle parti, su una riga propria
+TABELLA_HEADING_PATTERN = re.compile(
+    r'^[ \t]*(?:(?P<tabella>Tabella\s+(?P<lettera>[AB]))|Parte\s+(?P<parte>III|II[ \t-]*bis|II|I))\b[ \t*]*$',
+    re.MULTILINE | re.IGNORECASE,
+)
+# Voce numerata: "1)", "12-bis)" a inizio riga
+VOCE_PATTERN = re.compile(
+    r'^[ \t]*(\d+(?:[ \t]*-[ \t]*(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?)\)[ \t]*',
+    re.MULTILINE,
+)
+ALIQUOTA_PATTERN = re.compile(r'(\d+(?:,\d+)?)\s*(?:per\s*cento|%)', re.IGNORECASE)
+
+# Parole ignorate nell'indice delle voci
+STOPWORDS = {
+    'di', 'del', 'dello', 'della', 'dei', 'degli', 'delle', 'da', 'dal', 'dallo',
+    'dalla', 'dai', 'dagli', 'dalle', 'in', 'nel', 'nello', 'nella', 'nei', 'negli',
+    'nelle', 'a', 'al', 'allo', 'alla', 'ai', 'agli', 'alle', 'su', 'sul', 'sulla',
+    'sui', 'sugli', 'sulle', 'con', 'per', 'tra', 'fra', 'il', 'lo', 'la', 'i', 'gli',
+    'le', 'un', 'uno', 'una', 'e', 'ed', 'o', 'od', 'non', 'che', 'cui', 'se', 'anche',
+    'come', 'ove', 'quale', 'quali', 'loro', 'suo', 'sua', 'suoi', 'sue', 'esclusi',
+    'escluse', 'compresi', 'comprese', 'altri', 'altre', 'nonché', 'nonche',
+}
+
+
+def normalize_terms(text):
+    """
+    Termini normalizzati per l'indice delle aliquote: minuscolo, senza accenti,
+    senza stopword e con la vocale finale rimossa (pomodori -> pomodor).
+    """
+    text = unicodedata.normalize('NFD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    terms = []
+    for token in re.findall(r'[a-z0-9]+', text):
+        if token in STOPWORDS or len(token) < 3 or token.isdigit():
+            continue
+        if len(token) > 4 and token[-1] in 'aeiou':
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def _parse_voci(text, prefix, tabella, parte, aliquota):
+    """Estrae le voci numerate di una tabella o di una parte."""
+    matches = list(VOCE_PATTERN.finditer(text))
+    voci = []
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        descrizione = re.sub(r'\s+', ' ', text[m.end():end]).strip().rstrip(';.').strip()
+        if not descrizione:
+            continue
+        numero = re.sub(r'\s+', '', m.group(1))
+        voci.append({
+            'id': f"{prefix}_{numero}",
+            'tabella': tabella,
+            'parte': parte,
+            'numero': numero,
+            'aliquota': aliquota,
+            'descrizione': descrizione,
+        })
+    return voci
+
+
 def parse_tabelle(rest_text):
-    """Parsa le Tabelle A e B con le aliquote."""
+    """
+    Parsa le Tabelle A (Parti I, II, II-bis, III) e B con le aliquote.
+
+    Per ogni parte registra descrizione, aliquota e le singole voci numerate.
+    L'aliquota viene letta dall'intestazione della parte ("... del 4 per
+    cento"); se manca si usa quella di default della parte.
+    """
     tabelle = {}
 
-    # Tabella A - Parti I, II, III
-    parts_map = {
-        'Parte I': 'Prodotti agricoli e ittici',
-        'Parte II': 'Beni e servizi soggetti all\'aliquota del 4%',
-        'Parte II-bis': 'Beni e servizi soggetti all\'aliquota del 5%',
-        'Parte III': 'Beni e servizi soggetti all\'aliquota del 10%',
-    }
+    # Le note finali non fanno parte delle tabelle
+    note_match = re.search(r'\nNOTE\s+[Ab]', rest_text)
+    if note_match:
+        rest_text = rest_text[:note_match.start()]
+
+    headings = []
+    tabella_corrente = None
+    for m in TABELLA_HEADING_PATTERN.finditer(rest_text):
+        if m.group('tabella'):
+            tabella_corrente = m.group('lettera').upper()
+            if tabella_corrente == 'B':
+                headings.append((m, 'Tabella B'))
+        elif tabella_corrente == 'A':
+            parte = re.sub(r'[ \t-]*bis$', '-bis', m.group('parte'), flags=re.IGNORECASE)
+            headings.append((m, f"Parte {parte.upper().replace('-BIS', '-bis')}"))
+
+    for i, (m, key) in enumerate(headings):
+        end = headings[i + 1][0].start() if i + 1 < len(headings) else len(rest_text)
+        section = rest_text[m.end():end]
+        if key == 'Tabella B':
+            tabella, parte, prefix = 'B', None, 'tabB'
+        else:
+            tabella, parte = 'A', key.split(' ', 1)[1]
+            prefix = f"tabA_{parte}"
+
+        if key in tabelle:
+            # intestazione ripetuta (es. header di pagina): le voci che seguono
+            # continuano la parte già aperta
+            tab = tabelle[key]
+            known = {v['id'] for v in tab['voci']}
+            tab['voci'].extend(v for v in _parse_voci(section, prefix, tabella, parte, tab['aliquota'])
+                               if v['id'] not in known)
+            continue
 
-    for part_key, part_desc in parts_map.items():
-        pattern = rf'{re.escape(part_key)}\s*\*{{0,2}}\s*\n\s*{re.escape(part_desc.split("(")[0].strip().split("Beni")[0].strip()) if "Beni" in part_desc else re.escape(part_desc)}'
-        match = re.search(part_key.replace('-', r'[\s-]*'), rest_text, re.IGNORECASE)
-        if match:
-            tabelle[part_key] = {
-                'descrizione': part_desc,
-                'nota': f'Vedi Tabella A - {part_key} del Testo Unico IVA'
-            }
+        first_voce = VOCE_PATTERN.search(section)
+        intestazione = section[:first_voce.start() if first_voce else len(section)]
+        aliquota_match = ALIQUOTA_PATTERN.search(intestazione)
 
-    # Tabella B
-    tab_b_match = re.search(r'Tabella\s+B', rest_text, re.IGNORECASE)
-    if tab_b_match:
-        tabelle['Tabella B'] = {
-            'descrizione': 'Prodotti e servizi soggetti ad aliquota specifica',
-            'nota': 'Vedi Tabella B del Testo Unico IVA'
+        if key == 'Tabella B':
+            descrizione = 'Prodotti e servizi soggetti ad aliquota specifica'
+            aliquota = None
+            nota = 'Vedi Tabella B del Testo Unico IVA'
+        else:
+            descrizione, aliquota = TABELLA_A_PARTI[key]
+            nota = f'Vedi Tabella A - {key} del Testo Unico IVA'
+        if aliquota_match:
+            aliquota = float(aliquota_match.group(1).replace(',', '.'))
+            aliquota = int(aliquota) if aliquota.is_integer() else aliquota
+
+        tabelle[key] = {
+            'descrizione': descrizione,
+            'nota': nota,
+            'tabella': tabella,
+            'aliquota': aliquota,
+            'voci': _parse_voci(section, prefix, tabella, parte, aliquota),
         }
 
     return tabelle
 
 
-# ─── Step 7: Build the database ─────────────────────────────────────────────
+def build_aliquote_index(tabelle):
+    """
+    Indice invertito termine normalizzato -> voci delle tabelle, per
+    rispondere a "aliquota per X" con una lookup locale. Le stopword sono
+    salvate con l'indice, così chi normalizza le query (es. il sito web)
+    usa le stesse di normalize_terms.
+    """
+    termini = {}
+    voci = {}
+    for key, tab in tabelle.items():
+        for voce in tab.get('voci', []):
+            voci[voce['id']] = {
+                'tabella': key if voce['tabella'] == 'B' else f"Tabella A - {key}",
+                'numero': voce['numero'],
+                'aliquota': voce['aliquota'],
+                'descrizione': voce['descrizione'],
+            }
+            for term in set(normalize_terms(voce['descrizione'])):
+                termini.setdefault(term, []).append(voce['id'])
+    return {'stopwords': sorted(STOPWORDS), 'termini': dict(sorted(termini.items())), 'voci': voci}
+
+
+def cerca_aliquota(indice, query, limit=5):
+    """
+    Cerca nell'indice delle aliquote le voci più pertinenti alla query.
+    Ogni termine in comune pesa in modo inverso alla sua frequenza.
+    """
+    scores = {}
+    for term in set(normalize_terms(query)):
+        postings = indice['termini'].get(term, [])
+        for voce_id in postings:
+            scores[voce_id] = scores.get(voce_id, 0.0) + 1.0 / len(postings)
+    ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:limit]
+    return [{'id': voce_id, 'score': round(score, 4), **indice['voci'][voce_id]}
+            for voce_id, score in ranked]
+
+
+# ─── Step 7: Cross-reference graph ──────────────────────────────────────────
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 100
+PAGERANK_TOL = 1e-10
+
+
+def to_csr(adjacency):
+    """Converte una lista di adiacenza (lista di liste di indici) in formato CSR."""
+    indptr = [0]
+    indices = []
+    for targets in adjacency:
+        indices.extend(targets)
+        indptr.append(len(indices))
+    return {'indptr': indptr, 'indices': indices}
+
+
+def pagerank(forward, n):
+    """
+    PageRank sul grafo orientato dei riferimenti (articolo citante -> citato).
+    La massa dei nodi senza archi uscenti viene ridistribuita uniformemente.
+    """
+    if n == 0:
+        return []
+    rank = [1.0 / n] * n
+    for _ in range(PAGERANK_ITERATIONS):
+        dangling = sum(rank[i] for i in range(n) if not forward[i])
+        base = (1.0 - PAGERANK_DAMPING) / n + PAGERANK_DAMPING * dangling / n
+        new_rank = [base] * n
+        for i, targets in enumerate(forward):
+            if targets:
+                share = PAGERANK_DAMPING * rank[i] / len(targets)
+                for j in targets:
+                    new_rank[j] += share
+        delta = sum(abs(a - b) for a, b in zip(new_rank, rank))
+        rank = new_rank
+        if delta < PAGERANK_TOL:
+            break
+    return rank
+
+
+def build_reference_graph(articles_db):
+    """
+    Risolve i riferimenti interni sugli articoli esistenti e precalcola le
+    strutture usate dal retrieval per espandere/pesare gli articoli collegati:
+    adiacenza CSR in avanti (citati) e all'indietro (citanti), vicinato a 1 e
+    2 passi (non orientato) e centralità PageRank normalizzata a [0, 1].
+    Tutti gli array sono indicizzati per posizione in 'nodi'.
+    """
+    nodes = [art['id'] for art in articles_db]
+    position = {art_id: i for i, art_id in enumerate(nodes)}
+    n = len(nodes)
+
+    forward = [[] for _ in range(n)]
+    reverse = [[] for _ in range(n)]
+    for i, art in enumerate(articles_db):
+        for ref in art['riferimenti_interni']:
+            j = position.get(f"art_{ref}")
+            if j is None or j == i:
+                continue
+            forward[i].append(j)
+            reverse[j].append(i)
+    forward = [sorted(set(t)) for t in forward]
+    reverse = [sorted(set(t)) for t in reverse]
+
+    hop1 = [sorted(set(forward[i]) | set(reverse[i])) for i in range(n)]
+    hop2 = []
+    for i in range(n):
+        near = set(hop1[i])
+        second = set()
+        for j in hop1[i]:
+            second.update(hop1[j])
+        hop2.append(sorted(second - near - {i}))
+
+    rank = pagerank(forward, n)
+    top = max(rank) if rank else 0.0
+    centrality = [round(r / top, 6) if top else 0.0 for r in rank]
+
+    return {
+        'nodi': nodes,
+        'citati': to_csr(forward),
+        'citanti': to_csr(reverse),
+        'vicini_1': to_csr(hop1),
+        'vicini_2': to_csr(hop2),
+        'centralita': centrality,
+    }
+
+
+# ─── Step 8: Build the database ─────────────────────────────────────────────
 
 def roman_to_int(roman):
     """Converte numeri romani in interi."""
@@ -376,85 +807,112 @@ def roman_to_int(roman):
     return result
 
 
-def build_database():
-    print("Estrazione testo dal PDF...")
-    raw_text = extract_text(PDF_PATH)
-
-    print("Pulizia testo...")
-    text = clean_text(raw_text)
+def build_database(profiler=None):
+    """
+    Costruisce il database del TU IVA. Se viene passato un BuildProfiler,
+    registra tempi e memoria di ogni fase e i tempi per articolo.
+    """
+    if profiler is None:
+        profiler = BuildProfiler('testo_unico_iva', enabled=False)
+
+    print(f"Estrazione testo dal PDF ({EXTRACT_WORKERS} processi)...")
+    # Estrazione e pulizia in streaming: le pagine non vengono mai
+    # accumulate, solo il testo già pulito
+    if PAGE_CACHE_DIR:
+        pages = iter_cached_page_texts(
+            PDF_PATH, PAGE_CACHE_DIR,
+            extract=lambda: iter_extracted_pages(PDF_PATH, workers=EXTRACT_WORKERS),
+            backend=PDF_BACKEND,
+        )
+    else:
+        pages = iter_extracted_pages(PDF_PATH, workers=EXTRACT_WORKERS)
+    with profiler.stage('estrazione_pulizia_testo'):
+        text = ''.join(iter_clean_text(pages))
+    profiler.count('caratteri_testo', len(text))
 
     print("Separazione corpo principale / tabelle / note...")
-    body, rest = separate_sections(text)
+    with profiler.stage('separazione_sezioni'):
+        body, rest = separate_sections(text)
 
     print("Parsing struttura...")
-    titoli = parse_titoli(body)
-    capi = parse_capi(body)
-    raw_articles = parse_articoli(body)
+    with profiler.stage('parsing_struttura'):
+        titoli, capi, raw_articles = parse_structure(body)
+    profiler.count('articoli', len(raw_articles))
 
     print(f"  Trovati {len(titoli)} Titoli, {len(capi)} Capi, {len(raw_articles)} Articoli")
 
-    # Build hierarchical context
-    # For each article, determine which Titolo and Capo it belongs to
-    def find_parent(position, parents):
-        """Trova il genitore più vicino (prima della posizione dell'articolo)."""
-        best = None
-        for pos, num, name in parents:
-            if pos < position:
-                best = (num, name)
-        return best
-
     print("Costruzione database articoli...")
     articles_db = []
 
-    for art in raw_articles:
-        titolo_parent = find_parent(art['position'], titoli)
-        capo_parent = find_parent(art['position'], capi)
-
-        titolo_art, ref_text, rif_normativi, testo = parse_article_detail(art['raw'])
-        old_refs = extract_old_dpr_references(ref_text) if ref_text else []
-        topics = extract_topics(testo, titolo_art)
-        commi = extract_commi(testo)
-        cross_refs = extract_cross_references(testo)
-        search_text = generate_search_text(titolo_art, testo, topics)
-
-        article_entry = {
-            'id': f"art_{art['numero']}",
-            'articolo': art['numero'],
-            'titolo': titolo_art,
-            'norma': 'D.Lgs. 19 gennaio 2026, n. 10 - Testo Unico IVA',
-            'struttura': {
-                'titolo': {
-                    'numero': titolo_parent[0] if titolo_parent else None,
-                    'nome': titolo_parent[1] if titolo_parent else None
-                },
-                'capo': {
-                    'numero': capo_parent[0] if capo_parent else None,
-                    'nome': capo_parent[1] if capo_parent else None
+    with profiler.stage('costruzione_articoli'):
+        for art in raw_articles:
+            art_id = f"art_{art['numero']}"
+            with profiler.item('articoli', art_id):
+                titolo_parent = art['titolo']
+                capo_parent = art['capo']
+
+                titolo_art, ref_text, rif_normativi, testo = parse_article_detail(art['raw'])
+                old_refs = extract_old_dpr_references(ref_text) if ref_text else []
+                with profiler.item('articoli/temi', art_id):
+                    topics = extract_topics(testo, titolo_art)
+                with profiler.item('articoli/commi', art_id):
+                    commi = extract_commi(testo)
+                with profiler.item('articoli/riferimenti', art_id):
+                    cross_refs = extract_cross_references(testo)
+                search_text = generate_search_text(titolo_art, testo, topics)
+
+                article_entry = {
+                    'id': art_id,
+                    'articolo': art['numero'],
+                    'titolo': titolo_art,
+                    'norma': 'D.Lgs. 19 gennaio 2026, n. 10 - Testo Unico IVA',
+                    'struttura': {
+                        'titolo': {
+                            'numero': titolo_parent[0] if titolo_parent else None,
+                            'nome': titolo_parent[1] if titolo_parent else None
+                        },
+                        'capo': {
+                            'numero': capo_parent[0] if capo_parent else None,
+                            'nome': capo_parent[1] if capo_parent else None
+                        }
+                    },
+                    'riferimenti_vecchio_codice': {
+                        'testo_completo': ref_text if ref_text else None,
+                        'riferimenti_strutturati': old_refs
+                    },
+                    'testo_integrale': testo,
+                    'commi': commi,
+                    'numero_commi': len(commi),
+                    'temi': topics,
+                    'riferimenti_interni': cross_refs,  # articoli citati nel testo
+                    'metadati_rag': {
+                        'search_text': search_text,
+                        'citazione_formale': f"Art. {art['numero']} D.Lgs. 10/2026 (Testo Unico IVA)",
+                        'citazione_breve': f"Art. {art['numero']} TU IVA",
+                        'parole_chiave': topics,
+                        'lunghezza_caratteri': len(testo),
+                    }
                 }
-            },
-            'riferimenti_vecchio_codice': {
-                'testo_completo': ref_text if ref_text else None,
-                'riferimenti_strutturati': old_refs
-            },
-            'testo_integrale': testo,
-            'commi': commi,
-            'numero_commi': len(commi),
-            'temi': topics,
-            'riferimenti_interni': cross_refs,  # articoli citati nel testo
-            'metadati_rag': {
-                'search_text': search_text,
-                'citazione_formale': f"Art. {art['numero']} D.Lgs. 10/2026 (Testo Unico IVA)",
-                'citazione_breve': f"Art. {art['numero']} TU IVA",
-                'parole_chiave': topics,
-                'lunghezza_caratteri': len(testo),
-            }
-        }
 
-        articles_db.append(article_entry)
+                articles_db.append(article_entry)
+
+    # Risolve i riferimenti interni (solo articoli esistenti) prima di costruire
+    # qualsiasi indice derivato, così articoli, indice tematico e grafo coincidono
+    existing = {art['id'] for art in articles_db}
+    cross_ref_graph = {}
+    for art in articles_db:
+        art['riferimenti_interni'] = [r for r in art['riferimenti_interni'] if f"art_{r}" in existing]
+        if art['riferimenti_interni']:
+            cross_ref_graph[art['id']] = list(art['riferimenti_interni'])
+    with profiler.stage('grafo_riferimenti'):
+        reference_graph = build_reference_graph(articles_db)
 
     # Parse tabelle
     print("Parsing Tabelle...")
-    tabelle = parse_tabelle(rest)
+    with profiler.stage('parsing_tabelle'):
+        tabelle = parse_tabelle(rest)
+    n_voci = sum(len(t['voci']) for t in tabelle.values())
+    print(f"  Trovate {len(tabelle)} tabelle/parti, {n_voci} voci")
 
     # Build complete database
     database = {
@@ -476,15 +934,17 @@ def build_database():
                     'temi - classificazione tematica per filtraggio',
                     'riferimenti_vecchio_codice - per collegare interpelli al vecchio DPR 633/72',
                     'riferimenti_interni - grafo di connessioni tra articoli',
-                    'commi - per retrieval granulare a livello di comma',
+                    'indice_grafo - adiacenza CSR (citati/citanti), vicini a 1 e 2 passi e centralità per articolo',
+                    'commi - per retrieval granulare a livello di comma (span = offset in testo_integrale)',
                     'struttura.titolo/capo - per contestualizzazione gerarchica'
                 ],
                 'suggerimento_chunking': 'Ogni articolo è un chunk naturale. Per articoli lunghi, spezzare per comma mantenendo titolo e struttura come contesto.',
-                'tabelle_aliquote': 'Le Tabelle A (Parti I-III) e B contengono le specifiche aliquote per categoria merceologica. Vanno indicizzate separatamente.'
+                'tabelle_aliquote': 'Le Tabelle A (Parti I-III) e B contengono le specifiche aliquote per categoria merceologica. Le singole voci sono in tabelle_riferimento.*.voci; indice_aliquote mappa i termini normalizzati alle voci (vedi cerca_aliquota).'
             }
         },
         'articoli': articles_db,
         'tabelle_riferimento': tabelle,
+        'indice_aliquote': build_aliquote_index(tabelle),
         'indice_tematico': {}
     }
 
@@ -501,12 +961,8 @@ def build_database():
             })
     database['indice_tematico'] = thematic_index
 
-    # Build cross-reference graph
-    cross_ref_graph = {}
-    for art in articles_db:
-        if art['riferimenti_interni']:
-            cross_ref_graph[art['id']] = art['riferimenti_interni']
     database['grafo_riferimenti_interni'] = cross_ref_graph
+    database['indice_grafo'] = reference_graph
 
     # Build old-to-new mapping
     old_to_new = {}
@@ -522,17 +978,66 @@ def build_database():
             })
     database['mappatura_vecchio_nuovo_codice'] = old_to_new
 
+    # Interpelli collegati agli articoli tramite la mappatura (hash join, vedi tu_links.py)
+    interpelli = load_interpelli(INTERPELLI_PATH) if INTERPELLI_PATH else []
+    if interpelli:
+        index = build_link_index(old_to_new)
+        for entry in interpelli:
+            link_entry(entry, index)
+    database['interpelli_collegati'] = reverse_links(interpelli)
+    database['metadata']['collegamenti_interpelli'] = link_counts(interpelli)
+
     return database
 
 
+def load_interpelli(path):
+    """
+    Voci del database degli interpelli nella versione più recente scritta da
+    scarica_interpelli.py accanto a path (JSON, JSON Lines o database diviso,
+    di cui bastano i metadati caldi; vedi split_store.latest_database).
+    Nessuna versione → [] e un avviso.
+    """
+    found = latest_database(path)
+    if found is None:
+        print(f"  Attenzione: database degli interpelli non trovato ({path}), "
+              f"nessun interpello collegato")
+        return []
+    fmt, source = found
+    if fmt == 'jsonl':
+        return list(iter_ndjson(source))
+    with open(source, encoding='utf-8') as f:
+        return json.load(f)['interpelli']
+
+
+def iter_store_records(db):
+    """Record del contenitore binario: uno per articolo e uno per ogni altra sezione."""
+    for art in db['articoli']:
+        yield art['id'], art
+    for key, value in db.items():
+        if key != 'articoli':
+            yield f"@{key}", value
+
+
+def write_record_store(db, path):
+    """Scrive il database nel contenitore binario ad accesso diretto."""
+    meta = {
+        'norma': db['metadata']['norma'],
+        'articoli': [art['id'] for art in db['articoli']],
+    }
+    return write_store(path, iter_store_records(db), meta=meta)
+
+
 # ─── Main ────────────────────────────────────────────────────────────────────
 
 if __name__ == '__main__':
-    db = build_database()
+    profiler = BuildProfiler('testo_unico_iva', enabled=bool(PROFILE_REPORT_PATH),
+                             trace_memory=PROFILE_MEMORY)
+    db = build_database(profiler)
 
     print(f"\nSalvataggio in {OUTPUT_PATH}...")
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(db, f, ensure_ascii=False, indent=2)
+    with profiler.stage('salvataggio_json'):
+        with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+            json.dump(db, f, ensure_ascii=False, indent=2)
 
     # Summary
     print("\n" + "=" * 60)
@@ -543,7 +1048,10 @@ if __name__ == '__main__':
     print(f"Capi:              {db['metadata']['numero_capi']}")
     print(f"Temi indicizzati:  {len(db['indice_tematico'])}")
     print(f"Mapping vecchio→nuovo: {len(db['mappatura_vecchio_nuovo_codice'])} riferimenti")
-    print(f"Grafo riferimenti:     {len(db['grafo_riferimenti_interni'])} articoli con cross-ref")
+    print(f"Interpelli collegati:  {db['metadata']['collegamenti_interpelli']['interpelli_collegati']} "
+          f"su {len(db['interpelli_collegati'])} articoli")
+    print(f"Grafo riferimenti:     {len(db['grafo_riferimenti_interni'])} articoli con cross-ref, "
+          f"{len(db['indice_grafo']['citati']['indices'])} archi")
 
     # Show some examples
     print("\n--- Esempio articolo (Art. 1) ---")
@@ -560,6 +1068,14 @@ if __name__ == '__main__':
             print(f"  Art. {a['articolo']} - {a['titolo']}")
 
     print(f"\nFile salvato: {OUTPUT_PATH}")
-    import os
     size = os.path.getsize(OUTPUT_PATH)
     print(f"Dimensione: {size / 1024 / 1024:.1f} MB")
+
+    if OUTPUT_STORE_PATH:
+        with profiler.stage('salvataggio_contenitore'):
+            n_records = write_record_store(db, OUTPUT_STORE_PATH)
+        size = os.path.getsize(OUTPUT_STORE_PATH)
+        print(f"Contenitore binario: {OUTPUT_STORE_PATH} ({n_records} record, {size / 1024 / 1024:.1f} MB)")
+
+    if PROFILE_REPORT_PATH:
+        profiler.write_report(PROFILE_REPORT_PATH)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Cache dei PDF degli interpelli indirizzata per contenuto.
+
+Ogni PDF è salvato una sola volta come blob/<sha[:2]>/<sha256>.pdf; il file
+manifest.json associa a ogni interpello (es. "interpello_2024_0001") URL,
+SHA-256, dimensione, content type, data di scaricamento e validatori HTTP
+(ETag / Last-Modified). Un documento ripubblicato con un altro numero punta
+allo stesso blob.
+
+Una voce della cache è considerata valida solo se il blob esiste, ha la
+dimensione e l'hash registrati ed è un PDF (intestazione "%PDF-" e
+marcatore "%%EOF" finale): pagine HTML di errore o file troncati vengono
+scartati prima di arrivare a pdfplumber.
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from pdf_text import file_sha256
+
+MANIFEST_VERSION = 1
+
+# File scaricati con la vecchia cache (un file per interpello)
+_LEGACY_NAME = re.compile(r'^(interpello_\d{4}_\d{4})\.pdf$')
+
+
+def looks_like_pdf(path):
+    """Controllo economico di integrità: intestazione %PDF- e %%EOF in coda."""
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            head = f.read(1024)
+            f.seek(max(0, size - 2048))
+            tail = f.read()
+    except OSError:
+        return False
+    return b'%PDF-' in head and b'%%EOF' in tail
+
+
+class PdfCache:
+    """Cache indirizzata per contenuto con manifest; sicura tra thread."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.blob_dir = self.root / 'blob'
+        self.part_dir = self.root / 'parziali'
+        self.manifest_path = self.root / 'manifest.json'
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.part_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._verified = set()   # sha già verificati in questa esecuzione
+        self.entries = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self.entries = json.load(f).get('voci', {})
+
+    # ─── Percorsi ───────────────────────────────────────────────────────
+
+    def blob_path(self, sha):
+        return self.blob_dir / sha[:2] / f"{sha}.pdf"
+
+    def part_path(self, key):
+        """File parziale di un download in corso (riprendibile)."""
+        return self.part_dir / f"{key}.part"
+
+    # ─── Lettura ────────────────────────────────────────────────────────
+
+    def entry(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def _verify(self, entry):
+        sha = entry['sha256']
+        if sha in self._verified:
+            return True
+        path = self.blob_path(sha)
+        try:
+            ok = (path.stat().st_size == entry['size']
+                  and looks_like_pdf(path)
+                  and file_sha256(path) == sha)
+        except OSError:
+            ok = False
+        if ok:
+            with self._lock:
+                self._verified.add(sha)
+        return ok
+
+    def lookup(self, key):
+        """
+        Percorso del PDF in cache per l'interpello, verificato tramite
+        dimensione, firma PDF e hash; None se assente o corrotto (la voce
+        corrotta viene rimossa dal manifest).
+        """
+        entry = self.entry(key)
+        if entry is None:
+            return None
+        if self._verify(entry):
+            return self.blob_path(entry['sha256'])
+        with self._lock:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+        return None
+
+    # ─── Scrittura ──────────────────────────────────────────────────────
+
+    def put(self, key, src_path, url, content_type=None, etag=None, last_modified=None):
+        """
+        Sposta il file scaricato nella cache (se non è già presente lo
+        stesso contenuto) e registra la voce nel manifest. Il file deve
+        essere già stato validato con looks_like_pdf().
+        """
+        src_path = Path(src_path)
+        sha = file_sha256(src_path)
+        size = src_path.stat().st_size
+        dest = self.blob_path(sha)
+        if dest.exists() and (sha in self._verified or file_sha256(dest) == sha):
+            src_path.unlink()  # contenuto già presente (documento ripubblicato)
+        else:
+            dest.parent.mkdir(exist_ok=True)
+            src_path.replace(dest)
+        entry = {
+            'url': url,
+            'sha256': sha,
+            'size': size,
+            'content_type': content_type,
+            'scaricato_il': datetime.now().isoformat(timespec='seconds'),
+            'etag': etag,
+            'last_modified': last_modified,
+        }
+        with self._lock:
+            self.entries[key] = entry
+            self._verified.add(sha)
+        return dest
+
+    def save(self):
+        """Scrive il manifest in modo atomico."""
+        with self._lock:
+            data = {'versione': MANIFEST_VERSION, 'voci': dict(sorted(self.entries.items()))}
+        tmp = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        tmp.replace(self.manifest_path)
+
+    def prune(self):
+        """Elimina i blob non più referenziati dal manifest."""
+        with self._lock:
+            referenced = {e['sha256'] for e in self.entries.values()}
+        removed = 0
+        for blob in self.blob_dir.glob('*/*.pdf'):
+            if blob.stem not in referenced:
+                blob.unlink()
+                removed += 1
+        return removed
+
+    def migrate_legacy(self, urls):
+        """
+        Importa i PDF della vecchia cache (interpello_<anno>_<numero>.pdf ed
+        eventuale .meta.json) nel formato indirizzato per contenuto.
+        urls: {chiave: url} usato per le voci senza metadati.
+        Restituisce il numero di file importati; i file non validi vengono
+        eliminati.
+        """
+        imported = 0
+        for path in sorted(self.root.glob('interpello_*.pdf')):
+            m = _LEGACY_NAME.match(path.name)
+            if not m:
+                continue
+            key = m.group(1)
+            meta_path = path.with_name(path.name + '.meta.json')
+            meta = {}
+            if meta_path.exists():
+                try:
+                    with open(meta_path, encoding='utf-8') as f:
+                        meta = json.load(f)
+                except ValueError:
+                    meta = {}
+            if key not in self.entries and looks_like_pdf(path):
+                self.put(key, path, meta.get('url') or urls.get(key),
+                         etag=meta.get('etag'), last_modified=meta.get('last_modified'))
+                imported += 1
+            else:
+                path.unlink()
+            meta_path.unlink(missing_ok=True)
+        for stale in self.root.glob('interpello_*.pdf.*'):
+            stale.unlink()  # .part/.tmp della vecchia cache
+        return imported
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Estrazione del testo dai PDF (Gazzetta Ufficiale e interpelli AdE).
+Funzioni condivise da parse_testo_unico_iva.py e scarica_interpelli.py.
+
+Due backend di estrazione:
+- 'pdfplumber': ricostruisce il layout carattere per carattere (lento);
+- 'pdfium': testo della pagina da pypdfium2 (già installato con
+  pdfplumber >= 0.11), decine di volte più veloce. Le pagine illeggibili
+  (caratteri di controllo, "(cid:NN)", ...) vengono riestratte con
+  pdfplumber; quelle vuote solo se tutto il testo estratto è vuoto.
+
+Le pagine vengono lette in streaming: ogni pagina viene estratta, restituita
+e subito liberata dagli oggetti di layout che pdfplumber tiene in cache,
+così la memoria resta costante anche su PDF di centinaia di pagine.
+
+Il testo estratto può essere salvato in una cache su disco indicizzata
+dall'hash SHA-256 del PDF e dalla versione/impostazioni dell'estrattore:
+una nuova esecuzione sullo stesso PDF non apre nemmeno pdfplumber.
+
+Confronto dei backend sul proprio corpus (pagine/s e somiglianza del testo
+rispetto a pdfplumber):
+    python pdf_text.py cartella_pdf/ [altro.pdf ...] [--backend pdfium]
+"""
+
+import argparse
+import difflib
+import gzip
+import hashlib
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+import pdfplumber
+
+# Versione dell'estrattore: incrementare quando cambia il modo in cui
+# il testo viene estratto, per invalidare le cache esistenti
+EXTRACTOR_VERSION = 1
+# Parametri passati a page.extract_text() (fanno parte della chiave di cache)
+EXTRACT_TEXT_KWARGS = {}
+
+DEFAULT_BACKEND = 'pdfplumber'
+# Backend usato per le pagine che il backend veloce non estrae bene
+FALLBACK_BACKEND = 'pdfplumber'
+# Quota massima di caratteri sospetti prima di considerare una pagina illeggibile
+GARBLED_MAX_RATIO = 0.01
+
+_GARBLED_CHARS = re.compile(r'[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]|\(cid:\d+\)')
+
+
+def _release_page(page):
+    """Libera gli oggetti di layout (caratteri, linee, ...) in cache sulla pagina."""
+    close = getattr(page, 'close', None)  # pdfplumber >= 0.11
+    if close is not None:
+        close()
+    else:
+        page.flush_cache()
+
+
+def _pdfplumber_page_text(page):
+    try:
+        return page.extract_text(**EXTRACT_TEXT_KWARGS)
+    finally:
+        _release_page(page)
+
+
+def _pdfplumber_pages(pdf_path, start, end):
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = pdf.pages
+        for idx in range(start, min(end, len(pages))):
+            yield idx, _pdfplumber_page_text(pages[idx])
+
+
+def _pdfium_pages(pdf_path, start, end):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for idx in range(start, min(end, len(pdf))):
+            page = pdf[idx]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_bounded()
+            finally:
+                textpage.close()
+                page.close()
+            # stesse convenzioni di pdfplumber: \n come fine riga e "-\n"
+            # per la sillabazione (pdfium la segnala con \x02 senza andare a capo)
+            yield idx, text.replace('\r\n', '\n').replace('\x02', '-\n')
+    finally:
+        pdf.close()
+
+
+BACKENDS = {
+    'pdfplumber': _pdfplumber_pages,
+    'pdfium': _pdfium_pages,
+}
+
+
+def looks_garbled(text):
+    """True se la pagina è piena di caratteri non testuali (una pagina vuota non lo è)."""
+    if not text:
+        return False
+    return len(_GARBLED_CHARS.findall(text)) > GARBLED_MAX_RATIO * len(text)
+
+
+def iter_page_texts(pdf_path, start=0, end=None, backend=DEFAULT_BACKEND, stats=None):
+    """
+    Genera il testo delle pagine [start, end) del PDF, una alla volta.
+    Le pagine senza testo vengono saltate.
+
+    Con un backend diverso da FALLBACK_BACKEND le pagine illeggibili vengono
+    riestratte con pdfplumber (il controllo è per pagina, così lo streaming
+    resta a memoria costante). Le pagine vuote sono normali (es. pagine
+    bianche) e vengono riestratte solo se nessuna pagina ha dato testo.
+    stats, se passato, riceve i contatori 'pagine' e 'fallback'.
+    """
+    if end is None:
+        end = sys.maxsize
+    fallback = None
+    blank = []          # pagine vuote finché non compare del testo
+    has_text = False
+
+    def reextract(idx):
+        nonlocal fallback
+        if fallback is None:
+            fallback = pdfplumber.open(pdf_path)
+        if stats is not None:
+            stats['fallback'] = stats.get('fallback', 0) + 1
+        return _pdfplumber_page_text(fallback.pages[idx])
+
+    try:
+        for idx, t in BACKENDS[backend](pdf_path, start, end):
+            if backend != FALLBACK_BACKEND:
+                if looks_garbled(t):
+                    t = reextract(idx)
+                elif not (t and t.strip()):
+                    if not has_text:
+                        blank.append(idx)
+                    t = None
+            if stats is not None:
+                stats['pagine'] = stats.get('pagine', 0) + 1
+            if t:
+                has_text = has_text or bool(t.strip())
+                yield t
+        if not has_text:
+            for idx in blank:
+                t = reextract(idx)
+                if t:
+                    yield t
+    finally:
+        if fallback is not None:
+            fallback.close()
+
+
+# ─── Cache del testo per pagina ─────────────────────────────────────────────
+
+def file_sha256(path):
+    """Calcola l'hash SHA-256 del contenuto di un file."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extractor_fingerprint(backend=DEFAULT_BACKEND):
+    """Hash breve di versione, parametri e backend dell'estrattore."""
+    settings = {'versione': EXTRACTOR_VERSION, 'extract_text': EXTRACT_TEXT_KWARGS}
+    if backend != 'pdfplumber':
+        # pdfplumber mantiene la chiave delle cache già esistenti
+        settings['backend'] = backend
+    raw = json.dumps(settings, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+
+def page_cache_path(pdf_path, cache_dir, backend=DEFAULT_BACKEND):
+    """Percorso del file di cache per il PDF con le impostazioni correnti."""
+    return Path(cache_dir) / f"{file_sha256(pdf_path)}-{extractor_fingerprint(backend)}.jsonl.gz"
+
+
+def iter_cached_page_texts(pdf_path, cache_dir, extract=None, backend=DEFAULT_BACKEND):
+    """
+    Genera il testo delle pagine del PDF passando dalla cache su disco.
+
+    Se la cache esiste le pagine vengono lette da lì; altrimenti vengono
+    prodotte da extract() (default: iter_page_texts) e scritte man mano in
+    un file temporaneo, rinominato solo a estrazione completata. Una
+    estrazione interrotta quindi non lascia mai una cache parziale.
+    Le cache dello stesso PDF con impostazioni diverse vengono rimosse.
+    """
+    cache_path = page_cache_path(pdf_path, cache_dir, backend)
+    if cache_path.exists():
+        with gzip.open(cache_path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+        return
+
+    if extract is None:
+        extract = lambda: iter_page_texts(pdf_path, backend=backend)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for t in extract():
+            f.write(json.dumps(t, ensure_ascii=False) + '\n')
+            yield t
+    tmp_path.replace(cache_path)
+
+    pdf_hash = cache_path.name.split('-')[0]
+    for stale in cache_path.parent.glob(f"{pdf_hash}-*.jsonl.gz"):
+        if stale != cache_path:
+            stale.unlink()
+
+
+# ─── Confronto dei backend ──────────────────────────────────────────────────
+
+def _normalized(text):
+    # senza spazi: pdfplumber a volte unisce le parole, pdfium no
+    return ''.join(text.split())
+
+
+def benchmark_backends(pdf_paths, backends=None, reference=FALLBACK_BACKEND):
+    """
+    Estrae ogni PDF con ciascun backend e restituisce per backend pagine/s,
+    pagine riestratte con il fallback, PDF illeggibili e somiglianza del
+    testo (caratteri, spazi esclusi) rispetto al backend di riferimento.
+    """
+    backends = list(backends or BACKENDS)
+    if reference not in backends:
+        backends.insert(0, reference)
+    texts = {b: {} for b in backends}
+    results = {}
+    for backend in backends:
+        stats = {}
+        errors = 0
+        start = time.perf_counter()
+        for path in pdf_paths:
+            try:
+                texts[backend][path] = '\n'.join(iter_page_texts(path, backend=backend, stats=stats))
+            except Exception:
+                errors += 1   # PDF illeggibile: escluso dal confronto
+        seconds = time.perf_counter() - start
+        results[backend] = {
+            'documenti': len(pdf_paths),
+            'pagine': stats.get('pagine', 0),
+            'secondi': round(seconds, 3),
+            'pagine_al_secondo': round(stats.get('pagine', 0) / seconds, 1) if seconds else None,
+            'pagine_fallback': stats.get('fallback', 0),
+            'errori': errors,
+        }
+
+    for backend in backends:
+        ratios = []
+        identical = 0
+        for path in pdf_paths:
+            if path not in texts[reference] or path not in texts[backend]:
+                continue
+            a = _normalized(texts[reference][path])
+            b = _normalized(texts[backend][path])
+            if a == b:
+                identical += 1
+                ratios.append(1.0)
+            else:
+                ratios.append(difflib.SequenceMatcher(None, a, b).ratio())
+        results[backend]['documenti_confrontati'] = len(ratios)
+        results[backend]['documenti_identici'] = identical
+        results[backend]['somiglianza_media'] = round(sum(ratios) / len(ratios), 4) if ratios else None
+        results[backend]['somiglianza_minima'] = round(min(ratios), 4) if ratios else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Confronta i backend di estrazione del testo sui PDF indicati.')
+    parser.add_argument('percorsi', nargs='+', help='file PDF o cartelle (ricerca ricorsiva)')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS),
+                        help='backend da provare (ripetibile; default tutti)')
+    parser.add_argument('--json', help='salva i risultati in questo file')
+    args = parser.parse_args()
+
+    pdf_paths = []
+    for p in map(Path, args.percorsi):
+        pdf_paths.extend(sorted(p.rglob('*.pdf')) if p.is_dir() else [p])
+    if not pdf_paths:
+        print("Nessun PDF trovato.")
+        return 1
+
+    results = benchmark_backends(pdf_paths, args.backend)
+    # somiglianza None: nessun documento confrontabile (es. tutti illeggibili)
+    ratio = lambda value: 'n/d' if value is None else f"{value:.4f}"
+    print(f"{len(pdf_paths)} PDF, riferimento: {FALLBACK_BACKEND}")
+    for backend, r in results.items():
+        print(f"   {backend:<12} {r['pagine']:6d} pagine  {r['secondi']:8.2f}s  "
+              f"{r['pagine_al_secondo'] or 0:8.1f} pag/s  fallback {r['pagine_fallback']:4d}  "
+              f"errori {r['errori']}  identici {r['documenti_identici']}/{r['documenti_confrontati']}  "
+              f"somiglianza media {ratio(r['somiglianza_media'])} (min {ratio(r['somiglianza_minima'])})")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
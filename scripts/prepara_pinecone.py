@@ -10,23 +10,35 @@ Uso:
     # 2. Lancia:
     python prepara_pinecone.py
 
+    # Embedding contro un endpoint locale compatibile (es. un server finto di prova):
+    export OPENAI_BASE_URL="http://127.0.0.1:8000/v1"
+
 Genera i chunk dai due JSON (TU IVA + Interpelli), calcola gli embedding
 con OpenAI text-embedding-3-large, e li carica su Pinecone.
 """
 
 import os
 import sys
+import asyncio
 import json
 import time
 import hashlib
 from pathlib import Path
 
+from embedding_cache import EmbeddingCache, text_key
+from embedding_scheduler import EmbeddingScheduler
+from ndjson_store import iter_ndjson
+from split_store import iter_split_entries, latest_database
+
 # ─── Config ──────────────────────────────────────────────────────────────────
 
 SCRIPT_DIR = Path(__file__).parent
 BASE_DIR = SCRIPT_DIR.parent
 TU_PATH = BASE_DIR / "data" / "testo_unico_iva_database.json"
 IP_PATH = BASE_DIR / "data" / "interpelli_2024_2025_database.json"
+# Accanto a IP_PATH può esserci anche il formato JSON Lines o il database
+# diviso di split_store.py: si legge la versione più recente (i primi due in
+# streaming, una voce alla volta)
 CHUNKS_OUTPUT = BASE_DIR / "pinecone_chunks.json"  # backup locale dei chunk
 
 PINECONE_INDEX_NAME = "fisco-assolombarda"
@@ -35,8 +47,16 @@ PINECONE_REGION = "us-east-1"
 EMBEDDING_MODEL = "text-embedding-3-large"
 EMBEDDING_DIMENSIONS = 1024  # ridotto da 3072 per costi/performance
 MAX_CHUNK_CHARS = 6000       # ~1500 token, ottimale per embedding
-BATCH_SIZE_EMBEDDING = 100   # OpenAI batch limit
+# Batch di embedding per token stimati (limite API: 300k token e 2048 input per richiesta)
+EMBEDDING_BATCH_TOKENS = 60_000
+EMBEDDING_BATCH_MAX_ITEMS = 2048
+EMBEDDING_TPM = 1_000_000    # token al minuto consentiti dal proprio tier OpenAI
+EMBEDDING_CONCURRENCY = 4    # richieste di embedding in volo insieme
+EMBEDDING_MAX_RETRIES = 6    # per batch, su 429/5xx/errori di rete
 BATCH_SIZE_UPSERT = 100      # Pinecone batch limit
+# Embedding già calcolati (per testo, modello e dimensioni): solo i chunk
+# nuovi o modificati vanno all'API (None = nessuna cache)
+EMBEDDING_CACHE_DIR = SCRIPT_DIR / "embedding_cache"
 
 
 # ─── Step 1: Genera chunk dal TU IVA ────────────────────────────────────────
@@ -92,8 +112,8 @@ def chunk_tu_iva(tu_data):
                 }
             })
         else:
-            # Spezza per comma
-            commi = split_by_commi(testo)
+            # Spezza per comma (offset dal database, se presenti)
+            commi = commi_da_span(art) or split_by_commi(testo)
             for i, (comma_num, comma_text) in enumerate(commi):
                 chunk_text = context_prefix + f"Comma {comma_num}. " + comma_text
 
@@ -115,6 +135,16 @@ def chunk_tu_iva(tu_data):
     return chunks
 
 
+def commi_da_span(art):
+    """Ricava i commi (numero, testo) dagli offset registrati nel database TU IVA."""
+    testo = art['testo_integrale']
+    return [
+        (str(c['numero']), testo[c['span'][0]:c['span'][1]])
+        for c in art.get('commi', [])
+        if 'span' in c
+    ]
+
+
 def split_by_commi(testo):
     """Spezza un testo in commi (1., 2., 3., ecc.)."""
     import re
@@ -159,11 +189,11 @@ def split_by_size(testo, max_size):
 
 # ─── Step 2: Genera chunk dagli Interpelli ───────────────────────────────────
 
-def chunk_interpelli(ip_data):
-    """Genera chunk dagli interpelli."""
+def chunk_interpelli(entries):
+    """Genera chunk dagli interpelli (qualsiasi iterabile di voci, anche uno stream)."""
     chunks = []
 
-    for entry in ip_data['interpelli']:
+    for entry in entries:
         eid = entry['id']
 
         # ── Chunk SUMMARY (per retrieval) ──
@@ -256,49 +286,80 @@ def chunk_interpelli(ip_data):
 # ─── Step 3: Genera embedding con OpenAI ─────────────────────────────────────
 
 def generate_embeddings(chunks):
-    """Genera embedding per tutti i chunk usando OpenAI."""
-    from openai import OpenAI
-    client = OpenAI()
+    """
+    Genera embedding per tutti i chunk usando OpenAI. Con EMBEDDING_CACHE_DIR
+    quelli già calcolati per lo stesso testo vengono letti dalla cache e
+    all'API vanno solo i testi mancanti (una volta sola se ripetuti).
+
+    Le richieste sono gestite da EmbeddingScheduler (batch per token,
+    richieste in parallelo entro EMBEDDING_TPM, retry con backoff); ogni
+    batch completato viene salvato subito in cache, quindi dopo un errore
+    basta rilanciare per riprendere dai testi mancanti.
+    """
+    from openai import AsyncOpenAI
 
     total = len(chunks)
     print(f"\n🧮 Generazione embedding per {total} chunk...")
     print(f"   Modello: {EMBEDDING_MODEL} (dim={EMBEDDING_DIMENSIONS})")
 
-    for i in range(0, total, BATCH_SIZE_EMBEDDING):
-        batch = chunks[i:i + BATCH_SIZE_EMBEDDING]
-        texts = [c['text'] for c in batch]
-
-        try:
-            response = client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=texts,
-                dimensions=EMBEDDING_DIMENSIONS,
-            )
-            for j, emb in enumerate(response.data):
-                chunks[i + j]['values'] = emb.embedding
-
-            progress = min(i + BATCH_SIZE_EMBEDDING, total)
-            print(f"\r   [{progress}/{total}] {progress/total*100:.1f}%", end='', flush=True)
-
-        except Exception as e:
-            print(f"\n   ❌ Errore batch {i}: {e}")
-            # Retry after pause
-            time.sleep(5)
-            try:
-                response = client.embeddings.create(
+    cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS) if EMBEDDING_CACHE_DIR else None
+    missing = {}   # sha256(testo) -> chunk con quel testo
+    for chunk in chunks:
+        values = cache.get(chunk['text']) if cache is not None else None
+        if values is not None:
+            chunk['values'] = values
+        else:
+            missing.setdefault(text_key(chunk['text']), []).append(chunk)
+    todo = [group[0]['text'] for group in missing.values()]
+    print(f"   Dalla cache: {total - sum(len(g) for g in missing.values())} | Da calcolare: {len(todo)}")
+    if not todo:
+        print(f"   ✅ Embedding pronti per {total} chunk")
+        return chunks
+
+    def store(texts, vectors):
+        for text, values in zip(texts, vectors):
+            for chunk in missing[text_key(text)]:
+                chunk['values'] = values
+            if cache is not None:
+                cache.put(text, values)
+        if cache is not None:
+            cache.save()   # un'interruzione non perde i batch già pagati
+
+    def progress(done, count):
+        print(f"\r   [{done}/{count}] {done/count*100:.1f}%", end='', flush=True)
+
+    async def run():
+        # i retry li gestisce lo scheduler, non il client
+        async with AsyncOpenAI(max_retries=0) as client:
+            async def embed(texts):
+                response = await client.embeddings.create(
                     model=EMBEDDING_MODEL,
                     input=texts,
                     dimensions=EMBEDDING_DIMENSIONS,
                 )
-                for j, emb in enumerate(response.data):
-                    chunks[i + j]['values'] = emb.embedding
-            except Exception as e2:
-                print(f"\n   ❌ Retry fallito: {e2}")
-                sys.exit(1)
-
-        time.sleep(0.1)  # rate limit safety
+                return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+            scheduler = EmbeddingScheduler(
+                embed, EMBEDDING_TPM,
+                max_inflight=EMBEDDING_CONCURRENCY,
+                max_batch_tokens=EMBEDDING_BATCH_TOKENS,
+                max_batch_items=EMBEDDING_BATCH_MAX_ITEMS,
+                max_retries=EMBEDDING_MAX_RETRIES,
+            )
+            failed = await scheduler.run(todo, store, progress)
+            return scheduler, failed
+
+    scheduler, failed = asyncio.run(run())
+    stats = scheduler.stats
+    print(f"\n   Batch: {stats['batch']} | Richieste: {stats['richieste']} | Ritentativi: {stats['ritentativi']}")
+    if failed:
+        lost = sum(len(texts) for texts, _ in failed)
+        print(f"\n   ❌ {len(failed)} batch falliti ({lost} testi), es.: {failed[0][1]}")
+        if cache is not None:
+            print(f"   Gli altri {len(todo) - lost} embedding sono salvati in cache: rilanciare per riprendere.")
+        sys.exit(1)
 
-    print(f"\n   ✅ Embedding generati per {total} chunk")
+    print(f"   ✅ Embedding generati per {total} chunk")
     return chunks
 
 
@@ -394,13 +455,24 @@ def main():
     print(f"\n📂 Caricamento dati...")
     with open(TU_PATH) as f:
         tu = json.load(f)
-    with open(IP_PATH) as f:
-        ip = json.load(f)
+    found = latest_database(IP_PATH)
+    if found is None:
+        print(f"\n❌ Database degli interpelli non trovato: {IP_PATH}")
+        sys.exit(1)
+    ip_format, ip_source = found
+    print(f"   Interpelli da: {ip_source.name}")
+    if ip_format == 'jsonl':
+        ip_entries = iter_ndjson(ip_source)
+    elif ip_format == 'split':
+        ip_entries = iter_split_entries(IP_PATH)
+    else:
+        with open(ip_source) as f:
+            ip_entries = json.load(f)['interpelli']
 
     # Step 1: Genera chunk
     print(f"\n📦 Generazione chunk...")
     tu_chunks = chunk_tu_iva(tu)
-    ip_chunks = chunk_interpelli(ip)
+    ip_chunks = chunk_interpelli(ip_entries)
     all_chunks = tu_chunks + ip_chunks
 
     print(f"   TU IVA:     {len(tu_chunks)} chunk")
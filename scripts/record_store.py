@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Contenitore binario a record con accesso diretto per chiave.
+
+Pensato per i database del sistema RAG: ogni articolo (o interpello) è un
+record a sé, e una tabella degli offset in testa al file permette di
+leggerne uno solo senza fare il parsing del resto.
+
+Formato del file:
+    magic        8 byte   b'FISCOREC'
+    versione     uint16   little-endian
+    flag         uint16   bit 0 = record compressi con zlib
+    len_header   uint32   lunghezza dell'header in byte
+    header       JSON UTF-8: {"record": {chiave: [offset, lunghezza]}, "meta": {...}}
+    dati         record JSON UTF-8 compatti (eventualmente zlib) concatenati;
+                 gli offset sono relativi all'inizio dei dati
+"""
+
+import json
+import os
+import struct
+import tempfile
+import zlib
+
+MAGIC = b'FISCOREC'
+FORMAT_VERSION = 1
+FLAG_ZLIB = 1
+
+_PREFIX = struct.Struct('<8sHHI')
+
+
+def _default_file_mode():
+    """Permessi di un file nuovo secondo la umask corrente (mkstemp usa 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _encode(obj, compress):
+    data = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(data, 6) if compress else data
+
+
+def write_store(path, records, meta=None, compress=False):
+    """
+    Scrive il contenitore in path a partire da coppie (chiave, oggetto).
+
+    I record vengono scritti man mano in un file temporaneo (in memoria resta
+    solo la tabella degli offset); a fine scrittura header e dati vengono
+    uniti nel file finale con una rinomina atomica.
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(path) or '.'
+    index = {}
+
+    with tempfile.TemporaryFile(dir=directory) as data_file:
+        offset = 0
+        for key, obj in records:
+            if key in index:
+                raise ValueError(f"Chiave duplicata nel contenitore: {key}")
+            blob = _encode(obj, compress)
+            data_file.write(blob)
+            index[key] = [offset, len(blob)]
+            offset += len(blob)
+
+        header = json.dumps(
+            {'record': index, 'meta': meta or {}},
+            ensure_ascii=False, separators=(',', ':'),
+        ).encode('utf-8')
+        flags = FLAG_ZLIB if compress else 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, flags, len(header)))
+                out.write(header)
+                data_file.seek(0)
+                while True:
+                    block = data_file.read(1 << 20)
+                    if not block:
+                        break
+                    out.write(block)
+            os.chmod(tmp_path, _default_file_mode())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    return len(index)
+
+
+class RecordStore:
+    """Lettore del contenitore: carica solo l'header, i record su richiesta."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            magic, version, flags, header_len = _PREFIX.unpack(self._file.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path}: non è un contenitore FISCOREC")
+            if version > FORMAT_VERSION:
+                raise ValueError(f"{path}: versione del formato non supportata ({version})")
+            header = json.loads(self._file.read(header_len).decode('utf-8'))
+        except BaseException:
+            self._file.close()
+            raise
+        self._compressed = bool(flags & FLAG_ZLIB)
+        self._index = header['record']
+        self.meta = header.get('meta', {})
+        self._data_start = _PREFIX.size + header_len
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def get(self, key, default=None):
+        """Legge e decodifica un singolo record."""
+        entry = self._index.get(key)
+        if entry is None:
+            return default
+        offset, length = entry
+        self._file.seek(self._data_start + offset)
+        blob = self._file.read(length)
+        if self._compressed:
+            blob = zlib.decompress(blob)
+        return json.loads(blob.decode('utf-8'))
+
+    def close(self):
+        self._file.close()
@@ -4,23 +4,43 @@ Scraper e parser degli Interpelli dell'Agenzia delle Entrate (2024-2025).
 Scarica i PDF dal sito AdE, estrae le sezioni strutturate e genera un database JSON.
 
 Uso:
-    python scarica_interpelli.py
+    python scarica_interpelli.py                  # ricostruzione completa
+    python scarica_interpelli.py --incrementale   # solo interpelli nuovi/modificati/rimossi
+    python scarica_interpelli.py --formato jsonl  # una voce per riga + file indice
 
 Il file Excel "INTERPELLI IVA.xlsx" deve trovarsi nella cartella padre (../INTERPELLI IVA.xlsx).
-Output: interpelli_2024_2025_database.json nella stessa cartella padre.
+Output: interpelli_2024_2025_database.json nella stessa cartella padre, più
+.meta.json (metadati) e .testi.rec (testi compressi) per la lettura su richiesta.
 """
 
 import os
 import re
 import json
 import time
+import hashlib
+import argparse
 import sys
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import urlsplit
 
 import requests
-import pdfplumber
 import openpyxl
+from requests.adapters import HTTPAdapter
+
+from build_profiler import BuildProfiler, stop_worker_tracing
+from ndjson_store import encode_line, load_ndjson_database, write_ndjson_database, write_sidecar
+from normative_refs import summarize_references
+from parse_cache import ParseCache, stage_key
+from pdf_cache import PdfCache, looks_like_pdf
+from pdf_text import extractor_fingerprint, file_sha256, iter_page_texts
+from split_store import write_split_database
+from topic_engine import TopicEngine
+from tu_links import build_link_index, link_counts, link_entry, reverse_links
 
 # ─── Configurazione ─────────────────────────────────────────────────────────
 
@@ -28,15 +48,66 @@ SCRIPT_DIR = Path(__file__).parent
 BASE_DIR = SCRIPT_DIR.parent  # cartella FISCO
 EXCEL_PATH = BASE_DIR / "INTERPELLI IVA.xlsx"
 OUTPUT_JSON = BASE_DIR / "interpelli_2024_2025_database.json"
+# Formato di uscita: 'json' (un unico file) o 'jsonl' (una voce per riga,
+# scritta appena pronta, + file .indici.json con metadati e indice tematico)
+OUTPUT_FORMAT = 'json'
+OUTPUT_JSONL = BASE_DIR / "interpelli_2024_2025_database.jsonl"
+# Accanto al database scrive anche i metadati "caldi" (.meta.json) e i testi
+# "freddi" in un contenitore compresso (.testi.rec), letti su richiesta dai
+# consumatori (vedi split_store.py)
+SPLIT_OUTPUT = True
 PDF_CACHE_DIR = SCRIPT_DIR / "pdf_cache"
 ERRORS_LOG = SCRIPT_DIR / "errori_download.json"
-
-# Pausa tra download (secondi) — per non sovraccaricare il server AdE
-DOWNLOAD_DELAY = 1.0
+# Report JSON con tempi e memoria della build (None = nessuna profilazione)
+PROFILE_REPORT = BASE_DIR / "interpelli_2024_2025_database.profilo.json"
+# Database del TU IVA (parse_testo_unico_iva.py): la sua mappatura vecchio→nuovo
+# codice collega gli interpelli agli articoli, e vi si scrivono gli
+# interpelli_collegati (None = nessun collegamento)
+TU_DATABASE = BASE_DIR / "testo_unico_iva_database.json"
+# Traccia anche il picco di memoria: tracemalloc rallenta l'estrazione PDF
+# di 4-5 volte, va attivato solo per indagare sulla memoria (--traccia-memoria)
+PROFILE_MEMORY = False
+
+# Download paralleli (thread) — il ritmo verso il server resta limitato da
+# DOWNLOAD_RATE e MAX_PER_HOST, per non sovraccaricare il server AdE
+DOWNLOAD_WORKERS = 6
+# Richieste al secondo verso il server (token bucket) e raffica massima
+DOWNLOAD_RATE = 2.0
+DOWNLOAD_BURST = 4
+# Richieste contemporanee massime verso lo stesso host
+MAX_PER_HOST = 4
 # Timeout download (secondi)
 DOWNLOAD_TIMEOUT = 30
-# Riprova download N volte
+# Riprova download N volte, con attesa crescente (secondi: 1, 2, 4, ...)
 MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0
+# Riverifica i PDF già in cache con richieste condizionali (ETag / Last-Modified
+# registrati nel manifest della cache): solo quelli cambiati vengono ritrasferiti
+REFRESH_CACHE = False
+
+# Processi per il parsing dei PDF (1 = parsing seriale) e documenti per task
+PARSE_WORKERS = os.cpu_count() or 1
+PARSE_CHUNKSIZE = 8
+
+# Backend di estrazione del testo ('pdfplumber' o 'pdfium', vedi pdf_text.py);
+# per confrontarli sui PDF scaricati: python pdf_text.py pdf_cache/blob
+PDF_BACKEND = 'pdfplumber'
+
+# Cache per documento dei risultati di parsing (None = disattivata)
+PARSE_CACHE_DIR = SCRIPT_DIR / "parse_cache"
+# Versioni dei passi di parsing: incrementare quella del passo modificato
+# (es. parse_interpello_sections) per ricalcolare solo quel passo. La chiave
+# dei temi include anche IVA_TOPICS, quindi cambiare un pattern basta.
+SECTIONS_VERSION = 3
+REFERENCES_VERSION = 3
+TOPICS_VERSION = 1
+
+# Pipeline download → parsing → scrittura sovrapposti (False = fasi in sequenza)
+PIPELINE = True
+# PDF pronti in attesa di parsing e documenti in elaborazione nel pool:
+# quando sono pieni i download si fermano (backpressure)
+PIPELINE_QUEUE_SIZE = 16
+PARSE_INFLIGHT = 2 * PARSE_WORKERS
 
 # Headers per simulare un browser reale
 HEADERS = {
@@ -51,16 +122,14 @@ HEADERS = {
 def extract_excel_metadata():
     """Estrae i metadati degli interpelli 2024-2025 dall'Excel."""
     print(f"📂 Leggo Excel: {EXCEL_PATH}")
+    # Modalità completa (non read_only): i collegamenti ai PDF sono negli
+    # hyperlink delle celle, che openpyxl non carica in sola lettura
     wb = openpyxl.load_workbook(str(EXCEL_PATH))
     ws = wb.active
 
     records = []
-    for row_idx in range(2, ws.max_row + 1):
-        numero_cell = ws.cell(row=row_idx, column=2)
-        data_cell = ws.cell(row=row_idx, column=3)
-        tag_cell = ws.cell(row=row_idx, column=4)
-        oggetto_cell = ws.cell(row=row_idx, column=5)
-        massima_cell = ws.cell(row=row_idx, column=6)
+    for row in ws.iter_rows(min_row=2, max_col=6):
+        numero_cell, data_cell, tag_cell, oggetto_cell, massima_cell = row[1:6]
 
         val = str(numero_cell.value or '').strip()
         if not val or val.startswith('="') or val in ('N°', 'None', ''):
@@ -95,79 +164,354 @@ def extract_excel_metadata():
 
 # ─── Step 2: Scarica i PDF ──────────────────────────────────────────────────
 
-def download_pdf(url, dest_path):
-    """Scarica un singolo PDF con retry."""
-    if dest_path.exists() and dest_path.stat().st_size > 1000:
-        return True  # già scaricato
+class TokenBucket:
+    """
+    Limitatore di frequenza condiviso tra i thread: rate token al secondo,
+    al massimo capacity accumulati. acquire() attende il token successivo.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class DownloadLimiter:
+    """Frequenza complessiva (token bucket) più un tetto di richieste per host."""
+
+    def __init__(self, rate=DOWNLOAD_RATE, burst=DOWNLOAD_BURST, per_host=MAX_PER_HOST):
+        self.bucket = TokenBucket(rate, burst)
+        self.per_host = per_host
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    @contextmanager
+    def request(self, url):
+        """Da usare attorno a ogni richiesta HTTP: attende posto sull'host e un token."""
+        sem = self._host_semaphore(url)
+        with sem:
+            self.bucket.acquire()
+            yield
+
+
+def make_session(pool_size=DOWNLOAD_WORKERS):
+    """
+    Sessione HTTP condivisa tra i thread: le connessioni keep-alive vengono
+    riusate, evitando un nuovo handshake TCP/TLS per ogni PDF.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, MAX_PER_HOST))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    tmp.replace(path)
+
+
+def _validators(resp):
+    """Validatori HTTP della risposta (per richieste condizionali e If-Range)."""
+    return {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+
+
+def _transfer(session, url, key, cache, cached_entry):
+    """
+    Un tentativo di download. Restituisce 'invariato' (304), 'scaricato',
+    'ripreso' (completato con una richiesta Range) oppure None se la
+    risposta non è un PDF valido; solleva eccezione su errori di rete.
+
+    Il trasferimento avviene nel file parziale della cache, i cui validatori
+    sono salvati accanto (.json): se il trasferimento si interrompe, il
+    tentativo successivo chiede solo i byte mancanti (Range + If-Range).
+    """
+    part_path = cache.part_path(key)
+    part_meta_path = part_path.with_name(part_path.name + '.json')
+    headers = {}
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    part_meta = _read_json(part_meta_path) if offset else None
+    if_range = part_meta and (part_meta.get('etag') or part_meta.get('last_modified'))
+    if offset and if_range and part_meta.get('url') == url:
+        headers['Range'] = f'bytes={offset}-'
+        headers['If-Range'] = if_range
+    else:
+        offset = 0
+        if cached_entry:
+            if cached_entry.get('etag'):
+                headers['If-None-Match'] = cached_entry['etag']
+            if cached_entry.get('last_modified'):
+                headers['If-Modified-Since'] = cached_entry['last_modified']
+
+    with session.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT, stream=True) as resp:
+        if resp.status_code == 304:
+            return 'invariato'
+        if resp.status_code == 416:
+            # Range non soddisfacibile: il parziale non è più valido
+            part_path.unlink(missing_ok=True)
+            part_meta_path.unlink(missing_ok=True)
+            return None
+        resp.raise_for_status()
+
+        resumed = resp.status_code == 206
+        if resumed:
+            start = re.match(r'bytes\s+(\d+)-', resp.headers.get('Content-Range', ''))
+            if not start or int(start.group(1)) != offset:
+                raise requests.RequestException(f"Content-Range inatteso: {resp.headers.get('Content-Range')}")
+        else:
+            offset = 0  # risposta completa (risorsa cambiata o Range ignorato)
+            part_meta = {'url': url, 'content_type': resp.headers.get('Content-Type'), **_validators(resp)}
+            _write_json(part_meta_path, part_meta)
+
+        expected = resp.headers.get('Content-Length')
+        written = 0
+        with open(part_path, 'ab' if resumed else 'wb') as f:
+            for chunk in resp.iter_content(64 * 1024):
+                f.write(chunk)
+                written += len(chunk)
+        if expected is not None and written != int(expected):
+            raise requests.RequestException(f"trasferimento incompleto ({written}/{expected} byte)")
+
+    part_meta_path.unlink(missing_ok=True)
+    if not looks_like_pdf(part_path):
+        # pagina HTML di errore o file troncato: non entra in cache
+        part_path.unlink()
+        return None
+
+    cache.put(key, part_path, url, content_type=part_meta.get('content_type'),
+              etag=part_meta.get('etag'), last_modified=part_meta.get('last_modified'))
+    return 'ripreso' if resumed else 'scaricato'
+
+
+def download_pdf(url, key, cache, limiter=None, session=None, refresh=False):
+    """
+    Scarica un singolo PDF nella cache con retry e restituisce lo stato
+    ('cache', 'invariato', 'scaricato', 'ripreso') oppure False in caso di
+    errore.
+
+    Con refresh=True un PDF già in cache viene riverificato con una richiesta
+    condizionale (ETag / Last-Modified registrati nel manifest): se non è
+    cambiato il server risponde 304 senza ritrasferirlo. Se in cache c'è il
+    PDF di un altro URL (link sostituito nell'Excel) il download è sempre
+    completo, senza validatori, e in caso di errore il vecchio PDF non vale.
+    """
+    cached_entry = cache.entry(key) if cache.lookup(key) is not None else None
+    cached = cached_entry is not None and cached_entry.get('url') == url
+    if cached and not refresh:
+        return 'cache'  # già scaricato
+    if not cached:
+        cached_entry = None
+
+    if limiter is None:
+        limiter = DownloadLimiter()
+    if session is None:
+        session = make_session()
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            resp = requests.get(url, headers=HEADERS, timeout=DOWNLOAD_TIMEOUT, stream=True)
-            if resp.status_code == 200:
-                with open(dest_path, 'wb') as f:
-                    for chunk in resp.iter_content(8192):
-                        f.write(chunk)
-                if dest_path.stat().st_size > 500:
-                    return True
-                else:
-                    dest_path.unlink()
-            else:
-                if attempt == MAX_RETRIES:
-                    return False
+            with limiter.request(url):
+                status = _transfer(session, url, key, cache, cached_entry)
+            if status:
+                return status
         except (requests.RequestException, OSError) as e:
+            # il file parziale resta: il prossimo tentativo riprende da lì
             if attempt == MAX_RETRIES:
-                return False
-        time.sleep(DOWNLOAD_DELAY)
+                return 'cache' if cached else False
+        if attempt < MAX_RETRIES:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
 
-    return False
+    return 'cache' if cached else False
 
 
-def download_all_pdfs(records):
-    """Scarica tutti i PDF degli interpelli."""
-    PDF_CACHE_DIR.mkdir(exist_ok=True)
+def _pdf_key(rec):
+    return f"interpello_{rec['anno']}_{rec['numero']:04d}"
 
-    total = len(records)
-    downloaded = 0
-    skipped = 0
-    failed = []
 
-    print(f"\n📥 Download di {total} PDF...")
-    print(f"   Cache: {PDF_CACHE_DIR}")
-    print(f"   (i PDF già scaricati verranno saltati)\n")
+def open_pdf_cache(records, cache_dir=None):
+    """Apre la cache dei PDF importando eventuali file della cache precedente."""
+    cache = PdfCache(cache_dir or PDF_CACHE_DIR)
+    migrated = cache.migrate_legacy({_pdf_key(rec): rec['link_pdf'] for rec in records})
+    if migrated:
+        print(f"   Importati {migrated} PDF dalla cache precedente")
+    return cache
 
-    for i, rec in enumerate(records):
-        pdf_name = f"interpello_{rec['anno']}_{rec['numero']:04d}.pdf"
-        pdf_path = PDF_CACHE_DIR / pdf_name
-        rec['_pdf_path'] = str(pdf_path)
-
-        if pdf_path.exists() and pdf_path.stat().st_size > 1000:
-            skipped += 1
-            downloaded += 1
-            progress = (i + 1) / total * 100
-            print(f"\r   [{progress:5.1f}%] {i+1}/{total} — ✓ {pdf_name} (cache)", end='', flush=True)
-            continue
 
-        if not rec['link_pdf']:
-            failed.append({'numero': rec['numero'], 'anno': rec['anno'], 'errore': 'link mancante'})
-            print(f"\r   [{(i+1)/total*100:5.1f}%] {i+1}/{total} — ✗ {pdf_name} (no link)", end='', flush=True)
-            continue
+def attach_pdf(rec, cache, key):
+    """Collega al record il PDF in cache (percorso e SHA-256); None se assente."""
+    pdf_path = cache.lookup(key)
+    rec['_pdf_path'] = str(pdf_path) if pdf_path else None
+    rec['_pdf_sha256'] = cache.entry(key)['sha256'] if pdf_path else None
+    return pdf_path
+
+
+def _detach_pdf(rec):
+    """Scollega dal record un PDF in cache non più valido (scaricato da un altro URL)."""
+    rec['_pdf_path'] = rec['_pdf_sha256'] = None
+
 
-        ok = download_pdf(rec['link_pdf'], pdf_path)
-        if ok:
-            downloaded += 1
-            print(f"\r   [{(i+1)/total*100:5.1f}%] {i+1}/{total} — ✓ {pdf_name}", end='', flush=True)
+def plan_downloads(records, cache, refresh=REFRESH_CACHE):
+    """
+    Classifica i record: PDF già in cache (vedi attach_pdf()), senza
+    link (errore) o da scaricare/verificare. Un PDF in cache scaricato da un
+    URL diverso dal link attuale va scaricato di nuovo.
+    Restituisce (in_cache, errori, da_scaricare) con errori e da_scaricare
+    come liste di (indice, ...) per poterle riordinare.
+    """
+    cached = []
+    failed = []
+    to_download = []
+    for i, rec in enumerate(records):
+        key = _pdf_key(rec)
+        pdf_path = attach_pdf(rec, cache, key)
+        moved = pdf_path and rec['link_pdf'] and cache.entry(key).get('url') != rec['link_pdf']
+
+        if pdf_path and not moved and not (refresh and rec['link_pdf']):
+            cached.append(i)
+        elif not rec['link_pdf']:
+            failed.append((i, {'numero': rec['numero'], 'anno': rec['anno'], 'errore': 'link mancante'}))
         else:
-            failed.append({'numero': rec['numero'], 'anno': rec['anno'], 'errore': f'HTTP error', 'url': rec['link_pdf']})
-            print(f"\r   [{(i+1)/total*100:5.1f}%] {i+1}/{total} — ✗ {pdf_name} (ERRORE)", end='', flush=True)
+            to_download.append((i, rec, key))
+    return cached, failed, to_download
 
-        time.sleep(DOWNLOAD_DELAY)
 
-    print(f"\n\n   Scaricati: {downloaded}/{total} | Dalla cache: {skipped} | Errori: {len(failed)}")
+def _download_error(rec):
+    return {'numero': rec['numero'], 'anno': rec['anno'], 'errore': f'HTTP error', 'url': rec['link_pdf']}
+
+
+def save_download_errors(failed, records=None, processed=None):
+    """
+    Scrive errori_download.json (errori nell'ordine dell'Excel), o lo
+    rimuove se non ci sono errori.
+
+    In un aggiornamento incrementale failed riguarda solo i record
+    processed: gli errori già nel file vengono uniti per (numero, anno),
+    togliendo quelli dei record rielaborati (ora riusciti o di nuovo in
+    failed) e dei record non più presenti in records.
+    """
+    if records is not None:
+        order = {(rec['numero'], rec['anno']): i for i, rec in enumerate(records)}
+        redone = {(rec['numero'], rec['anno']) for rec in processed or ()}
+        previous = []
+        if ERRORS_LOG.exists():
+            try:
+                with open(ERRORS_LOG, encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = []
+        kept = [err for err in previous
+                if (err['numero'], err['anno']) in order and (err['numero'], err['anno']) not in redone]
+        failed = sorted(kept + list(failed), key=lambda err: order[(err['numero'], err['anno'])])
 
     if failed:
         with open(ERRORS_LOG, 'w') as f:
             json.dump(failed, f, ensure_ascii=False, indent=2)
         print(f"   Errori salvati in: {ERRORS_LOG}")
+    elif ERRORS_LOG.exists():
+        ERRORS_LOG.unlink()
+
+
+def download_all_pdfs(records, cache_dir=None, workers=DOWNLOAD_WORKERS, limiter=None,
+                      refresh=REFRESH_CACHE, save_errors=True):
+    """
+    Scarica tutti i PDF degli interpelli nella cache indirizzata per
+    contenuto. I PDF già in cache (e integri) vengono saltati, o con
+    refresh=True riverificati con richieste condizionali; gli altri sono
+    scaricati da un pool di thread che condivide la stessa sessione HTTP e
+    lo stesso limitatore di frequenza e di connessioni per host.
+    Con save_errors=False gli errori sono solo restituiti, non salvati.
+    """
+    if limiter is None:
+        limiter = DownloadLimiter()
+
+    total = len(records)
+    statuses = {}
+
+    print(f"\n📥 Download di {total} PDF...")
+    print(f"   Cache: {cache_dir or PDF_CACHE_DIR}")
+    if refresh:
+        print(f"   (i PDF già scaricati verranno riverificati con richieste condizionali)\n")
+    else:
+        print(f"   (i PDF già scaricati verranno saltati)\n")
+
+    cache = open_pdf_cache(records, cache_dir)
+    cached, failed, to_download = plan_downloads(records, cache, refresh)
+    skipped = len(cached)
+    downloaded = skipped
+
+    print(f"   Dalla cache: {skipped} | Senza link: {len(failed)} | Da scaricare/verificare: {len(to_download)}"
+          f" ({workers} thread, {limiter.bucket.rate:g} richieste/s)")
+
+    done = 0
+    try:
+        with make_session(workers) as session, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {
+                pool.submit(download_pdf, rec['link_pdf'], key, cache, limiter, session, refresh): (i, rec, key)
+                for i, rec, key in to_download
+            }
+            for future in as_completed(futures):
+                i, rec, key = futures[future]
+                done += 1
+                progress = done / len(futures) * 100
+                status = future.result()
+                if status:
+                    downloaded += 1
+                    statuses[status] = statuses.get(status, 0) + 1
+                    attach_pdf(rec, cache, key)
+                    print(f"\r   [{progress:5.1f}%] {done}/{len(futures)} — ✓ {key} ({status})", end='', flush=True)
+                else:
+                    _detach_pdf(rec)
+                    failed.append((i, _download_error(rec)))
+                    print(f"\r   [{progress:5.1f}%] {done}/{len(futures)} — ✗ {key} (ERRORE)", end='', flush=True)
+                if done % 50 == 0:
+                    cache.save()
+    finally:
+        cache.save()
+    cache.prune()
+
+    # errori nell'ordine dell'Excel, indipendentemente dall'ordine di completamento
+    failed = [err for _, err in sorted(failed, key=lambda x: x[0])]
+
+    print(f"\n\n   Scaricati: {downloaded}/{total} | Dalla cache: {skipped} | Errori: {len(failed)}")
+    if statuses:
+        print("   Esito: " + ", ".join(f"{k} {v}" for k, v in sorted(statuses.items())))
+    if save_errors:
+        save_download_errors(failed)
 
     return records, failed
 
@@ -177,17 +521,87 @@ def download_all_pdfs(records):
 def extract_pdf_text(pdf_path):
     """Estrae il testo completo da un PDF."""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            pages = []
-            for page in pdf.pages:
-                t = page.extract_text()
-                if t:
-                    pages.append(t)
-            return '\n'.join(pages)
+        # Le pagine vengono liberate man mano: in memoria resta solo il testo
+        return '\n'.join(iter_page_texts(pdf_path, backend=PDF_BACKEND))
     except Exception:
         return None
 
 
+# Intestazioni delle sezioni di un interpello AdE, nell'ordine in cui compaiono
+SECTION_HEADINGS = [
+    ('oggetto', r'OGGETTO'),
+    ('quesito', r'QUESITO'),
+    ('soluzione_contribuente',
+     r'SOLUZIONE\s+INTERPRETATIVA\s+PROSPETTATA\s+DAL(?:\s+|L.\s*)(?:CONTRIBUENTE|ISTANTE)'),
+    ('parere_ade', r'PARERE\s+DELL.AGENZIA(?:\s+DELLE\s+ENTRATE)?'),
+]
+SECTION_ORDER = {key: i for i, (key, _) in enumerate(SECTION_HEADINGS)}
+# Un'unica alternativa con un gruppo per sezione: una sola scansione del testo.
+# La prima lettera è fuori dai gruppi (classe di caratteri) perché il motore
+# salti velocemente le posizioni che non possono aprire un'intestazione.
+SECTION_PATTERN = re.compile(
+    r'[OQSP](?<=\b[OQSP])(?:' + '|'.join(f'(?P<{key}>{p[1:]})' for key, p in SECTION_HEADINGS)
+    + r')\b\s*[:\.]?\s*',
+    re.IGNORECASE,
+)
+# Righe di intestazione/piè di pagina e separatori da togliere dalle sezioni
+SECTION_NOISE = re.compile(r'Di(?:visione|rezione) .+?\n|___+|---+')
+
+
+def _is_section_heading(text, m):
+    """Intestazione vera: scritta in maiuscolo, oppure da sola sulla sua riga."""
+    heading_end = m.end(m.lastgroup)
+    if text[m.start():heading_end].isupper():
+        return True
+    line_start = text.rfind('\n', 0, m.start()) + 1
+    line_end = text.find('\n', heading_end)
+    if line_end < 0:
+        line_end = len(text)
+    return (not text[line_start:m.start()].strip()
+            and text[heading_end:line_end].strip() in ('', ':', '.'))
+
+
+def find_interpello_sections(text):
+    """
+    Individua le sezioni dell'interpello con una sola scansione e le
+    restituisce come {sezione: (inizio, fine)}, offset nel testo originale
+    del contenuto (intestazione esclusa).
+
+    Regola di posizione: un'intestazione è valida se scritta in maiuscolo o
+    se sta da sola sulla sua riga; tra quelle valide si tiene la catena più
+    lunga che rispetta l'ordine di SECTION_HEADINGS (a parità, quella che
+    arriva più avanti nel testo). Così "oggetto" o "parere dell'Agenzia"
+    dentro il testo non spezzano le sezioni, e un falso positivo non
+    impedisce di riconoscere le intestazioni vere che lo seguono.
+    """
+    def rank(chain):
+        return (len(chain), chain[-1][1]) if chain else (0, -1)
+
+    # best[o]: catena migliore che termina con un'intestazione di ordine o
+    best = {}
+    for m in SECTION_PATTERN.finditer(text):
+        if not _is_section_heading(text, m):
+            continue
+        key = m.lastgroup
+        order = SECTION_ORDER[key]
+        prev = max((chain for o, chain in best.items() if o < order), key=rank, default=[])
+        chain = prev + [(key, m.start(), m.end())]
+        if len(chain) > len(best.get(order, ())):
+            best[order] = chain
+    found = max(best.values(), key=rank, default=[])
+
+    spans = {}
+    for i, (key, _, content_start) in enumerate(found):
+        end = found[i + 1][1] if i + 1 < len(found) else len(text)
+        spans[key] = (content_start, end)
+    return spans
+
+
+def _clean_section(section_text):
+    section_text = SECTION_NOISE.sub('', section_text).strip()
+    return re.sub(r'\n{3,}', '\n\n', section_text)
+
+
 def parse_interpello_sections(text):
     """
     Parsa le sezioni tipiche di un interpello AdE:
@@ -195,204 +609,249 @@ def parse_interpello_sections(text):
     - QUESITO
     - SOLUZIONE INTERPRETATIVA PROSPETTATA DAL CONTRIBUENTE
     - PARERE DELL'AGENZIA DELLE ENTRATE
+
+    La pulizia (intestazioni di pagina, separatori) è applicata solo al
+    testo delle sezioni trovate da find_interpello_sections().
     """
     if not text:
         return {}
+    return {key: _clean_section(text[start:end])
+            for key, (start, end) in find_interpello_sections(text).items()}
 
-    sections = {}
 
-    # Pulizia testo
-    text = re.sub(r'Divisione .+?\n', '', text)
-    text = re.sub(r'Direzione .+?\n', '', text)
-    text = re.sub(r'_{3,}', '', text)
-    text = re.sub(r'-{3,}', '', text)
-
-    # Pattern per identificare le sezioni — con varianti comuni
-    section_patterns = [
-        (r'(?:OGGETTO|Oggetto)\s*[:\.]?\s*', 'oggetto'),
-        (r'(?:QUESITO|Quesito)\s*[:\.]?\s*', 'quesito'),
-        (r'(?:SOLUZIONE INTERPRETATIVA PROSPETTATA DAL (?:CONTRIBUENTE|ISTANTE)|Soluzione interpretativa prospettata dal (?:contribuente|istante))\s*[:\.]?\s*', 'soluzione_contribuente'),
-        (r'(?:PARERE DELL.AGENZIA DELLE ENTRATE|Parere dell.Agenzia delle [Ee]ntrate|PARERE DELL.AGENZIA)\s*[:\.]?\s*', 'parere_ade'),
-    ]
+def extract_normative_references(text):
+    """
+    Estrae i riferimenti normativi citati nell'interpello (vedi
+    normative_refs.py): stringhe per le norme mappate sul TU IVA, numeri
+    degli articoli citati e riferimenti strutturati.
+    """
+    return summarize_references(text)
+
+
+# Vocabolario tematico (allineato ai temi del TU IVA database)
+IVA_TOPICS = {
+    'aliquote': [r'aliquot[ae]', r'\d+\s*per\s*cento', r'\d+%'],
+    'esenzioni': [r'esent[ei]', r'esenzione', r'art\.?\s*10\b'],
+    'detrazione': [r'detrazion[ei]', r'detraibil[ei]', r'pro[\s-]*rata'],
+    'base_imponibile': [r'base\s+imponibile', r'corrispettivo'],
+    'fatturazione': [r'fattur[ae]', r'fatturazione', r'nota\s+di\s+variazione'],
+    'registrazione': [r'registr[oi]', r'registrazione'],
+    'dichiarazione': [r'dichiarazion[ei]'],
+    'rimborsi': [r'rimbors[oi]', r'credito\s+iva'],
+    'operazioni_intra': [r'intra(?:unional|comunitari)', r'acquist[oi]\s+intra'],
+    'importazioni': [r'importazion[ei]', r'dogan'],
+    'esportazioni': [r'esportazion[ei]', r'plafond'],
+    'regime_speciale': [r'regime\s+special', r'regime\s+forfet', r'margine', r'regime\s+agric'],
+    'cessioni_beni': [r'cession[ei]\s+di\s+beni', r'cessione\s+immobil'],
+    'prestazioni_servizi': [r'prestazion[ei]\s+di\s+servizi'],
+    'reverse_charge': [r'reverse\s+charge', r'inversione\s+contabile'],
+    'split_payment': [r'split\s+payment', r'scissione\s+dei\s+pagamenti'],
+    'iva_edilizia': [r'edilizi', r'costruzion', r'ristrutturazion', r'superbonus', r'bonus\s+faccat'],
+    'commercio_elettronico': [r'commercio\s+elettronico', r'e[\s-]*commerce', r'piattaforma'],
+    'gruppo_iva': [r'gruppo\s+iva'],
+    'territorialita': [r'territorialit', r'stabile\s+organizzazione'],
+    'compensazioni': [r'compensazion'],
+    'cessione_credito': [r'cessione\s+del?\s+credito', r'sconto\s+in\s+fattura'],
+}
 
-    # Trova le posizioni di tutte le sezioni
-    found_positions = []
-    for pattern, key in section_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            found_positions.append((match.start(), match.end(), key))
+_TOPIC_ENGINE = TopicEngine(IVA_TOPICS, ignore_case=True)
 
-    # Ordina per posizione
-    found_positions.sort(key=lambda x: x[0])
 
-    # Estrai il testo di ogni sezione
-    for i, (start, content_start, key) in enumerate(found_positions):
-        if i + 1 < len(found_positions):
-            end = found_positions[i + 1][0]
-        else:
-            end = len(text)
-        section_text = text[content_start:end].strip()
-        # Pulizia
-        section_text = re.sub(r'\n{3,}', '\n\n', section_text)
-        sections[key] = section_text
+def extract_iva_topics(text, tag, oggetto):
+    """Classifica l'interpello per temi IVA (allineato al TU IVA database)."""
+    return _TOPIC_ENGINE.classify(f"{tag} {oggetto} {text or ''}")
 
-    return sections
 
+# ─── Step 4: Costruisci il database ─────────────────────────────────────────
 
-def extract_normative_references(text):
-    """Estrae i riferimenti normativi citati nell'interpello."""
-    if not text:
-        return []
+def parse_document(rec):
+    """
+    Lavoro per un singolo interpello: estrazione del testo, sezioni,
+    riferimenti normativi e temi. È una funzione di modulo (serializzabile)
+    così da poter girare in un processo del pool.
+
+    Con PARSE_CACHE_DIR ogni passo viene letto dalla cache del PDF se è
+    stato calcolato con la stessa versione e gli stessi input.
 
-    refs = set()
+    Restituisce (entry, errore, tempi) con errore None se il parsing è
+    riuscito e tempi = {passo: secondi} per il profiler (solo i passi
+    effettivamente calcolati).
+    """
+    pdf_path = rec.get('_pdf_path')
+    timings = {}
+    error = None
 
-    # DPR 633/72 (vecchio IVA)
-    if re.search(r'd\.?P\.?R\.?\s*(?:n\.\s*)?633|decreto.+?(?:26\s+ottobre\s+1972|n\.\s*633)', text, re.IGNORECASE):
-        arts = re.findall(r'(?:articol[oi]|art\.)\s*(\d+(?:\s*-\s*(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?)\s*(?:del|,)?\s*(?:d\.?P\.?R\.?\s*(?:n\.\s*)?633|decreto.+?633)', text, re.IGNORECASE)
-        for a in arts:
-            refs.add(f"DPR 633/1972 art. {re.sub(r's+', '', a)}")
+    # Estrai testo dal PDF
+    full_text = None
+    sections = {}
+    norm_refs = {'riferimenti_specifici': [], 'articoli_citati': [], 'riferimenti': []}
 
-    # DL 331/93
-    if re.search(r'd\.?[Ll]\.?\s*(?:n\.\s*)?331|decreto.+?(?:30\s+agosto\s+1993|n\.\s*331)', text, re.IGNORECASE):
-        arts = re.findall(r'(?:articol[oi]|art\.)\s*(\d+(?:\s*-\s*(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?)\s*(?:del|,)?\s*(?:d\.?[Ll]\.?\s*(?:n\.\s*)?331|decreto.+?331)', text, re.IGNORECASE)
-        for a in arts:
-            refs.add(f"DL 331/1993 art. {re.sub(r's+', '', a)}")
+    def timed(step, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[step] = time.perf_counter() - start
+
+    if not (pdf_path and Path(pdf_path).exists()):
+        topics = timed('temi', extract_iva_topics, rec['massima'], rec['tag'], rec['oggetto'])
+        return _build_entry(rec, full_text, sections, norm_refs, topics), error, timings
+
+    if PARSE_CACHE_DIR:
+        doc = ParseCache(PARSE_CACHE_DIR).document(rec.get('_pdf_sha256') or file_sha256(pdf_path))
+        cached = lambda step, key, fn, *args, **kw: doc.get(step, key, timed, step, fn, *args, **kw)
+    else:
+        doc = None
+        cached = lambda step, key, fn, *args, **kw: timed(step, fn, *args)
+
+    # extract_pdf_text restituisce None anche per errori transitori: un testo
+    # non estratto non va in cache, così il prossimo build riprova
+    text_key = stage_key(extractor_fingerprint(PDF_BACKEND))
+    full_text = cached('estrazione_pdf', text_key, extract_pdf_text, pdf_path, cacheable=bool)
+    if full_text:
+        sections = cached('sezioni', stage_key(SECTIONS_VERSION, text_key),
+                          parse_interpello_sections, full_text)
+        norm_refs = cached('riferimenti', stage_key(REFERENCES_VERSION, text_key),
+                           extract_normative_references, full_text)
+        # Classifica temi
+        topics_key = stage_key(TOPICS_VERSION, IVA_TOPICS, text_key, rec['tag'], rec['oggetto'], rec['massima'])
+        topics = cached('temi', topics_key, extract_iva_topics, full_text, rec['tag'], rec['oggetto'])
+    else:
+        error = {'numero': rec['numero'], 'anno': rec['anno'], 'errore': 'testo non estratto'}
+        # temi dalla sola massima, senza cache (dipendono dal testo mancante)
+        topics = timed('temi', extract_iva_topics, rec['massima'], rec['tag'], rec['oggetto'])
 
-    # D.Lgs 10/2026 (nuovo TU IVA) - se qualche interpello lo cita già
-    if re.search(r'd\.?\s*[Ll]gs\.?\s*(?:n\.\s*)?10.+?2026|testo\s+unico\s+iva', text, re.IGNORECASE):
-        refs.add("D.Lgs. 10/2026 (TU IVA)")
+    if doc is not None:
+        doc.save()
+    return _build_entry(rec, full_text, sections, norm_refs, topics), error, timings
 
-    # Pattern generico per articoli citati senza norma specifica
-    generic_arts = re.findall(
-        r'(?:articol[oi]|art\.)\s*(\d+(?:\s*-\s*(?:bis|ter|quater|quinquies|sexies|septies|octies|novies|decies))?)',
-        text, re.IGNORECASE
-    )
 
+def _entry_id(rec):
+    return f"interpello_{rec['anno']}_{rec['numero']}"
+
+
+def _build_entry(rec, full_text, sections, norm_refs, topics):
+    """Costruisce la voce del database per un interpello."""
     return {
-        'riferimenti_specifici': sorted(refs),
-        'articoli_citati': sorted(set(re.sub(r'\s+', '', a) for a in generic_arts))
-    }
+        'id': _entry_id(rec),
+        'numero': rec['numero'],
+        'anno': rec['anno'],
+        'data': rec['data'],
+        'tag': rec['tag'],
+        'oggetto': rec['oggetto'],
+        'massima': rec['massima'],
+        'link_pdf': rec['link_pdf'],
+
+        # Sezioni estratte dal PDF
+        'sezioni': {
+            'oggetto_completo': sections.get('oggetto', None),
+            'quesito': sections.get('quesito', None),
+            'soluzione_contribuente': sections.get('soluzione_contribuente', None),
+            'parere_ade': sections.get('parere_ade', None),
+        },
 
+        # Testo integrale per ricerca full-text
+        'testo_integrale': full_text,
 
-def extract_iva_topics(text, tag, oggetto):
-    """Classifica l'interpello per temi IVA (allineato al TU IVA database)."""
-    combined = f"{tag} {oggetto} {text or ''}".lower()
-    topics = []
-
-    topic_patterns = {
-        'aliquote': [r'aliquot[ae]', r'\d+\s*per\s*cento', r'\d+%'],
-        'esenzioni': [r'esent[ei]', r'esenzione', r'art\.?\s*10\b'],
-        'detrazione': [r'detrazion[ei]', r'detraibil[ei]', r'pro[\s-]*rata'],
-        'base_imponibile': [r'base\s+imponibile', r'corrispettivo'],
-        'fatturazione': [r'fattur[ae]', r'fatturazione', r'nota\s+di\s+variazione'],
-        'registrazione': [r'registr[oi]', r'registrazione'],
-        'dichiarazione': [r'dichiarazion[ei]'],
-        'rimborsi': [r'rimbors[oi]', r'credito\s+iva'],
-        'operazioni_intra': [r'intra(?:unional|comunitari)', r'acquist[oi]\s+intra'],
-        'importazioni': [r'importazion[ei]', r'dogan'],
-        'esportazioni': [r'esportazion[ei]', r'plafond'],
-        'regime_speciale': [r'regime\s+special', r'regime\s+forfet', r'margine', r'regime\s+agric'],
-        'cessioni_beni': [r'cession[ei]\s+di\s+beni', r'cessione\s+immobil'],
-        'prestazioni_servizi': [r'prestazion[ei]\s+di\s+servizi'],
-        'reverse_charge': [r'reverse\s+charge', r'inversione\s+contabile'],
-        'split_payment': [r'split\s+payment', r'scissione\s+dei\s+pagamenti'],
-        'iva_edilizia': [r'edilizi', r'costruzion', r'ristrutturazion', r'superbonus', r'bonus\s+faccat'],
-        'commercio_elettronico': [r'commercio\s+elettronico', r'e[\s-]*commerce', r'piattaforma'],
-        'gruppo_iva': [r'gruppo\s+iva'],
-        'territorialita': [r'territorialit', r'stabile\s+organizzazione'],
-        'compensazioni': [r'compensazion'],
-        'cessione_credito': [r'cessione\s+del?\s+credito', r'sconto\s+in\s+fattura'],
+        # Riferimenti normativi
+        'riferimenti_normativi': norm_refs,
+
+        # Classificazione tematica (allineata al TU IVA)
+        'temi': topics,
+
+        # Metadati per RAG
+        'metadati_rag': {
+            'search_text': _build_search_text(rec, sections),
+            'citazione': f"Risposta a interpello n. {rec['numero']}/{rec['anno']} del {rec['data']}",
+            'citazione_breve': f"Interpello {rec['numero']}/{rec['anno']}",
+            'ha_testo_completo': full_text is not None,
+            'lunghezza_caratteri': len(full_text) if full_text else 0,
+        },
+
+        # Compilato da link_entry() nel processo principale (serve il TU IVA)
+        'articoli_tu_iva_collegati': [],
     }
 
-    for topic, patterns in topic_patterns.items():
-        for p in patterns:
-            if re.search(p, combined):
-                topics.append(topic)
-                break
 
-    return topics
+def iter_parsed_documents(records, workers=1):
+    """
+    Genera (entry, errore, tempi) per ogni record, nell'ordine dei record.
+
+    Con workers > 1 i documenti vengono elaborati da un pool di processi;
+    i task sono inviati a blocchi (al più PARSE_CHUNKSIZE) per ridurre il costo
+    di comunicazione e map() restituisce i risultati nell'ordine di invio,
+    quindi l'output è identico a quello seriale.
+    """
+    if workers <= 1 or len(records) <= 1:
+        yield from map(parse_document, records)
+        return
 
+    # blocchi più piccoli quando i documenti sono pochi, per tenere occupati tutti i processi
+    chunksize = max(1, min(PARSE_CHUNKSIZE, len(records) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=stop_worker_tracing) as pool:
+        yield from pool.map(parse_document, records, chunksize=chunksize)
 
-# ─── Step 4: Costruisci il database ─────────────────────────────────────────
 
-def build_database(records):
-    """Costruisce il database JSON completo."""
+def _record_timings(profiler, doc_id, timings):
+    profiler.add_item('documenti', doc_id, sum(timings.values()))
+    for step, seconds in timings.items():
+        profiler.add_item(f'documenti/{step}', doc_id, seconds)
+
+
+def parse_records(records, profiler=None, workers=PARSE_WORKERS):
+    """
+    Parsa i PDF dei record e restituisce le voci del database nell'ordine
+    dei record. Se viene passato un BuildProfiler, registra i tempi per
+    documento e per singolo passo di parsing.
+    """
+    if profiler is None:
+        profiler = BuildProfiler('interpelli', enabled=False)
+
     interpelli_db = []
     parse_errors = []
 
     total = len(records)
-    print(f"\n📄 Parsing di {total} PDF...\n")
+    print(f"\n📄 Parsing di {total} PDF ({workers} processi)...\n")
 
-    for i, rec in enumerate(records):
-        pdf_path = rec.get('_pdf_path')
+    for i, (entry, error, timings) in enumerate(iter_parsed_documents(records, workers)):
+        rec = records[i]
         progress = (i + 1) / total * 100
         print(f"\r   [{progress:5.1f}%] {i+1}/{total} — Interpello {rec['numero']}/{rec['anno']}", end='', flush=True)
 
-        # Estrai testo dal PDF
-        full_text = None
-        sections = {}
-        norm_refs = {'riferimenti_specifici': [], 'articoli_citati': []}
-
-        if pdf_path and Path(pdf_path).exists():
-            full_text = extract_pdf_text(pdf_path)
-            if full_text:
-                sections = parse_interpello_sections(full_text)
-                norm_refs = extract_normative_references(full_text)
-            else:
-                parse_errors.append({'numero': rec['numero'], 'anno': rec['anno'], 'errore': 'testo non estratto'})
-
-        # Classifica temi
-        topics = extract_iva_topics(
-            full_text or rec['massima'],
-            rec['tag'],
-            rec['oggetto']
-        )
-
-        # Costruisci entry
-        entry = {
-            'id': f"interpello_{rec['anno']}_{rec['numero']}",
-            'numero': rec['numero'],
-            'anno': rec['anno'],
-            'data': rec['data'],
-            'tag': rec['tag'],
-            'oggetto': rec['oggetto'],
-            'massima': rec['massima'],
-            'link_pdf': rec['link_pdf'],
-
-            # Sezioni estratte dal PDF
-            'sezioni': {
-                'oggetto_completo': sections.get('oggetto', None),
-                'quesito': sections.get('quesito', None),
-                'soluzione_contribuente': sections.get('soluzione_contribuente', None),
-                'parere_ade': sections.get('parere_ade', None),
-            },
+        if error:
+            parse_errors.append(error)
+        _record_timings(profiler, entry['id'], timings)
 
-            # Testo integrale per ricerca full-text
-            'testo_integrale': full_text,
+        interpelli_db.append(entry)
 
-            # Riferimenti normativi
-            'riferimenti_normativi': norm_refs,
+    print(f"\n\n   Parsati: {total} | Errori parsing: {len(parse_errors)}")
+    profiler.count('documenti', total)
+    profiler.count('errori_parsing', len(parse_errors))
 
-            # Classificazione tematica (allineata al TU IVA)
-            'temi': topics,
+    return interpelli_db
 
-            # Metadati per RAG
-            'metadati_rag': {
-                'search_text': _build_search_text(rec, sections),
-                'citazione': f"Risposta a interpello n. {rec['numero']}/{rec['anno']} del {rec['data']}",
-                'citazione_breve': f"Interpello {rec['numero']}/{rec['anno']}",
-                'ha_testo_completo': full_text is not None,
-                'lunghezza_caratteri': len(full_text) if full_text else 0,
-            }
-        }
 
-        interpelli_db.append(entry)
+def build_database(records, profiler=None, workers=PARSE_WORKERS, tu_db=None):
+    """
+    Costruisce il database JSON completo (vedi parse_records); con tu_db
+    le voci vengono collegate agli articoli del TU IVA.
+    """
+    entries = parse_records(records, profiler, workers)
+    if tu_db is not None:
+        link_entries(entries, tu_db)
+    return assemble_database(entries)
 
-    print(f"\n\n   Parsati: {total} | Errori parsing: {len(parse_errors)}")
 
+def assemble_database(entries):
+    """
+    Metadati, conteggi e indice tematico del database. Usa solo i campi
+    id, numero, anno, oggetto, tag, temi, metadati_rag.ha_testo_completo e
+    articoli_tu_iva_collegati, quindi accetta anche i riepiloghi prodotti
+    dalla pipeline.
+    """
     # Costruisci indice tematico
     indice_tematico = {}
-    for entry in interpelli_db:
+    for entry in entries:
         for topic in entry['temi']:
             if topic not in indice_tematico:
                 indice_tematico[topic] = []
@@ -408,15 +867,16 @@ def build_database(records):
         'metadata': {
             'descrizione': 'Database interpelli Agenzia delle Entrate 2024-2025 per sistema RAG',
             'data_generazione': datetime.now().isoformat(),
-            'totale_interpelli': len(interpelli_db),
+            'totale_interpelli': len(entries),
             'per_anno': {
-                '2024': sum(1 for e in interpelli_db if e['anno'] == 2024),
-                '2025': sum(1 for e in interpelli_db if e['anno'] == 2025),
+                '2024': sum(1 for e in entries if e['anno'] == 2024),
+                '2025': sum(1 for e in entries if e['anno'] == 2025),
             },
-            'per_tag': _count_by(interpelli_db, 'tag'),
-            'con_testo_completo': sum(1 for e in interpelli_db if e['metadati_rag']['ha_testo_completo']),
+            'per_tag': _count_by(entries, 'tag'),
+            'con_testo_completo': sum(1 for e in entries if e['metadati_rag']['ha_testo_completo']),
+            'collegamenti_tu_iva': link_counts(entries),
             'note_per_rag': {
-                'collegamento_tu_iva': 'Usare il campo riferimenti_normativi.riferimenti_specifici per collegare gli interpelli agli articoli del TU IVA tramite la mappatura_vecchio_nuovo_codice del database TU IVA',
+                'collegamento_tu_iva': 'articoli_tu_iva_collegati contiene gli articoli del TU IVA corrispondenti a riferimenti_normativi.riferimenti_specifici secondo la mappatura_vecchio_nuovo_codice del database TU IVA (che riporta la direzione inversa in interpelli_collegati)',
                 'retrieval_strategy': [
                     '1. Ricerca semantica su metadati_rag.search_text per trovare interpelli pertinenti alla domanda',
                     '2. Filtraggio per temi (allineati a quelli del TU IVA) per precision',
@@ -425,7 +885,7 @@ def build_database(records):
                 ],
             },
         },
-        'interpelli': interpelli_db,
+        'interpelli': entries,
         'indice_tematico': indice_tematico,
     }
 
@@ -457,9 +917,600 @@ def _count_by(entries, field):
     return dict(sorted(counts.items(), key=lambda x: -x[1]))
 
 
+def default_output_path(fmt):
+    return OUTPUT_JSONL if fmt == 'jsonl' else OUTPUT_JSON
+
+
+def partial_output_path(output_path):
+    """File (una voce per riga) con le voci già elaborate di un'esecuzione in corso o interrotta."""
+    return output_path.with_name(output_path.name + '.parziale.jsonl')
+
+
+def write_database(database, output_path, fmt):
+    """Salva il database nel formato richiesto (rinomina atomica) e, con SPLIT_OUTPUT, diviso."""
+    if fmt == 'jsonl':
+        write_ndjson_database(output_path, database)
+    else:
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(database, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(output_path)
+    if SPLIT_OUTPUT:
+        write_split_database(output_path, database, database['interpelli'])
+
+
+def load_database(output_path, fmt):
+    if fmt == 'jsonl':
+        return load_ndjson_database(output_path)
+    with open(output_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ─── Step 5: Pipeline download → parsing → scrittura ────────────────────────
+
+def parsing_key():
+    """
+    Chiave dei passi di parsing con cui è calcolata una voce (estrattore,
+    versioni di sezioni/riferimenti/temi e pattern dei temi): le voci di
+    un file parziale scritte con un'altra chiave vanno rielaborate.
+    """
+    return stage_key(extractor_fingerprint(PDF_BACKEND), SECTIONS_VERSION,
+                     REFERENCES_VERSION, TOPICS_VERSION, IVA_TOPICS)
+
+
+def _summary(entry):
+    """Campi della voce che servono a assemble_database()."""
+    return {
+        'id': entry['id'],
+        'numero': entry['numero'],
+        'anno': entry['anno'],
+        'oggetto': entry['oggetto'],
+        'tag': entry['tag'],
+        'temi': entry['temi'],
+        'metadati_rag': {'ha_testo_completo': entry['metadati_rag']['ha_testo_completo']},
+        'articoli_tu_iva_collegati': entry['articoli_tu_iva_collegati'],
+    }
+
+
+def _indented_json(obj, level):
+    """json.dumps con indent=2 come se obj fosse annidato al livello dato."""
+    return json.dumps(obj, ensure_ascii=False, indent=2).replace('\n', '\n' + '  ' * level)
+
+
+class EntrySpool:
+    """
+    Scrittore della pipeline: le voci arrivano nell'ordine di completamento
+    e vengono subito aggiunte, una per riga, a un file JSON Lines parziale
+    (in memoria restano solo offset e riepiloghi). A fine pipeline
+    write_json() / write_ndjson() compongono il database nell'ordine dei
+    record; se l'esecuzione si interrompe, il file parziale resta e
+    recover() permette alla successiva di riprendere da lì.
+
+    Ogni riga del file parziale è "<chiave>\t<voce JSON>", con key la
+    chiave dei passi di parsing (vedi parsing_key()): in uscita si copia
+    solo la voce.
+    """
+
+    def __init__(self, partial_path, key):
+        self.partial_path = Path(partial_path)
+        self._prefix = key.encode('utf-8') + b'\t'
+        self._file = open(self.partial_path, 'a+b')
+        self._where = {}
+        self.summaries = {}
+
+    def recover(self, records, link_index=None):
+        """
+        Indicizza le voci già presenti nel file parziale che corrispondono
+        ancora ai record (stessa riga dell'Excel) e sono state calcolate con
+        la stessa chiave; restituisce gli indici dei record già completati.
+        Le voci senza testo di un record con link vengono rielaborate (per
+        riprovare il download); una riga troncata da un'interruzione viene
+        scartata. Con link_index le voci recuperate vengono ricollegate al
+        TU IVA, e quelle con collegamenti cambiati riscritte in fondo al file.
+        """
+        by_id = {_entry_id(rec): i for i, rec in enumerate(records)}
+        relinked = {}
+        self._file.seek(0)
+        offset = 0
+        for line in self._file:
+            if not line.endswith(b'\n'):
+                self._file.truncate(offset)
+                break
+            entry = None
+            if line.startswith(self._prefix):
+                try:
+                    entry = json.loads(line[len(self._prefix):])
+                except ValueError:
+                    pass
+            i = by_id.get(entry['id']) if entry else None
+            if (i is not None and row_hash(entry) == row_hash(records[i])
+                    and (entry['metadati_rag']['ha_testo_completo'] or not records[i]['link_pdf'])):
+                relinked.pop(i, None)
+                if link_index is not None:
+                    before = entry.get('articoli_tu_iva_collegati')
+                    if link_entry(entry, link_index) != before:
+                        relinked[i] = entry
+                self._where[i] = (offset + len(self._prefix), len(line) - len(self._prefix))
+                self.summaries[i] = _summary(entry)
+            offset += len(line)
+        for i, entry in relinked.items():
+            self.add(i, entry)
+        return set(self._where)
+
+    def add(self, index, entry):
+        line = encode_line(entry)
+        self._file.seek(0, os.SEEK_END)
+        self._where[index] = (self._file.tell() + len(self._prefix), len(line))
+        self._file.write(self._prefix + line)
+        self._file.flush()
+        self.summaries[index] = _summary(entry)
+
+    def __len__(self):
+        return len(self._where)
+
+    def _lines(self):
+        for index in sorted(self._where):
+            offset, length = self._where[index]
+            self._file.seek(offset)
+            yield self._file.read(length)
+
+    def entries(self):
+        for line in self._lines():
+            yield json.loads(line)
+
+    def _aggregates(self):
+        database = assemble_database([self.summaries[i] for i in sorted(self.summaries)])
+        del database['interpelli']
+        return database
+
+    def write_ndjson(self, path):
+        """Scrive il database JSON Lines + file indice e lo restituisce senza le voci."""
+        database = self._aggregates()
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                for line in self._lines():
+                    f.write(line)   # righe copiate così come sono, senza riserializzare
+            tmp_path.replace(path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        write_sidecar(path, database)
+        return database
+
+    def write_json(self, path):
+        """Scrive il database completo in path (rinomina atomica) e lo restituisce senza le voci."""
+        database = self._aggregates()
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('{\n  "metadata": ' + _indented_json(database['metadata'], 1))
+                f.write(',\n  "interpelli": [')
+                first = True
+                for entry in self.entries():
+                    f.write(('\n' if first else ',\n') + '    ' + _indented_json(entry, 2))
+                    first = False
+                f.write(']' if first else '\n  ]')
+                f.write(',\n  "indice_tematico": ' + _indented_json(database['indice_tematico'], 1) + '\n}')
+            tmp_path.replace(path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return database
+
+    def close(self, remove=False):
+        """Chiude il file parziale; remove=True lo elimina (database già scritto)."""
+        self._file.close()
+        if remove:
+            self.partial_path.unlink(missing_ok=True)
+
+
+def run_pipeline(records, profiler=None, output_path=None, cache_dir=None,
+                 download_workers=DOWNLOAD_WORKERS, parse_workers=PARSE_WORKERS,
+                 limiter=None, refresh=REFRESH_CACHE, fmt=None, tu_db=None):
+    """
+    Download, parsing e scrittura sovrapposti: ogni PDF viene passato al
+    pool di parsing appena scaricato (quelli già in cache subito) e ogni
+    voce completata va allo scrittore. Code limitate tra gli stadi danno
+    backpressure: se il parsing resta indietro i download si fermano.
+
+    Il file di output (scritto con rinomina atomica, nel formato fmt) e
+    errori_download.json sono identici a quelli dell'esecuzione a fasi.
+    Un'interruzione (Ctrl-C o errore) ferma tutti gli stadi e lascia intatto
+    l'output precedente; le voci già completate restano nel file parziale
+    e l'esecuzione successiva riparte da quelle mancanti.
+
+    Con tu_db ogni voce viene collegata agli articoli del TU IVA prima di
+    essere scritta, e a fine esecuzione il TU IVA riceve interpelli_collegati.
+
+    Restituisce (database senza 'interpelli', errori di download).
+    """
+    if profiler is None:
+        profiler = BuildProfiler('interpelli', enabled=False)
+    if limiter is None:
+        limiter = DownloadLimiter()
+    fmt = fmt or OUTPUT_FORMAT
+    output_path = Path(output_path or default_output_path(fmt))
+    link_index = build_link_index(tu_db['mappatura_vecchio_nuovo_codice']) if tu_db is not None else None
+
+    total = len(records)
+    print(f"\n🔄 Pipeline su {total} interpelli ({download_workers} thread download, "
+          f"{parse_workers} processi parsing)")
+    print(f"   Cache: {cache_dir or PDF_CACHE_DIR}")
+
+    spool = EntrySpool(partial_output_path(output_path), parsing_key())
+    completed = spool.recover(records, link_index)
+    if completed:
+        print(f"   Ripresa da {spool.partial_path.name}: {len(completed)} interpelli già elaborati")
+
+    cache = open_pdf_cache(records, cache_dir)
+    cached, failed, to_download = plan_downloads(records, cache, refresh)
+    to_download = [item for item in to_download if item[0] not in completed]
+    print(f"   Dalla cache: {len(cached)} | Senza link: {len(failed)} | Da scaricare/verificare: {len(to_download)}\n")
+
+    ready = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)   # indici dei record pronti per il parsing
+    work = queue.Queue()
+    for item in to_download:
+        work.put(item)
+    cancel = threading.Event()
+    lock = threading.Lock()
+    stage_errors = []
+    counts = {'scaricati': 0}
+
+    def put_ready(i):
+        # attende posto nella coda (backpressure) finché la pipeline è attiva
+        while not cancel.is_set():
+            try:
+                ready.put(i, timeout=0.2)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def feeder():
+        downloading = {i for i, _, _ in to_download}
+        for i in range(total):
+            if i not in downloading and i not in completed and not put_ready(i):
+                return
+
+    def downloader(session):
+        while not cancel.is_set():
+            try:
+                i, rec, key = work.get_nowait()
+            except queue.Empty:
+                return
+            status = download_pdf(rec['link_pdf'], key, cache, limiter, session, refresh)
+            with lock:
+                if status:
+                    attach_pdf(rec, cache, key)
+                    counts['scaricati'] += 1
+                else:
+                    _detach_pdf(rec)
+                    failed.append((i, _download_error(rec)))
+            if not put_ready(i):
+                return
+
+    def guarded(fn, *args):
+        try:
+            fn(*args)
+        except BaseException as e:
+            stage_errors.append(e)
+            cancel.set()
+
+    parse_errors = []
+    session = make_session(download_workers)
+    threads = [threading.Thread(target=guarded, args=(feeder,), daemon=True)]
+    threads += [threading.Thread(target=guarded, args=(downloader, session), daemon=True)
+                for _ in range(max(1, download_workers))]
+    pool = ProcessPoolExecutor(max_workers=max(1, parse_workers), initializer=stop_worker_tracing)
+    try:
+        for t in threads:
+            t.start()
+
+        pending = {}
+        submitted = 0
+        while len(spool) < total:
+            if cancel.is_set():
+                raise RuntimeError("pipeline interrotta") from (stage_errors[0] if stage_errors else None)
+            # riempi il pool finché c'è posto
+            while submitted < total - len(completed) and len(pending) < PARSE_INFLIGHT:
+                try:
+                    i = ready.get(timeout=0.05 if pending else 0.2)
+                except queue.Empty:
+                    break
+                pending[pool.submit(parse_document, records[i])] = i
+                submitted += 1
+            if not pending:
+                continue
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                entry, error, timings = future.result()
+                if error:
+                    parse_errors.append((i, error))
+                _record_timings(profiler, entry['id'], timings)
+                if link_index is not None:
+                    link_entry(entry, link_index)
+                spool.add(i, entry)
+            print(f"\r   Scaricati {counts['scaricati']}/{len(to_download)} · "
+                  f"parsati {len(spool)}/{total}", end='', flush=True)
+    except BaseException:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        spool.close()
+        raise
+    finally:
+        cancel.set()
+        for t in threads:
+            t.join()
+        session.close()
+        cache.save()
+
+    pool.shutdown()
+    cache.prune()
+
+    failed = [err for _, err in sorted(failed, key=lambda x: x[0])]
+    print(f"\n\n   Parsati: {total} | Errori download: {len(failed)} | Errori parsing: {len(parse_errors)}")
+    save_download_errors(failed)
+    profiler.count('documenti', total)
+    profiler.count('errori_parsing', len(parse_errors))
+
+    print(f"\n💾 Salvataggio in: {output_path}")
+    try:
+        database = spool.write_ndjson(output_path) if fmt == 'jsonl' else spool.write_json(output_path)
+        if SPLIT_OUTPUT:
+            write_split_database(output_path, database, spool.entries())
+    except BaseException:
+        spool.close()
+        raise
+    spool.close(remove=True)
+    if tu_db is not None:
+        save_tu_links(tu_db, [spool.summaries[i] for i in sorted(spool.summaries)])
+    return database, failed
+
+
+# ─── Step 6: Aggiornamento incrementale ─────────────────────────────────────
+
+# Campi dell'Excel che, se cambiano, richiedono di rielaborare l'interpello
+ROW_FIELDS = ('numero', 'anno', 'data', 'tag', 'oggetto', 'massima', 'link_pdf')
+
+
+def row_hash(row):
+    """Hash dei campi Excel di un interpello (record dell'Excel o voce del database)."""
+    raw = json.dumps([row[f] for f in ROW_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def diff_records(records, entries):
+    """
+    Confronta i record dell'Excel con le voci del database per chiave
+    (anno, numero) e hash della riga.
+    Restituisce (da_elaborare, id_rimossi, conteggi): da_elaborare contiene
+    i record nuovi, modificati e quelli ancora senza testo completo (per
+    riprovare il download).
+    """
+    existing = {(e['anno'], e['numero']): e for e in entries}
+    keys = set()
+    to_process = []
+    counts = {'nuovi': 0, 'modificati': 0, 'da_riprovare': 0, 'rimossi': 0}
+    for rec in records:
+        key = (rec['anno'], rec['numero'])
+        keys.add(key)
+        entry = existing.get(key)
+        if entry is None:
+            counts['nuovi'] += 1
+        elif row_hash(entry) != row_hash(rec):
+            counts['modificati'] += 1
+        elif not entry['metadati_rag']['ha_testo_completo'] and rec['link_pdf']:
+            counts['da_riprovare'] += 1
+        else:
+            continue
+        to_process.append(rec)
+    removed = [e['id'] for key, e in existing.items() if key not in keys]
+    counts['rimossi'] = len(removed)
+    return to_process, removed, counts
+
+
+def patch_database(database, records, updated, removed_ids):
+    """
+    Applica al database le voci rielaborate (nuove o sostitutive) e le
+    rimozioni, aggiornando sul posto conteggi per anno/tag e indice
+    tematico: vengono toccate solo le voci cambiate e i temi che le
+    riguardano. Voci, temi e liste dell'indice restano nell'ordine che
+    avrebbero dopo una ricostruzione completa.
+    """
+    meta = database['metadata']
+    index = database['indice_tematico']
+    entries = database['interpelli']
+    order = {_entry_id(rec): i for i, rec in enumerate(records)}
+    position = {e['id']: i for i, e in enumerate(entries)}
+    dropped = {}    # tema -> id da togliere dall'indice
+
+    def account(entry, sign):
+        meta['totale_interpelli'] += sign
+        if str(entry['anno']) in meta['per_anno']:
+            meta['per_anno'][str(entry['anno'])] += sign
+        meta['per_tag'][entry['tag']] = meta['per_tag'].get(entry['tag'], 0) + sign
+        if entry['metadati_rag']['ha_testo_completo']:
+            meta['con_testo_completo'] += sign
+        for topic in entry['temi']:
+            if sign < 0:
+                dropped.setdefault(topic, set()).add(entry['id'])
+
+    for entry_id in removed_ids:
+        account(entries[position[entry_id]], -1)
+        entries[position[entry_id]] = None
+
+    added = []
+    for entry in updated:
+        i = position.get(entry['id'])
+        if i is None:
+            entries.append(entry)
+        else:
+            account(entries[i], -1)
+            entries[i] = entry
+        account(entry, +1)
+        added.append(entry)
+
+    if removed_ids:
+        entries[:] = [e for e in entries if e is not None]
+    # timsort: lineare su una lista già quasi ordinata
+    entries.sort(key=lambda e: order[e['id']])
+
+    for topic, ids in dropped.items():
+        index[topic] = [x for x in index[topic] if x['id'] not in ids]
+    touched = set(dropped)
+    for entry in added:
+        for topic in entry['temi']:
+            index.setdefault(topic, []).append({
+                'id': entry['id'],
+                'numero': entry['numero'],
+                'anno': entry['anno'],
+                'oggetto': entry['oggetto'],
+            })
+            touched.add(topic)
+    for topic in touched:
+        if index[topic]:
+            index[topic].sort(key=lambda x: order[x['id']])
+        else:
+            del index[topic]
+    # temi nell'ordine di prima apparizione tra le voci, come in assemble_database()
+    if touched:
+        topics = {}
+        for entry in entries:
+            for topic in entry['temi']:
+                topics.setdefault(topic)
+        database['indice_tematico'] = {topic: index[topic] for topic in topics}
+
+    meta['per_tag'] = dict(sorted(((t, c) for t, c in meta['per_tag'].items() if c > 0),
+                                  key=lambda x: -x[1]))
+    meta['data_generazione'] = datetime.now().isoformat()
+    return database
+
+
+def run_incremental(records, profiler=None, output_path=None, fmt=None, tu_db=None):
+    """
+    Aggiorna il database esistente elaborando solo gli interpelli nuovi,
+    modificati o rimossi nell'Excel (più quelli ancora senza testo).
+    Con tu_db tutte le voci vengono ricollegate al TU IVA (costa una lookup
+    per riferimento), così i collegamenti seguono anche un TU ricostruito.
+    Restituisce (database, errori di download), oppure None se il database
+    non esiste ancora (serve una ricostruzione completa).
+    """
+    if profiler is None:
+        profiler = BuildProfiler('interpelli', enabled=False)
+    fmt = fmt or OUTPUT_FORMAT
+    output_path = Path(output_path or default_output_path(fmt))
+    if not output_path.exists():
+        print(f"\n⚠️  Database non trovato ({output_path}): ricostruzione completa")
+        return None
+
+    with profiler.stage('lettura_database'):
+        database = load_database(output_path, fmt)
+        to_process, removed_ids, counts = diff_records(records, database['interpelli'])
+
+    print(f"\n🔁 Aggiornamento incrementale: {counts['nuovi']} nuovi, {counts['modificati']} modificati, "
+          f"{counts['da_riprovare']} da riprovare, {counts['rimossi']} rimossi")
+    for name, value in counts.items():
+        profiler.count(name, value)
+    links_changed = False
+    if tu_db is not None:
+        before = [e.get('articoli_tu_iva_collegati') for e in database['interpelli']]
+        link_entries(database['interpelli'], tu_db)
+        links_changed = before != [e['articoli_tu_iva_collegati'] for e in database['interpelli']]
+    if not to_process and not removed_ids and not links_changed:
+        print("   Database già aggiornato.")
+        return database, []
+
+    download_errors = []
+    updated = []
+    if removed_ids and not to_process:
+        save_download_errors([], records)   # solo per togliere gli errori dei rimossi
+    if to_process:
+        with profiler.stage('download_pdf'):
+            to_process, download_errors = download_all_pdfs(to_process, save_errors=False)
+            save_download_errors(download_errors, records, to_process)
+        with profiler.stage('parsing'):
+            updated = parse_records(to_process, profiler)
+        if tu_db is not None:
+            link_entries(updated, tu_db)
+
+    with profiler.stage('aggiornamento_database'):
+        patch_database(database, records, updated, removed_ids)
+        database['metadata']['collegamenti_tu_iva'] = link_counts(database['interpelli'])
+
+    print(f"\n💾 Salvataggio in: {output_path}")
+    with profiler.stage('salvataggio'):
+        write_database(database, output_path, fmt)
+    if tu_db is not None:
+        save_tu_links(tu_db, database['interpelli'])
+    return database, download_errors
+
+
+# ─── Step 7: Collegamento con il TU IVA ─────────────────────────────────────
+
+def load_tu_database(path=None):
+    """Database del TU IVA per il collegamento; None se non disponibile."""
+    path = path or TU_DATABASE
+    if path is None:
+        return None
+    if not Path(path).exists():
+        print(f"\n⚠️  Database TU IVA non trovato ({path}): interpelli non collegati agli articoli")
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def link_entries(entries, tu_db):
+    """Collega le voci agli articoli del TU IVA (hash join sulla mappatura)."""
+    index = build_link_index(tu_db['mappatura_vecchio_nuovo_codice'])
+    for entry in entries:
+        link_entry(entry, index)
+
+
+def save_tu_links(tu_db, entries, path=None):
+    """
+    Scrive nel database del TU IVA la direzione inversa del collegamento
+    (interpelli_collegati) e i conteggi; accetta anche i riepiloghi della
+    pipeline. Il contenitore .rec accanto al JSON, se esiste, viene
+    riscritto per restare allineato.
+    """
+    path = Path(path or TU_DATABASE)
+    counts = link_counts(entries)
+    tu_db['interpelli_collegati'] = reverse_links(entries)
+    tu_db['metadata']['collegamenti_interpelli'] = counts
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(tu_db, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(path)
+    store_path = path.with_suffix('.rec')
+    if store_path.exists():
+        from parse_testo_unico_iva import write_record_store
+        write_record_store(tu_db, store_path)
+
+    print(f"   🔗 Collegamenti TU IVA: {counts['collegamenti']} "
+          f"({counts['interpelli_collegati']} interpelli → {counts['articoli_tu_collegati']} articoli) "
+          f"salvati in {path.name}")
+
+
 # ─── Main ────────────────────────────────────────────────────────────────────
 
 def main():
+    parser = argparse.ArgumentParser(description="Scarica e indicizza gli interpelli AdE elencati nell'Excel.")
+    parser.add_argument('--incrementale', action='store_true',
+                        help='aggiorna il database esistente elaborando solo gli interpelli '
+                             'nuovi, modificati o rimossi')
+    parser.add_argument('--formato', choices=('json', 'jsonl'), default=OUTPUT_FORMAT,
+                        help=f'formato di uscita (default {OUTPUT_FORMAT})')
+    parser.add_argument('--traccia-memoria', action='store_true', default=PROFILE_MEMORY,
+                        help='registra nel report anche il picco di memoria '
+                             '(tracemalloc, rallenta molto la build)')
+    args = parser.parse_args()
+    output_path = default_output_path(args.formato)
+
     print("=" * 60)
     print("SCRAPER INTERPELLI AGENZIA DELLE ENTRATE")
     print("=" * 60)
@@ -469,34 +1520,62 @@ def main():
         print(f"   Assicurati che 'INTERPELLI IVA.xlsx' sia nella cartella: {BASE_DIR}")
         sys.exit(1)
 
-    # Step 1: Leggi Excel
-    records = extract_excel_metadata()
-
-    # Step 2: Scarica PDF
-    records, download_errors = download_all_pdfs(records)
-
-    # Step 3: Parsa e costruisci database
-    database = build_database(records)
+    profiler = BuildProfiler('interpelli', enabled=PROFILE_REPORT is not None,
+                             trace_memory=args.traccia_memoria)
 
-    # Step 4: Salva
-    print(f"\n💾 Salvataggio in: {OUTPUT_JSON}")
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump(database, f, ensure_ascii=False, indent=2)
-
-    size_mb = OUTPUT_JSON.stat().st_size / 1024 / 1024
+    # Step 1: Leggi Excel
+    with profiler.stage('lettura_excel'):
+        records = extract_excel_metadata()
+    with profiler.stage('lettura_tu_iva'):
+        tu_db = load_tu_database()
+
+    result = None
+    if args.incrementale:
+        result = run_incremental(records, profiler, output_path, args.formato, tu_db)
+    if result is not None:
+        database, download_errors = result
+    elif PIPELINE:
+        # Step 2-4 sovrapposti: download, parsing e salvataggio
+        with profiler.stage('pipeline'):
+            database, download_errors = run_pipeline(records, profiler, output_path,
+                                                     fmt=args.formato, tu_db=tu_db)
+    else:
+        # Step 2: Scarica PDF
+        with profiler.stage('download_pdf'):
+            records, download_errors = download_all_pdfs(records)
+
+        # Step 3: Parsa e costruisci database
+        with profiler.stage('costruzione_database'):
+            database = build_database(records, profiler, tu_db=tu_db)
+
+        # Step 4: Salva
+        print(f"\n💾 Salvataggio in: {output_path}")
+        with profiler.stage('salvataggio'):
+            write_database(database, output_path, args.formato)
+            if tu_db is not None:
+                save_tu_links(tu_db, database['interpelli'])
+    profiler.count('errori_download', len(download_errors))
+
+    size_mb = output_path.stat().st_size / 1024 / 1024
 
     print(f"\n{'=' * 60}")
     print(f"✅ COMPLETATO!")
     print(f"{'=' * 60}")
-    print(f"   File: {OUTPUT_JSON}")
+    print(f"   File: {output_path}")
     print(f"   Dimensione: {size_mb:.1f} MB")
     print(f"   Interpelli: {database['metadata']['totale_interpelli']}")
     print(f"   Con testo completo: {database['metadata']['con_testo_completo']}")
+    links = database['metadata'].get('collegamenti_tu_iva')
+    if links:
+        print(f"   Collegati al TU IVA: {links['interpelli_collegati']} ({links['collegamenti']} collegamenti)")
     print(f"   Temi indicizzati: {len(database['indice_tematico'])}")
     print(f"\n   Per tag:")
     for tag, count in list(database['metadata']['per_tag'].items())[:10]:
         print(f"     {tag}: {count}")
 
+    if PROFILE_REPORT:
+        profiler.write_report(PROFILE_REPORT)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Database degli interpelli diviso in una parte "calda" e una "fredda".
+
+Ricerca per numero/anno, filtri per tag e temi e collegamenti al TU usano
+solo i metadati delle voci; testo integrale e sezioni pesano invece quasi
+tutto il file. Accanto al database vengono quindi scritti:
+
+    interpelli_2024_2025_database.meta.json    metadata, indice_tematico e voci
+                                               senza COLD_FIELDS (JSON compatto)
+    interpelli_2024_2025_database.testi.rec    contenitore record_store compresso:
+                                               id interpello → {sezioni, testo_integrale}
+
+Il testo di un interpello si legge su richiesta con una seek nel contenitore
+(tabella degli offset nell'header), senza caricare gli altri.
+"""
+
+import json
+from pathlib import Path
+
+from record_store import RecordStore, write_store
+
+# Campi delle voci spostati nel contenitore dei testi
+COLD_FIELDS = ('sezioni', 'testo_integrale')
+
+
+def split_paths(path):
+    """(file dei metadati, contenitore dei testi) associati al database in path."""
+    path = Path(path)
+    return path.with_name(path.stem + '.meta.json'), path.with_name(path.stem + '.testi.rec')
+
+
+def latest_database(path):
+    """
+    Versione più recente (per data di modifica) del database degli interpelli
+    tra quelle che scarica_interpelli.py scrive accanto a path: ('json',
+    file JSON), ('jsonl', file JSON Lines) o ('split', file dei metadati, se
+    c'è anche il contenitore dei testi); None se non ce n'è nessuna.
+    Cambiando formato di uscita le versioni vecchie restano sul disco: così
+    i consumatori leggono sempre l'ultima scritta.
+    """
+    json_path = Path(path).with_suffix('.json')
+    hot_path, texts_path = split_paths(json_path)
+    candidates = [(fmt, p) for fmt, p in (('json', json_path),
+                                          ('jsonl', json_path.with_suffix('.jsonl')),
+                                          ('split', hot_path))
+                  if p.exists() and (fmt != 'split' or texts_path.exists())]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: c[1].stat().st_mtime)
+
+
+def write_split_database(path, database, entries):
+    """
+    Scrive i due file a partire dai dati aggregati di database e dalle voci
+    (anche uno stream: in memoria restano solo le parti calde).
+    """
+    hot_path, texts_path = split_paths(path)
+    hot_entries = []
+
+    def cold_records():
+        for entry in entries:
+            hot_entries.append({k: v for k, v in entry.items() if k not in COLD_FIELDS})
+            yield entry['id'], {field: entry[field] for field in COLD_FIELDS}
+
+    write_store(texts_path, cold_records(), meta={'campi': list(COLD_FIELDS)}, compress=True)
+
+    hot = {
+        'metadata': database['metadata'],
+        'interpelli': hot_entries,
+        'indice_tematico': database['indice_tematico'],
+    }
+    tmp_path = hot_path.with_name(hot_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(hot, f, ensure_ascii=False, separators=(',', ':'))
+    tmp_path.replace(hot_path)
+    return hot_path, texts_path
+
+
+def load_hot_database(path):
+    """Database con le sole parti calde delle voci."""
+    with open(split_paths(path)[0], encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_split_entries(path):
+    """Voci complete, ricomposte una alla volta leggendo i testi su richiesta."""
+    database = load_hot_database(path)
+    with RecordStore(split_paths(path)[1]) as texts:
+        for entry in database['interpelli']:
+            yield {**entry, **texts.get(entry['id'], {})}
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Gli script importano i moduli condivisi come moduli di primo livello
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
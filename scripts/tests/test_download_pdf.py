@@ -0,0 +1,134 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+import scarica_interpelli as s
+from pdf_cache import PdfCache
+
+# più grande di un blocco di lettura (64 KB), così una risposta troncata lascia un parziale
+PDF = b'%PDF-1.4\n' + b'0123456789' * 30000 + b'\n%%EOF\n'
+NUOVO_PDF = b'%PDF-1.4\n' + b'abcdefghij' * 2000 + b'\n%%EOF\n'
+ETAG = '"v1"'
+
+
+class Server(http.server.BaseHTTPRequestHandler):
+    """Server HTTP locale con ETag, Range/If-Range, 304, 416 e risposte troncate."""
+    protocol_version = 'HTTP/1.1'
+    files = {}
+    truncate = set()     # percorsi la cui prossima risposta viene troncata
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, dict(self.headers)))
+        body = self.files.get(self.path)
+        if body is None:
+            return self._send(404)
+        if self.headers.get('If-None-Match') == ETAG:
+            return self._send(304)
+
+        rng = self.headers.get('Range')
+        if rng and self.headers.get('If-Range') == ETAG:
+            start = int(rng.split('=')[1].rstrip('-'))
+            if start >= len(body):
+                return self._send(416, {'Content-Range': f'bytes */{len(body)}'})
+            return self._send(206, {'Content-Range': f'bytes {start}-{len(body) - 1}/{len(body)}'},
+                              body[start:])
+
+        if self.path in self.truncate:
+            self.truncate.discard(self.path)
+            self.send_response(200)
+            self.send_header('ETag', ETAG)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self._send(200, {}, body)
+
+    def _send(self, status, headers=None, body=b''):
+        self.send_response(status)
+        if status in (200, 206):
+            self.send_header('ETag', ETAG)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(s, 'RETRY_BACKOFF', 0.01)
+    monkeypatch.setattr(s, 'DOWNLOAD_TIMEOUT', 3)
+    Server.files = {'/a.pdf': PDF, '/b.pdf': NUOVO_PDF}
+    Server.truncate = set()
+    Server.requests = []
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Server)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{srv.server_port}'
+    srv.shutdown()
+    srv.server_close()
+
+
+def download(cache, url, refresh=False):
+    return s.download_pdf(url, 'interpello_2024_0001', cache, s.DownloadLimiter(rate=100, burst=10),
+                          refresh=refresh)
+
+
+def cached_bytes(cache):
+    return cache.lookup('interpello_2024_0001').read_bytes()
+
+
+def write_partial(cache, url, data):
+    part = cache.part_path('interpello_2024_0001')
+    part.write_bytes(data)
+    part.with_name(part.name + '.json').write_text(json.dumps({'url': url, 'etag': ETAG}))
+
+
+def test_riverifica_con_304(server, tmp_path):
+    cache = PdfCache(tmp_path)
+    assert download(cache, server + '/a.pdf') == 'scaricato'
+    assert download(cache, server + '/a.pdf') == 'cache'
+    assert download(cache, server + '/a.pdf', refresh=True) == 'invariato'
+    assert Server.requests[-1][1].get('If-None-Match') == ETAG
+    assert len(Server.requests) == 2
+
+
+def test_ripresa_con_range(server, tmp_path):
+    cache = PdfCache(tmp_path)
+    write_partial(cache, server + '/a.pdf', PDF[:5000])
+    assert download(cache, server + '/a.pdf') == 'ripreso'
+    assert Server.requests[-1][1].get('Range') == 'bytes=5000-'
+    assert cached_bytes(cache) == PDF
+
+
+def test_416_scarta_il_parziale(server, tmp_path):
+    cache = PdfCache(tmp_path)
+    write_partial(cache, server + '/a.pdf', PDF + b'residuo')
+    assert download(cache, server + '/a.pdf') == 'scaricato'
+    assert [r[1].get('Range') for r in Server.requests] == [f'bytes={len(PDF) + 7}-', None]
+    assert cached_bytes(cache) == PDF
+
+
+def test_risposta_troncata_viene_ripresa(server, tmp_path):
+    cache = PdfCache(tmp_path)
+    Server.truncate.add('/a.pdf')
+    assert download(cache, server + '/a.pdf') == 'ripreso'
+    offset = int(Server.requests[-1][1]['Range'][len('bytes='):-1])
+    assert 0 < offset <= len(PDF) // 2
+    assert cached_bytes(cache) == PDF
+
+
+def test_link_sostituito_viene_riscaricato(server, tmp_path):
+    cache = PdfCache(tmp_path)
+    assert download(cache, server + '/a.pdf') == 'scaricato'
+    assert download(cache, server + '/b.pdf') == 'scaricato'
+    assert 'If-None-Match' not in Server.requests[-1][1]
+    assert cached_bytes(cache) == NUOVO_PDF
+    # il nuovo link non risponde: il PDF del vecchio link non viene usato
+    assert download(cache, server + '/mancante.pdf') is False
@@ -0,0 +1,75 @@
+import asyncio
+
+from embedding_scheduler import EmbeddingScheduler, pack_batches
+
+
+class ApiError(Exception):
+    """Errore HTTP come quelli del client OpenAI (status_code, response)."""
+
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+        self.response = None
+
+
+class FakeEndpoint:
+    """embed() finto: fallisce con i codici programmati per testo, poi risponde."""
+
+    def __init__(self, failures):
+        self.failures = {text: list(codes) for text, codes in failures.items()}
+        self.calls = []
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def embed(self, texts):
+        self.calls.append(list(texts))
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(0.01)
+            for text in texts:
+                codes = self.failures.get(text)
+                if codes:
+                    raise ApiError(codes.pop(0))
+            return [[float(len(text)), float(ord(text[-1]))] for text in texts]
+        finally:
+            self.inflight -= 1
+
+
+def run(endpoint, texts, **kwargs):
+    scheduler = EmbeddingScheduler(endpoint.embed, tokens_per_minute=1_000_000, max_batch_items=1,
+                                   base_delay=0.001, max_delay=0.01, **kwargs)
+    received = []
+    failed = asyncio.run(scheduler.run(texts, lambda batch, vectors: received.append((batch, vectors))))
+    return scheduler, received, failed
+
+
+def test_pack_batches_per_token():
+    batches = pack_batches(['a' * 30, 'b' * 30, 'c' * 300], max_tokens=25, max_items=10)
+    assert [texts for texts, _ in batches] == [['a' * 30, 'b' * 30], ['c' * 300]]
+
+
+def test_concorrenza_retry_e_risultati():
+    texts = [f'testo {i}' for i in range(12)]
+    endpoint = FakeEndpoint({'testo 3': [429, 503], 'testo 7': [503]})
+    scheduler, received, failed = run(endpoint, texts, max_inflight=3)
+
+    assert failed == []
+    assert endpoint.max_inflight == 3
+    # ogni batch arriva a on_batch con i vettori dei suoi testi, nello stesso ordine
+    assert sorted(t for batch, _ in received for t in batch) == sorted(texts)
+    for batch, vectors in received:
+        assert vectors == [[float(len(t)), float(ord(t[-1]))] for t in batch]
+    assert scheduler.stats == {'batch': 12, 'richieste': 15, 'ritentativi': 3, 'falliti': 0}
+
+
+def test_errore_non_ritentabile_tra_i_falliti():
+    endpoint = FakeEndpoint({'rotto': [400], 'esaurito': [503] * 5})
+    scheduler, received, failed = run(endpoint, ['ok', 'rotto', 'esaurito'], max_inflight=2, max_retries=2)
+
+    assert [batch for batch, _ in received] == [['ok']]
+    errors = {tuple(batch): e.status_code for batch, e in failed}
+    assert errors == {('rotto',): 400, ('esaurito',): 503}
+    assert endpoint.calls.count(['rotto']) == 1          # 400: nessun nuovo tentativo
+    assert endpoint.calls.count(['esaurito']) == 3       # 1 + max_retries
+    assert scheduler.stats['falliti'] == 2
@@ -0,0 +1,30 @@
+from parse_cache import ParseCache, stage_key
+
+
+def test_estrazione_fallita_non_resta_in_cache(tmp_path):
+    key = stage_key('v1')
+    risultati = iter([None, 'testo estratto'])
+    estrai = lambda: next(risultati)
+
+    doc = ParseCache(tmp_path).document('ab' * 32)
+    assert doc.get('estrazione_pdf', key, estrai, cacheable=bool) is None
+    doc.save()
+
+    doc = ParseCache(tmp_path).document('ab' * 32)
+    assert doc.get('estrazione_pdf', key, estrai, cacheable=bool) == 'testo estratto'
+    doc.save()
+
+    doc = ParseCache(tmp_path).document('ab' * 32)
+    assert doc.get('estrazione_pdf', key, estrai, cacheable=bool) == 'testo estratto'
+    assert doc.hits == ['estrazione_pdf']
+
+
+def test_valore_non_salvabile_gia_in_cache_viene_ricalcolato(tmp_path):
+    key = stage_key('v1')
+    doc = ParseCache(tmp_path).document('cd' * 32)
+    doc.get('estrazione_pdf', key, lambda: None)   # cache scritta prima della correzione
+    doc.save()
+
+    doc = ParseCache(tmp_path).document('cd' * 32)
+    assert doc.get('estrazione_pdf', key, lambda: 'testo', cacheable=bool) == 'testo'
+    assert doc.hits == []
@@ -0,0 +1,61 @@
+import sys
+
+import pdf_text
+
+
+class FakePage:
+    def __init__(self, idx):
+        self.idx = idx
+
+    def extract_text(self, **kwargs):
+        return f'pdfplumber {self.idx}'
+
+    def close(self):
+        pass
+
+
+class FakePdf:
+    pages = [FakePage(i) for i in range(10)]
+
+    def close(self):
+        pass
+
+
+def extract(monkeypatch, pages):
+    opened = []
+    monkeypatch.setitem(pdf_text.BACKENDS, 'finto', lambda path, start, end: iter(pages))
+    monkeypatch.setattr(pdf_text.pdfplumber, 'open', lambda path: opened.append(path) or FakePdf())
+    stats = {}
+    texts = list(pdf_text.iter_page_texts('doc.pdf', backend='finto', stats=stats))
+    return texts, stats, opened
+
+
+def test_pagina_bianca_non_apre_pdfplumber(monkeypatch):
+    texts, stats, opened = extract(monkeypatch, [(0, 'testo'), (1, ''), (2, ' \n'), (3, 'altro')])
+    assert texts == ['testo', 'altro']
+    assert opened == [] and stats == {'pagine': 4}
+
+
+def test_pagina_illeggibile_riestratta(monkeypatch):
+    texts, stats, _ = extract(monkeypatch, [(0, 'testo'), (1, '(cid:3)(cid:4)'), (2, '')])
+    assert texts == ['testo', 'pdfplumber 1']
+    assert stats == {'pagine': 3, 'fallback': 1}
+
+
+def test_documento_senza_testo_riestratto(monkeypatch):
+    texts, stats, _ = extract(monkeypatch, [(0, ''), (1, '')])
+    assert texts == ['pdfplumber 0', 'pdfplumber 1']
+    assert stats == {'pagine': 2, 'fallback': 2}
+
+
+def test_benchmark_senza_documenti_confrontabili(monkeypatch, capsys, tmp_path):
+    def broken(path, start, end):
+        raise ValueError('PDF illeggibile')
+        yield
+
+    pdf = tmp_path / 'rotto.pdf'
+    pdf.write_bytes(b'non un pdf')
+    monkeypatch.setattr(pdf_text, 'BACKENDS', {'pdfplumber': broken, 'pdfium': broken})
+    monkeypatch.setattr(sys, 'argv', ['pdf_text.py', str(pdf)])
+    assert pdf_text.main() == 0
+    assert 'somiglianza media n/d (min n/d)' in capsys.readouterr().out
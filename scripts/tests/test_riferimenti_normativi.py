@@ -0,0 +1,26 @@
+from normative_refs import extract_references, summarize_references
+
+
+def riferimento(norma, articolo, comma=None, lettera=None):
+    return {'norma': norma, 'articolo': articolo, 'comma': comma, 'lettera': lettera}
+
+
+def test_citazione_spezzata_su_due_righe():
+    refs, _ = extract_references("ai sensi dell'articolo\n19 del d.P.R. n. 633 del 1972")
+    assert refs == [riferimento('DPR 633/1972', '19')]
+
+
+def test_spazi_doppi():
+    refs, _ = extract_references("art.  19 del DPR 633/72")
+    assert refs == [riferimento('DPR 633/1972', '19')]
+
+
+def test_data_della_norma_a_capo():
+    refs, _ = extract_references("articolo 19 del d.P.R. 26 ottobre\n1972, n. 633")
+    assert refs == [riferimento('DPR 633/1972', '19')]
+
+
+def test_comma_lettera_e_suffisso_a_capo():
+    text = "art. 19\nbis, comma\n2, lettera\na) del d.P.R.\n633/1972"
+    assert extract_references(text)[0] == [riferimento('DPR 633/1972', '19-bis', '2', 'a')]
+    assert summarize_references(text)['riferimenti_specifici'] == ['DPR 633/1972 art. 19-bis']
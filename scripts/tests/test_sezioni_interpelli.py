@@ -0,0 +1,49 @@
+from scarica_interpelli import parse_interpello_sections
+
+LETTERA = """Divisione Contribuenti
+Risposta n. 12/2025
+OGGETTO: Detrazione IVA sugli acquisti di beni ammortizzabili
+QUESITO
+ALFA S.p.A. chiede di conoscere il
+parere dell'Agenzia in merito alla detrazione dell'imposta assolta.
+SOLUZIONE INTERPRETATIVA PROSPETTATA DAL CONTRIBUENTE
+L'istante ritiene di poter detrarre l'imposta.
+PARERE DELL'AGENZIA DELLE ENTRATE
+Si ritiene che l'imposta sia detraibile.
+"""
+
+
+def test_sezioni_in_maiuscolo():
+    sections = parse_interpello_sections(LETTERA)
+    assert sections['oggetto'] == 'Detrazione IVA sugli acquisti di beni ammortizzabili'
+    assert sections['quesito'] == ("ALFA S.p.A. chiede di conoscere il\n"
+                                   "parere dell'Agenzia in merito alla detrazione dell'imposta assolta.")
+    assert sections['soluzione_contribuente'] == "L'istante ritiene di poter detrarre l'imposta."
+    assert sections['parere_ade'] == "Si ritiene che l'imposta sia detraibile."
+
+
+def test_frase_a_inizio_riga_non_e_intestazione():
+    # "parere dell'Agenzia" a capo nel quesito, con intestazioni in minuscolo
+    text = LETTERA.replace('QUESITO', 'Quesito').replace(
+        'SOLUZIONE INTERPRETATIVA PROSPETTATA DAL CONTRIBUENTE',
+        "Soluzione interpretativa prospettata dall'istante").replace(
+        "PARERE DELL'AGENZIA DELLE ENTRATE", "Parere dell'Agenzia delle entrate")
+    sections = parse_interpello_sections(text)
+    assert sections['quesito'].endswith("detrazione dell'imposta assolta.")
+    assert sections['soluzione_contribuente'] == "L'istante ritiene di poter detrarre l'imposta."
+    assert sections['parere_ade'] == "Si ritiene che l'imposta sia detraibile."
+
+
+def test_falso_positivo_non_blocca_le_intestazioni_successive():
+    # una frase in maiuscolo scambiata per intestazione non deve far perdere la SOLUZIONE
+    text = LETTERA.replace("parere dell'Agenzia in merito", "PARERE DELL'AGENZIA in merito")
+    sections = parse_interpello_sections(text)
+    assert sections['soluzione_contribuente'] == "L'istante ritiene di poter detrarre l'imposta."
+    assert sections['parere_ade'] == "Si ritiene che l'imposta sia detraibile."
+
+
+def test_oggetto_dentro_il_testo():
+    text = LETTERA.replace("L'istante ritiene", "Il soggetto in oggetto ritiene")
+    sections = parse_interpello_sections(text)
+    assert sections['oggetto'].startswith('Detrazione IVA')
+    assert sections['soluzione_contribuente'].startswith('Il soggetto in oggetto')
@@ -0,0 +1,28 @@
+import os
+
+from split_store import latest_database, split_paths
+
+
+def touch(path, mtime):
+    path.write_text('{}')
+    os.utime(path, (mtime, mtime))
+
+
+def test_vince_la_versione_piu_recente(tmp_path):
+    db = tmp_path / 'interpelli_2024_2025_database.json'
+    hot, texts = split_paths(db)
+    assert latest_database(db) is None
+
+    touch(db.with_suffix('.jsonl'), 100)
+    touch(db, 200)
+    assert latest_database(db) == ('json', db)
+
+    touch(db.with_suffix('.jsonl'), 300)
+    assert latest_database(db) == ('jsonl', db.with_suffix('.jsonl'))
+
+    touch(hot, 400)     # metadati senza contenitore dei testi: incompleto
+    assert latest_database(db)[0] == 'jsonl'
+    touch(texts, 400)
+    assert latest_database(db) == ('split', hot)
+    # anche a partire dal percorso .jsonl
+    assert latest_database(db.with_suffix('.jsonl')) == ('split', hot)
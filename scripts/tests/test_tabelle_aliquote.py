@@ -0,0 +1,32 @@
+from parse_testo_unico_iva import build_aliquote_index, cerca_aliquota, parse_tabelle
+
+TABELLE = """
+Tabella A
+Parte II
+Beni e servizi soggetti all'aliquota del 4 per cento
+1) latte fresco, non concentrato né zuccherato;
+2) burro;
+Parte II
+3) pane, biscotto di mare e altri prodotti della panetteria ordinaria;
+4) paste alimentari;
+Parte III
+Beni e servizi soggetti all'aliquota del 10 per cento
+1) animali vivi della specie equina;
+Tabella B
+1) oro da investimento;
+"""
+
+
+def test_intestazione_ripetuta_non_perde_le_voci():
+    tabelle = parse_tabelle(TABELLE)
+    voci = tabelle['Parte II']['voci']
+    assert [v['numero'] for v in voci] == ['1', '2', '3', '4']
+    assert all(v['aliquota'] == 4 and v['id'].startswith('tabA_II_') for v in voci)
+    assert [v['numero'] for v in tabelle['Parte III']['voci']] == ['1']
+
+    indice = build_aliquote_index(tabelle)
+    risultati = cerca_aliquota(indice, 'pane')
+    assert risultati and risultati[0]['id'] == 'tabA_II_3'
+    assert risultati[0]['aliquota'] == 4
+    assert risultati[0]['descrizione'].startswith('pane, biscotto di mare')
+    assert 'della' in indice['stopwords']
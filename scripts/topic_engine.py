@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Classificatore tematico multi-etichetta condiviso tra il parser del TU IVA
+e lo scraper degli interpelli.
+
+Il vocabolario {tema: [pattern, ...]} viene compilato una sola volta.
+Per ogni pattern si ricava il letterale più lungo che qualunque match deve
+contenere: se il letterale non compare nel testo (ricerca di sottostringa,
+molto più veloce di una regex) il pattern viene scartato senza eseguirlo.
+Il maiuscolo/minuscolo viene normalizzato una sola volta sul testo invece
+di usare re.IGNORECASE, che disattiva la ricerca veloce dei prefissi.
+"""
+
+import re
+
+_METACHARS = set('.^$*+?{}[]|()')
+# Costrutti per cui l'analisi del letterale non è affidabile
+_UNSAFE = re.compile(r'\{|\\[xuUN0-9]|\(\?[aiLmsux-]')
+
+
+def _lower_pattern(pattern):
+    """Porta in minuscolo i caratteri letterali del pattern (non le escape)."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\':
+            out.append(pattern[i:i + 2])
+            i += 2
+        else:
+            out.append(pattern[i].lower())
+            i += 1
+    return ''.join(out)
+
+
+def required_literal(pattern):
+    """
+    Restituisce il letterale più lungo che ogni match del pattern contiene
+    (stringa vuota se non è possibile determinarlo).
+
+    L'analisi è conservativa: considera solo la sequenza di primo livello,
+    interrompe il letterale su classi, gruppi ed escape non letterali e
+    scarta i caratteri resi opzionali da un quantificatore.
+    """
+    if _UNSAFE.search(pattern):
+        return ''
+
+    runs = ['']
+    current = ''
+    depth = 0
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        token = None
+        if c == '\\' and i + 1 < n:
+            if depth == 0 and not pattern[i + 1].isalnum():
+                token = pattern[i + 1]
+            i += 2
+        elif c == '[':
+            # salta la classe di caratteri (gestendo ']' iniziale ed escape)
+            i += 1
+            if i < n and pattern[i] == '^':
+                i += 1
+            if i < n and pattern[i] == ']':
+                i += 1
+            while i < n and pattern[i] != ']':
+                i += 2 if pattern[i] == '\\' else 1
+            i += 1
+        else:
+            if c == '(':
+                depth += 1
+            elif c == ')':
+                depth -= 1
+            elif c == '|' and depth == 0:
+                return ''  # alternanza di primo livello: nessun letterale certo
+            elif c not in _METACHARS and depth == 0:
+                token = c
+            i += 1
+
+        quantifier = pattern[i] if i < n else ''
+        if token is not None and quantifier not in ('*', '?'):
+            current += token
+            if quantifier != '+':
+                continue
+        # fine del letterale corrente (il carattere opzionale resta fuori)
+        runs.append(current)
+        current = ''
+    runs.append(current)
+    return max(runs, key=len)
+
+
+class TopicEngine:
+    """
+    Motore di classificazione compilato da un vocabolario di pattern.
+
+    classify() restituisce gli stessi temi, nello stesso ordine del
+    vocabolario, che si otterrebbero cercando ogni pattern con re.search
+    (con re.IGNORECASE se ignore_case è vero).
+    """
+
+    def __init__(self, vocabulary, ignore_case=False):
+        self.ignore_case = ignore_case
+        self._topics = []
+        for topic, patterns in vocabulary.items():
+            compiled = []
+            for p in patterns:
+                if ignore_case:
+                    p = _lower_pattern(p)
+                compiled.append((required_literal(p), re.compile(p)))
+            self._topics.append((topic, compiled))
+
+    @property
+    def topics(self):
+        return [topic for topic, _ in self._topics]
+
+    def classify(self, text):
+        """Restituisce la lista dei temi presenti nel testo."""
+        if self.ignore_case:
+            text = text.lower()
+        found = []
+        for topic, patterns in self._topics:
+            for literal, regex in patterns:
+                if literal in text and regex.search(text):
+                    found.append(topic)
+                    break
+        return found
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Collegamento tra interpelli e articoli del Testo Unico IVA.
+
+Gli interpelli citano il vecchio codice ("DPR 633/1972 art. 19-bis"), il TU
+IVA ha la mappatura_vecchio_nuovo_codice dal vecchio riferimento ai nuovi
+articoli. Il collegamento è un hash join: le chiavi della mappatura vengono
+normalizzate una volta sola in un dizionario, poi per ogni riferimento
+dell'interpello basta una lookup. Il costo è proporzionale al numero totale
+di riferimenti, non a interpelli × voci della mappatura.
+
+Direzioni del collegamento:
+    interpello['articoli_tu_iva_collegati']  →  ['art_37', 'art_58', ...]
+    tu_database['interpelli_collegati']      →  {'art_37': [{'id', 'numero', 'anno', 'oggetto'}, ...]}
+"""
+
+from functools import lru_cache
+
+from normative_refs import LAWS, TOKEN_PATTERN, normalize_number
+
+# Norme del vecchio codice presenti nella mappatura
+LINKED_LAWS = ('dpr633', 'dl331')
+
+
+@lru_cache(maxsize=4096)   # gli stessi riferimenti ricorrono in molti interpelli
+def reference_key(text):
+    """
+    Chiave canonica di un riferimento al vecchio codice, nel formato delle
+    chiavi di mappatura_vecchio_nuovo_codice:
+        'DPR 633/72 art. 19 bis'  →  'DPR 633/1972 art. 19-bis'
+        'art. 38-ter D.L. 331/93' →  'DL 331/1993 art. 38-ter'
+    None se il testo non indica sia la norma sia l'articolo.
+    """
+    law = article = None
+    for m in TOKEN_PATTERN.finditer(text):
+        kind = m.lastgroup
+        if kind in LINKED_LAWS and law is None:
+            law = LAWS[kind]
+        elif kind == 'art' and article is None:
+            article = normalize_number(m.group('art_num'))
+    if law is None or article is None:
+        return None
+    return f"{law} art. {article}"
+
+
+def build_link_index(mapping):
+    """
+    Dizionario chiave canonica → id degli articoli del TU (senza duplicati,
+    nell'ordine della mappatura). Chiavi della mappatura scritte in modo
+    diverso ma equivalenti vengono unite.
+    """
+    index = {}
+    for raw_key, targets in mapping.items():
+        key = reference_key(raw_key)
+        if key is None:
+            continue
+        ids = index.setdefault(key, [])
+        for target in targets:
+            if target['id'] not in ids:
+                ids.append(target['id'])
+    return index
+
+
+def link_entry(entry, index):
+    """
+    Imposta entry['articoli_tu_iva_collegati'] con gli articoli del TU
+    corrispondenti ai riferimenti_specifici dell'interpello e li restituisce.
+    """
+    linked = []
+    seen = set()
+    for ref in entry['riferimenti_normativi']['riferimenti_specifici']:
+        for art_id in index.get(reference_key(ref), ()):
+            if art_id not in seen:
+                seen.add(art_id)
+                linked.append(art_id)
+    entry['articoli_tu_iva_collegati'] = linked
+    return linked
+
+
+def link_counts(entries):
+    """Conteggi dei collegamenti (usa solo id e articoli_tu_iva_collegati)."""
+    linked_articles = set()
+    links = interpelli = 0
+    for entry in entries:
+        ids = entry.get('articoli_tu_iva_collegati') or []
+        if ids:
+            interpelli += 1
+            links += len(ids)
+            linked_articles.update(ids)
+    return {
+        'interpelli_collegati': interpelli,
+        'articoli_tu_collegati': len(linked_articles),
+        'collegamenti': links,
+    }
+
+
+def reverse_links(entries):
+    """
+    Direzione inversa: articolo del TU → interpelli che lo citano,
+    nell'ordine delle voci. Accetta anche i riepiloghi della pipeline
+    (id, numero, anno, oggetto, articoli_tu_iva_collegati).
+    """
+    linked = {}
+    for entry in entries:
+        for art_id in entry.get('articoli_tu_iva_collegati') or []:
+            linked.setdefault(art_id, []).append({
+                'id': entry['id'],
+                'numero': entry['numero'],
+                'anno': entry['anno'],
+                'oggetto': entry['oggetto'],
+            })
+    return linked
@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from "next/server";
 import { analyzeQuery } from "@/lib/query-analyzer/analyzer";
 import { executeRetrieval } from "@/lib/retrieval/pipeline";
 import { generateResponse } from "@/lib/response-generator/generator";
+import { getRelatedArticleIds } from "@/lib/data/articles";
 import type { QueryRequest } from "@/lib/types";
 
 export const runtime = "nodejs";
@@ -72,7 +73,7 @@ export async function POST(request: NextRequest) {
 
     // Step 2: Execute retrieval pipeline
     const retrievalStart = Date.now();
-    const results = await executeRetrieval(analysis);
+    const results = await executeRetrieval(analysis, query.trim());
     const retrievalTime = Date.now() - retrievalStart;
 
     // Step 3: Generate streaming response
@@ -96,6 +97,9 @@ export async function POST(request: NextRequest) {
           commi: r.article?.commi ?? [],
           numero_commi: r.article?.numero_commi ?? 0,
           riferimenti_interni: r.article?.riferimenti_interni ?? [],
+          articoli_collegati: getRelatedArticleIds(r.id, 1).map((id) =>
+            id.replace(/^art_/, "")
+          ),
           testo_integrale: r.article?.testo_integrale ?? "",
         })),
         interpelli: results.interpelli.map((r) => ({
@@ -120,6 +124,7 @@ export async function POST(request: NextRequest) {
             parere_ade: r.interpello?.sezioni?.parere_ade ?? null,
           },
         })),
+        aliquote: results.aliquote ?? [],
       },
       timing: {
         analysis_ms: analysisTime,
@@ -267,6 +267,12 @@ export function ArticleCard({ article }: ArticleCardProps) {
 }
 
 function ArticleDetailDrawer({ article }: { article: SourceArticle }) {
+  // Vicini nel grafo non citati dall'articolo: sono gli articoli che lo richiamano
+  const citati = new Set(article.riferimenti_interni);
+  const citanti = (article.articoli_collegati ?? []).filter(
+    (ref) => !citati.has(ref)
+  );
+
   return (
     <Drawer direction="right">
       <DrawerTrigger asChild>
@@ -375,6 +381,29 @@ function ArticleDetailDrawer({ article }: { article: SourceArticle }) {
                 </div>
               </div>
             )}
+
+            {/* Articoli collegati (richiamano questo articolo) */}
+            {citanti.length > 0 && (
+              <div className="mt-8 pt-5 border-t border-border/30">
+                <div className="flex items-center gap-2 mb-3">
+                  <h4 className="text-xs font-bold text-muted-foreground uppercase tracking-widest">
+                    Richiamato da
+                  </h4>
+                  <InfoTip text="Altri articoli del Testo Unico IVA che citano questo articolo nel proprio testo." />
+                </div>
+                <div className="flex flex-wrap gap-2">
+                  {citanti.map((ref) => (
+                    <Badge
+                      key={ref}
+                      variant="secondary"
+                      className="font-mono text-xs bg-[#e8f1fa] text-[#004489] hover:bg-[#d0e3f5] px-2.5 py-1"
+                    >
+                      Art. {ref}
+                    </Badge>
+                  ))}
+                </div>
+              </div>
+            )}
           </div>
         </ScrollArea>
 
@@ -0,0 +1,48 @@
+import type { AliquotaMatch } from "../types";
+import { getTUSection } from "./loader";
+
+// Ricerca "aliquota per <prodotto>" sull'indice costruito da
+// scripts/parse_testo_unico_iva.py (build_aliquote_index). La
+// normalizzazione dei termini deve restare allineata a normalize_terms;
+// le stopword arrivano dall'indice stesso.
+
+let stopwordsCache: Set<string> | null = null;
+
+export function normalizeTerms(text: string, stopwords: Set<string>): string[] {
+  const plain = text
+    .toLowerCase()
+    .normalize("NFD")
+    .replace(/[\u0300-\u036f]/g, "");
+  const terms: string[] = [];
+  for (let token of plain.match(/[a-z0-9]+/g) || []) {
+    if (stopwords.has(token) || token.length < 3 || /^\d+$/.test(token)) continue;
+    if (token.length > 4 && "aeiou".includes(token[token.length - 1])) {
+      token = token.slice(0, -1);
+    }
+    terms.push(token);
+  }
+  return terms;
+}
+
+export function searchAliquota(query: string, limit = 5): AliquotaMatch[] {
+  const indice = getTUSection("indice_aliquote");
+  if (!indice) return [];
+  stopwordsCache ??= new Set(indice.stopwords);
+
+  const scores = new Map<string, number>();
+  for (const term of new Set(normalizeTerms(query, stopwordsCache))) {
+    const postings = indice.termini[term] || [];
+    for (const id of postings) {
+      scores.set(id, (scores.get(id) || 0) + 1 / postings.length);
+    }
+  }
+
+  return [...scores.entries()]
+    .sort((a, b) => b[1] - a[1] || (a[0] < b[0] ? -1 : a[0] > b[0] ? 1 : 0))
+    .slice(0, limit)
+    .map(([id, score]) => ({
+      id,
+      score: Math.round(score * 10000) / 10000,
+      ...indice.voci[id],
+    }));
+}
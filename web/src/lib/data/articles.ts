@@ -1,33 +1,38 @@
-import { getTUDatabase } from "./loader";
-import type { TUArticle } from "../types";
-
-let byIdIndex: Map<string, TUArticle> | null = null;
-let byArticoloIndex: Map<string, TUArticle> | null = null;
-
-function ensureIndexes() {
-  if (byIdIndex) return;
-  const db = getTUDatabase();
-  byIdIndex = new Map();
-  byArticoloIndex = new Map();
-  for (const art of db.articoli) {
-    byIdIndex.set(art.id, art);
-    byArticoloIndex.set(art.articolo, art);
-  }
-}
+import { getTUArticleRecord, getTUSection } from "./loader";
+import type { CsrAdjacency, TUArticle } from "../types";
+
+// Articoli già letti: ogni articolo viene decodificato al più una volta
+const byIdIndex = new Map<string, TUArticle | undefined>();
 
 export function getArticleById(id: string): TUArticle | undefined {
-  ensureIndexes();
-  return byIdIndex!.get(id);
+  if (!byIdIndex.has(id)) {
+    byIdIndex.set(id, getTUArticleRecord(id));
+  }
+  return byIdIndex.get(id);
 }
 
 export function getArticleByNumber(articolo: string): TUArticle | undefined {
-  ensureIndexes();
-  return byArticoloIndex!.get(articolo);
+  // Il parser assegna a ogni articolo l'id "art_<numero>"
+  return getArticleById(`art_${articolo}`);
+}
+
+/**
+ * Testo completo di un comma, ricavato dagli offset registrati dal parser
+ * (stessa segmentazione usata dal chunker). Gli offset sono in code point:
+ * coincidono con gli indici JS perché il testo non contiene caratteri
+ * fuori dal BMP.
+ */
+export function getCommaText(
+  article: TUArticle,
+  numero: number
+): string | undefined {
+  const comma = article.commi.find((c) => c.numero === numero);
+  if (!comma?.span) return undefined;
+  return article.testo_integrale.slice(comma.span[0], comma.span[1]);
 }
 
 export function getArticlesByTema(tema: string): TUArticle[] {
-  const db = getTUDatabase();
-  const temaIndex = db.indice_tematico[tema];
+  const temaIndex = getTUSection("indice_tematico")[tema];
   if (!temaIndex) return [];
   return temaIndex
     .map((entry) => getArticleById(entry.id))
@@ -37,6 +42,41 @@ export function getArticlesByTema(tema: string): TUArticle[] {
 export function getLinkedInterpelli(
   articleId: string
 ): Array<{ id: string; numero: number; anno: number; oggetto: string }> {
-  const db = getTUDatabase();
-  return db.interpelli_collegati[articleId] || [];
+  const linked = getTUSection("interpelli_collegati");
+  return linked?.[articleId] || [];
+}
+
+// Posizione di ogni articolo nell'indice del grafo (costruita una volta)
+let graphPosition: Map<string, number> | null = null;
+
+function getGraphPosition(articleId: string): number | undefined {
+  const grafo = getTUSection("indice_grafo");
+  if (!grafo) return undefined;
+  if (!graphPosition) {
+    graphPosition = new Map(grafo.nodi.map((id, i) => [id, i]));
+  }
+  return graphPosition.get(articleId);
+}
+
+function csrRow(adj: CsrAdjacency, i: number): number[] {
+  return adj.indices.slice(adj.indptr[i], adj.indptr[i + 1]);
+}
+
+/**
+ * Articoli collegati per riferimenti interni (in entrambe le direzioni),
+ * a distanza esatta di 1 o 2 passi, precalcolati dal parser.
+ */
+export function getRelatedArticleIds(articleId: string, hops: 1 | 2 = 1): string[] {
+  const i = getGraphPosition(articleId);
+  const grafo = getTUSection("indice_grafo");
+  if (i === undefined || !grafo) return [];
+  const adj = hops === 1 ? grafo.vicini_1 : grafo.vicini_2;
+  return csrRow(adj, i).map((j) => grafo.nodi[j]);
+}
+
+/** Centralità PageRank dell'articolo nel grafo dei riferimenti, in [0, 1]. */
+export function getArticleCentrality(articleId: string): number {
+  const i = getGraphPosition(articleId);
+  if (i === undefined) return 0;
+  return getTUSection("indice_grafo")?.centralita[i] ?? 0;
 }
@@ -1,9 +1,12 @@
-import { readFileSync } from "fs";
+import { existsSync, readFileSync } from "fs";
 import { join } from "path";
-import type { TUDatabase, InterpelliDatabase } from "../types";
+import type { TUArticle, TUDatabase, InterpelliDatabase, Interpello } from "../types";
+import { RecordStore } from "./record-store";
 
 let tuCache: TUDatabase | null = null;
 let ipCache: InterpelliDatabase | null = null;
+let tuStore: RecordStore | null | undefined;
+const tuSectionCache = new Map<string, unknown>();
 
 function getDataDir(): string {
   return join(process.cwd(), "data");
@@ -20,13 +23,87 @@ export function getTUDatabase(): TUDatabase {
   return tuCache;
 }
 
+/**
+ * Contenitore binario del TU IVA (testo_unico_iva_database.rec), se presente:
+ * un record per articolo, letto su richiesta senza parsare tutto il JSON.
+ */
+function getTUStore(): RecordStore | null {
+  if (tuStore === undefined) {
+    const path = join(getDataDir(), "testo_unico_iva_database.rec");
+    tuStore = existsSync(path) ? new RecordStore(path) : null;
+  }
+  return tuStore;
+}
+
+export function getTUArticleRecord(id: string): TUArticle | undefined {
+  const store = getTUStore();
+  if (!store) {
+    return getTUDatabase().articoli.find((art) => art.id === id);
+  }
+  return store.get<TUArticle>(id);
+}
+
+export function getTUSection<K extends Exclude<keyof TUDatabase, "articoli">>(
+  key: K
+): TUDatabase[K] {
+  const store = getTUStore();
+  if (!store) return getTUDatabase()[key];
+  if (!tuSectionCache.has(key)) {
+    tuSectionCache.set(key, store.get(`@${key}`));
+  }
+  return tuSectionCache.get(key) as TUDatabase[K];
+}
+
+type InterpelloTexts = Pick<Interpello, "sezioni" | "testo_integrale">;
+
+const EMPTY_TEXTS: InterpelloTexts = {
+  sezioni: {
+    oggetto_completo: null,
+    quesito: null,
+    soluzione_contribuente: null,
+    parere_ade: null,
+  },
+  testo_integrale: null,
+};
+
+/**
+ * sezioni e testo_integrale come getter: il record viene letto dal
+ * contenitore dei testi al primo accesso (scheda risultato, contesto per
+ * la risposta) e poi tenuto sulla voce.
+ */
+function attachLazyTexts(ip: Interpello, store: RecordStore) {
+  let texts: InterpelloTexts | undefined;
+  const load = () => (texts ??= store.get<InterpelloTexts>(ip.id) ?? EMPTY_TEXTS);
+  for (const field of ["sezioni", "testo_integrale"] as const) {
+    Object.defineProperty(ip, field, {
+      get: () => load()[field],
+      enumerable: true,
+      configurable: true,
+    });
+  }
+}
+
+/**
+ * Database degli interpelli. Se ci sono i file scritti da
+ * scripts/split_store.py viene caricata solo la parte con i metadati
+ * (.meta.json) e i testi si leggono su richiesta da .testi.rec;
+ * altrimenti il JSON completo.
+ */
 export function getInterpelliDatabase(): InterpelliDatabase {
   if (!ipCache) {
-    const raw = readFileSync(
-      join(getDataDir(), "interpelli_2024_2025_database.json"),
-      "utf-8"
-    );
-    ipCache = JSON.parse(raw) as InterpelliDatabase;
+    const hotPath = join(getDataDir(), "interpelli_2024_2025_database.meta.json");
+    const textsPath = join(getDataDir(), "interpelli_2024_2025_database.testi.rec");
+    if (existsSync(hotPath) && existsSync(textsPath)) {
+      ipCache = JSON.parse(readFileSync(hotPath, "utf-8")) as InterpelliDatabase;
+      const store = new RecordStore(textsPath);
+      for (const ip of ipCache.interpelli) attachLazyTexts(ip, store);
+    } else {
+      const raw = readFileSync(
+        join(getDataDir(), "interpelli_2024_2025_database.json"),
+        "utf-8"
+      );
+      ipCache = JSON.parse(raw) as InterpelliDatabase;
+    }
   }
   return ipCache;
 }
@@ -1,4 +1,4 @@
-import { getTUDatabase } from "./loader";
+import { getTUSection } from "./loader";
 import type { TUArticle } from "../types";
 import { getArticleById } from "./articles";
 
@@ -12,11 +12,10 @@ let mappaCache: Map<string, MappedArticle[]> | null = null;
 
 function ensureMap() {
   if (mappaCache) return;
-  const db = getTUDatabase();
   mappaCache = new Map();
 
   for (const [key, values] of Object.entries(
-    db.mappatura_vecchio_nuovo_codice
+    getTUSection("mappatura_vecchio_nuovo_codice")
   )) {
     mappaCache.set(key.toLowerCase(), values);
 
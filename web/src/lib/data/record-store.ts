@@ -0,0 +1,71 @@
+import { closeSync, openSync, readSync } from "fs";
+import { inflateSync } from "zlib";
+
+// Lettore del contenitore binario scritto da scripts/record_store.py.
+// Legge solo l'header con la tabella degli offset; ogni record viene
+// letto e decodificato su richiesta, senza fare il parsing del resto.
+
+const MAGIC = "FISCOREC";
+const FORMAT_VERSION = 1;
+const FLAG_ZLIB = 1;
+const PREFIX_SIZE = 16; // magic(8) + versione(2) + flag(2) + len_header(4)
+
+interface StoreHeader {
+  record: Record<string, [number, number]>;
+  meta: Record<string, unknown>;
+}
+
+export class RecordStore {
+  private fd: number;
+  private index: Record<string, [number, number]>;
+  private dataStart: number;
+  private compressed: boolean;
+  readonly meta: Record<string, unknown>;
+
+  constructor(path: string) {
+    this.fd = openSync(path, "r");
+    try {
+      const prefix = Buffer.alloc(PREFIX_SIZE);
+      readSync(this.fd, prefix, 0, PREFIX_SIZE, 0);
+      if (prefix.toString("latin1", 0, 8) !== MAGIC) {
+        throw new Error(`${path}: non è un contenitore FISCOREC`);
+      }
+      const version = prefix.readUInt16LE(8);
+      if (version > FORMAT_VERSION) {
+        throw new Error(`${path}: versione del formato non supportata (${version})`);
+      }
+      const flags = prefix.readUInt16LE(10);
+      const headerLen = prefix.readUInt32LE(12);
+
+      const headerBuf = Buffer.alloc(headerLen);
+      readSync(this.fd, headerBuf, 0, headerLen, PREFIX_SIZE);
+      const header = JSON.parse(headerBuf.toString("utf-8")) as StoreHeader;
+
+      this.index = header.record;
+      this.meta = header.meta ?? {};
+      this.dataStart = PREFIX_SIZE + headerLen;
+      this.compressed = (flags & FLAG_ZLIB) !== 0;
+    } catch (err) {
+      closeSync(this.fd);
+      throw err;
+    }
+  }
+
+  has(key: string): boolean {
+    return key in this.index;
+  }
+
+  keys(): string[] {
+    return Object.keys(this.index);
+  }
+
+  get<T>(key: string): T | undefined {
+    const entry = this.index[key];
+    if (!entry) return undefined;
+    const [offset, length] = entry;
+    let buf: Buffer = Buffer.alloc(length);
+    readSync(this.fd, buf, 0, length, this.dataStart + offset);
+    if (this.compressed) buf = inflateSync(buf);
+    return JSON.parse(buf.toString("utf-8")) as T;
+  }
+}
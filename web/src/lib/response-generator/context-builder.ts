@@ -1,4 +1,9 @@
-import type { FusedResults, TUArticle, Interpello } from "../types";
+import type {
+  AliquotaMatch,
+  FusedResults,
+  TUArticle,
+  Interpello,
+} from "../types";
 
 const MAX_ARTICLE_CHARS = 4000;
 const MAX_INTERPELLO_CHARS = 1500;
@@ -14,6 +19,15 @@ export function buildContext(results: FusedResults): string {
     }
   }
 
+  if (results.aliquote && results.aliquote.length > 0) {
+    sections.push(
+      "\n=== VOCI DELLE TABELLE A e B (aliquote applicabili) ===\n"
+    );
+    for (const voce of results.aliquote) {
+      sections.push(formatAliquota(voce));
+    }
+  }
+
   if (results.interpelli.length > 0) {
     sections.push(
       "\n=== INTERPELLI DELL'AGENZIA DELLE ENTRATE ===\n"
@@ -58,6 +72,12 @@ function formatArticle(art: TUArticle): string {
   return header.join("\n") + "\n";
 }
 
+function formatAliquota(voce: AliquotaMatch): string {
+  const aliquota =
+    voce.aliquota === null ? "aliquota non indicata" : `aliquota ${voce.aliquota}%`;
+  return `- ${voce.tabella}, n. ${voce.numero} (${aliquota}): ${voce.descrizione}\n`;
+}
+
 function formatInterpello(ip: Interpello): string {
   const header = [
     `--- Interpello n. ${ip.numero}/${ip.anno} (${ip.data}) ---`,
@@ -16,6 +16,7 @@ REGOLE FONDAMENTALI:
 6. CITA SOLO gli interpelli effettivamente pertinenti alla domanda. Se un interpello nel contesto non è rilevante, NON includerlo. Meglio 1 interpello pertinente che 5 irrilevanti.
 7. Se nessun interpello è pertinente, ometti la sezione "Prassi (Interpelli)" e indica nelle Note che non sono stati trovati interpelli rilevanti.
 8. Se nel contesto ci sono riferimenti interni ad altri articoli TU IVA, menzionali brevemente come "si veda anche art. X".
+9. Per le domande sulle aliquote, se il contesto contiene la sezione "VOCI DELLE TABELLE A e B" usa le voci pertinenti per indicare l'aliquota, citandole come "Tabella A, Parte II, n. X" (o "Tabella B, n. X"); ignora le voci non pertinenti al bene o servizio chiesto.
 
 REGOLE DI FORMATTAZIONE MARKDOWN:
 - Usa SEMPRE elenchi puntati (- oppure 1. 2. 3.) per elencare più elementi. MAI paragrafi consecutivi senza struttura.
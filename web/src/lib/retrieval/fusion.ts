@@ -3,7 +3,11 @@ import type {
   FusedResults,
   QueryAnalysis,
 } from "../types";
-import { getLinkedInterpelli } from "../data/articles";
+import {
+  getArticleCentrality,
+  getLinkedInterpelli,
+  getRelatedArticleIds,
+} from "../data/articles";
 import { FINAL_LIMITS } from "../constants";
 
 export function fuseAndRerank(
@@ -119,6 +123,20 @@ export function fuseAndRerank(
     }
   }
 
+  // Bonus 6: Graph proximity — articles one reference away from a Path A
+  // lookup article (citing it or cited by it) get +0.05, so the provisions
+  // the referenced article depends on surface next to it.
+  const nearLookup = new Set<string>();
+  for (const result of allArticles.values()) {
+    if (result.source !== "lookup") continue;
+    for (const id of getRelatedArticleIds(result.id, 1)) nearLookup.add(id);
+  }
+  for (const result of allArticles.values()) {
+    if (result.source !== "lookup" && nearLookup.has(result.id)) {
+      result.score += 0.05;
+    }
+  }
+
   // For generica queries (broad topics), prioritize articles over interpelli.
   // Generica queries need broader normativa coverage, while interpelli add noise.
   const isGenerica = analysis.tipo_query === "generica";
@@ -127,7 +145,12 @@ export function fuseAndRerank(
 
   const sortedArticles = Array.from(allArticles.values())
     .filter((r) => r.score >= FINAL_LIMITS.minScoreArticles)
-    .sort((a, b) => b.score - a.score)
+    // Ties: the article more central in the reference graph (PageRank) wins
+    .sort(
+      (a, b) =>
+        b.score - a.score ||
+        getArticleCentrality(b.id) - getArticleCentrality(a.id)
+    )
     .slice(0, maxArticles);
 
   const sortedInterpelli = Array.from(allInterpelli.values())
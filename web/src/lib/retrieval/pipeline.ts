@@ -1,4 +1,5 @@
 import type { QueryAnalysis, FusedResults } from "../types";
+import { searchAliquota } from "../data/aliquote";
 import { executeLookup } from "./path-a";
 import { executeSemanticSearch } from "./path-b";
 import { executeMetadataFilter } from "./path-c";
@@ -19,8 +20,17 @@ function isPureLookupQuery(analysis: QueryAnalysis): boolean {
   return analysis.tipo_query === "normativa" && hasReferences;
 }
 
+/**
+ * Rate questions ("aliquota per <prodotto>") are answered from the
+ * Tabella A/B index built by the parser: a local lookup, no vector search.
+ */
+function isAliquotaQuery(analysis: QueryAnalysis): boolean {
+  return analysis.temi_probabili.includes("aliquote");
+}
+
 export async function executeRetrieval(
-  analysis: QueryAnalysis
+  analysis: QueryAnalysis,
+  query: string
 ): Promise<FusedResults> {
   // Path A: direct lookup + cross-reference enrichment (synchronous, fast)
   const pathAResults = executeLookup(analysis);
@@ -34,7 +44,7 @@ export async function executeRetrieval(
     Promise.resolve(executeMetadataFilter(analysis)),
   ]);
 
-  return fuseAndRerank(
+  const fused = fuseAndRerank(
     pathAResults,
     pathBResults.tuResults,
     pathBResults.ipResults,
@@ -42,4 +52,9 @@ export async function executeRetrieval(
     pathCResults.ipResults,
     analysis
   );
+
+  if (isAliquotaQuery(analysis)) {
+    fused.aliquote = searchAliquota(query);
+  }
+  return fused;
 }
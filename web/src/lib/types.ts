@@ -22,6 +22,9 @@ export interface TUArticle {
   commi: Array<{
     numero: number;
     testo: string;
+    /** Offset [inizio, fine) del comma in testo_integrale */
+    span?: [number, number];
+    lettere?: Array<{ lettera: string; span: [number, number] }>;
   }>;
   numero_commi: number;
   temi: string[];
@@ -35,20 +38,84 @@ export interface TUArticle {
   };
 }
 
+export interface TabellaVoce {
+  id: string;
+  tabella: "A" | "B";
+  parte: string | null;
+  numero: string;
+  aliquota: number | null;
+  descrizione: string;
+}
+
+// Voce delle tabelle trovata dalla ricerca "aliquota per <prodotto>"
+export interface AliquotaMatch {
+  id: string;
+  score: number;
+  tabella: string;
+  numero: string;
+  aliquota: number | null;
+  descrizione: string;
+}
+
+// Adiacenza compressa: i vicini del nodo i sono indices[indptr[i]..indptr[i+1])
+export interface CsrAdjacency {
+  indptr: number[];
+  indices: number[];
+}
+
+// Conteggi del collegamento interpelli ↔ articoli del TU (scripts/tu_links.py)
+export interface ConteggiCollegamenti {
+  interpelli_collegati: number;
+  articoli_tu_collegati: number;
+  collegamenti: number;
+}
+
 export interface TUDatabase {
   metadata: {
     norma: string;
     titolo: string;
     numero_articoli: number;
     struttura_titoli: Array<{ numero: string; nome: string }>;
+    collegamenti_interpelli?: ConteggiCollegamenti;
   };
   articoli: TUArticle[];
-  tabelle_riferimento: Record<string, { descrizione: string; nota: string }>;
+  tabelle_riferimento: Record<
+    string,
+    {
+      descrizione: string;
+      nota: string;
+      tabella?: "A" | "B";
+      aliquota?: number | null;
+      voci?: TabellaVoce[];
+    }
+  >;
+  indice_aliquote?: {
+    // stopword di normalize_terms (scripts/parse_testo_unico_iva.py)
+    stopwords: string[];
+    termini: Record<string, string[]>;
+    voci: Record<
+      string,
+      {
+        tabella: string;
+        numero: string;
+        aliquota: number | null;
+        descrizione: string;
+      }
+    >;
+  };
   indice_tematico: Record<
     string,
     Array<{ articolo: string; titolo: string; id: string }>
   >;
   grafo_riferimenti_interni: Record<string, string[]>;
+  indice_grafo?: {
+    nodi: string[];
+    citati: CsrAdjacency;
+    citanti: CsrAdjacency;
+    vicini_1: CsrAdjacency;
+    vicini_2: CsrAdjacency;
+    centralita: number[];
+  };
   mappatura_vecchio_nuovo_codice: Record<
     string,
     Array<{ nuovo_articolo: string; nuovo_titolo: string; id: string }>
@@ -59,6 +126,13 @@ export interface TUDatabase {
   >;
 }
 
+export interface RiferimentoNormativo {
+  norma: string | null; // "DPR 633/1972", "DL 331/1993", "D.Lgs. 10/2026"
+  articolo: string;
+  comma: string | null;
+  lettera: string | null;
+}
+
 export interface Interpello {
   id: string;
   numero: number;
@@ -78,6 +152,7 @@ export interface Interpello {
   riferimenti_normativi: {
     riferimenti_specifici: string[];
     articoli_citati: string[];
+    riferimenti?: RiferimentoNormativo[];
   };
   temi: string[];
   metadati_rag: {
@@ -97,6 +172,7 @@ export interface InterpelliDatabase {
     per_anno: Record<string, number>;
     per_tag: Record<string, number>;
     con_testo_completo: number;
+    collegamenti_tu_iva?: ConteggiCollegamenti;
   };
   interpelli: Interpello[];
 }
@@ -143,6 +219,7 @@ export interface FusedResults {
   articles: RetrievalResult[];
   interpelli: RetrievalResult[];
   totalCandidates: number;
+  aliquote?: AliquotaMatch[];
 }
 
 // ══════════════════════════════════════════════════════════
@@ -167,6 +244,8 @@ export interface SourceArticle {
   commi: Array<{ numero: number; testo: string }>;
   numero_commi: number;
   riferimenti_interni: string[];
+  /** Articoli a un passo nel grafo dei riferimenti (citati o citanti) */
+  articoli_collegati?: string[];
   testo_integrale: string;
 }
 
@@ -195,6 +274,7 @@ export interface SourceMetadata {
   sources: {
     articles: SourceArticle[];
     interpelli: SourceInterpello[];
+    aliquote?: AliquotaMatch[];
   };
   timing: {
     analysis_ms: number;